@@ -27,11 +27,11 @@ with DAG(
         os.system(f"aws s3 sync s3://{bucket_name}/input_files /app/input_files")
 
     def batch_prediction(**kwargs):
-        from thyroid.pipeline.batch_prediction import start_batch_prediction
+        from thyroid.pipeline.batch_prediction import start_parallel_batch_prediction
         input_dir = "/app/input_files"
-        for file_name in os.listdir(input_dir):
-            #make prediction
-            start_batch_prediction(input_file_path=os.path.join(input_dir,file_name))
+        input_file_paths = [os.path.join(input_dir,file_name) for file_name in os.listdir(input_dir)]
+        #make prediction, failed files are listed in the manifest written to the prediction folder
+        start_parallel_batch_prediction(input_file_paths=input_file_paths)
     
     def sync_prediction_dir_to_s3_bucket(**kwargs):
         bucket_name = os.getenv("BUCKET_NAME")
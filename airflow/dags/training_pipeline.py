@@ -20,7 +20,10 @@ with DAG(
     
     def training(**kwargs):
         from thyroid.pipeline.training_pipeline import start_training_pipeline
-        start_training_pipeline()
+        #trigger with {"force": true} to rerun stages whose inputs did not change
+        dag_run = kwargs.get("dag_run")
+        force = bool(dag_run.conf.get("force",False)) if dag_run is not None and dag_run.conf else False
+        start_training_pipeline(force=force)
     
     def sync_artifact_to_s3_bucket(**kwargs):
         bucket_name = os.getenv("BUCKET_NAME")
@@ -0,0 +1,8 @@
+from thyroid.pipeline.prediction_service import create_app
+import uvicorn
+import os
+
+app = create_app()
+
+if __name__=="__main__":
+    uvicorn.run(app,host=os.getenv("HOST","0.0.0.0"),port=int(os.getenv("PORT",8000)))
@@ -0,0 +1,32 @@
+"""
+Implementations the optimized code replaced, kept as the baseline of the benchmarks and the
+reference of the equivalence tests (tests/test_missing_data_handler.py).
+"""
+from collections import Counter
+import numpy as np
+import pandas as pd
+import common
+from thyroid.config import numeric_features
+
+
+def legacy_missing_data_handler(df:pd.DataFrame)->pd.DataFrame:
+    #per column casting and filling and a per row loop over the target column
+    df.replace(to_replace='?',value=np.nan,inplace=True)
+    for i in numeric_features:
+        df[i]=df[i].astype('float')
+    categorical_features = list((Counter(df.columns) - Counter(numeric_features)).elements())
+    for i in categorical_features:
+        df[i]=df[i].fillna(df[i].mode())
+    df['sex']=df['sex'].fillna(df['sex'].mode()[0])
+    for j in numeric_features:
+        df[j]=df[j].fillna(df[j].mean())
+    status = df['status'].astype(object)
+    for i in range(len(status)):
+        status.at[i]=str(status.at[i])[slice(3)]
+        if status.at[i]=='neg':
+            status.at[i]='neg'
+        else:
+            status.at[i]='pos'
+    df['status']=status
+    dump_col = [i for i in df.columns if len(df[i].unique())<2]
+    return df.drop(dump_col, axis=1)
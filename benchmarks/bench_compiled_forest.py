@@ -0,0 +1,58 @@
+"""
+CompiledForest.predict against RandomForestClassifier.predict at batch sizes 1, 100, 256, 1000 and 100k.
+The compiled forest is only faster for small batches, ThyroidModel uses it up to
+predictor.COMPILED_FOREST_MAX_ROWS rows (256) and the sklearn forest above.
+
+The forest is trained the way ModelTrainer trains it, on the cleaned, encoded and scaled base
+dataset, and both predictors are checked for identical classes on every batch.
+
+Usage: python benchmarks/bench_compiled_forest.py [--batch-sizes 1 100 256 1000 100000] [--repeat 5]
+"""
+import argparse
+import time
+import numpy as np
+import pandas as pd
+from common import BASE_FILE_PATH
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.preprocessing import OrdinalEncoder, StandardScaler
+from thyroid.compiled_forest import CompiledForest
+from thyroid.config import TARGET_COLUMN
+from thyroid.utils import missing_data_handler
+
+
+def best_time(func,x,repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(x)
+        times.append(time.perf_counter()-start)
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1,100,256,1000,100_000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    df = missing_data_handler(pd.read_csv(BASE_FILE_PATH))
+    categorical = [column for column in df.columns if df[column].dtype=='O' and column!=TARGET_COLUMN]
+    numerical = [column for column in df.columns if df[column].dtype!='O']
+    x = np.c_[OrdinalEncoder().fit_transform(df[categorical]),StandardScaler().fit_transform(df[numerical])]
+    y = (df[TARGET_COLUMN]=="pos").astype(float).values
+    model = RandomForestClassifier(random_state=42).fit(x,y)
+    compiled_model = CompiledForest.from_sklearn(model)
+
+    rows = np.random.default_rng(42).integers(0,len(x),max(args.batch_sizes))
+    print(f"{'batch':>8} {'sklearn ms':>11} {'compiled ms':>12} {'speedup':>8} {'identical':>10}")
+    for batch_size in args.batch_sizes:
+        batch = x[rows[:batch_size]]
+        identical = np.array_equal(model.predict(batch),compiled_model.predict(batch))
+        sklearn_seconds = best_time(model.predict,batch,args.repeat)
+        compiled_seconds = best_time(compiled_model.predict,batch,args.repeat)
+        print(f"{batch_size:>8} {sklearn_seconds*1000:>11.2f} {compiled_seconds*1000:>12.2f} "
+              f"{sklearn_seconds/compiled_seconds:>7.1f}x {str(identical):>10}")
+
+
+if __name__=="__main__":
+    main()
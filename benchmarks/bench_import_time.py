@@ -0,0 +1,87 @@
+"""
+Cold start of the prediction entry points: seconds to import them in a fresh interpreter, the
+heavy dependencies the import pulls in and its side effects (threads started, logs directory
+created), for the working tree and optionally for an earlier git revision of it.
+
+Every measurement runs in a new python process started in an empty temporary directory, the
+import itself is timed inside that process so interpreter startup is left out.
+
+Usage: python benchmarks/bench_import_time.py [--baseline-ref HEAD~1] [--runs 5]
+       [--modules thyroid.pipeline.batch_prediction thyroid.pipeline.prediction_service]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tarfile
+import tempfile
+import io
+import numpy as np
+from common import ROOT_DIR
+
+ENTRY_POINTS = ["thyroid.pipeline.batch_prediction","thyroid.pipeline.prediction_service","thyroid.utils"]
+#dependencies reported when importing an entry point loads them
+HEAVY_MODULES = ["pandas","numpy","pymongo","dill","joblib","yaml","sklearn","scipy"]
+
+CHILD_SCRIPT = """
+import importlib, json, os, sys, threading, time
+start = time.perf_counter()
+importlib.import_module(sys.argv[1])
+seconds = time.perf_counter()-start
+print(json.dumps({"seconds":seconds,"modules":len(sys.modules),"threads":threading.active_count(),
+                  "logs_dir":os.path.exists("logs"),"heavy":[name for name in sys.argv[2:] if name in sys.modules]}))
+"""
+
+
+def measure_import(tree_dir,module,runs):
+    samples = []
+    for _ in range(runs):
+        with tempfile.TemporaryDirectory() as work_dir:
+            env = dict(os.environ,PYTHONPATH=tree_dir)
+            output = subprocess.run([sys.executable,"-c",CHILD_SCRIPT,module]+HEAVY_MODULES,cwd=work_dir,env=env,
+                                    capture_output=True,text=True,check=True).stdout
+            samples.append(json.loads(output.strip().splitlines()[-1]))
+    result = samples[-1]
+    result["seconds"] = float(np.median([sample["seconds"] for sample in samples]))
+    return result
+
+
+def module_exists(tree_dir,module):
+    path = os.path.join(tree_dir,*module.split("."))
+    return os.path.exists(f"{path}.py") or os.path.exists(os.path.join(path,"__init__.py"))
+
+
+def export_revision(ref,target_dir):
+    archive = subprocess.run(["git","archive",ref,"thyroid"],cwd=ROOT_DIR,capture_output=True,check=True).stdout
+    with tarfile.open(fileobj=io.BytesIO(archive)) as tar:
+        tar.extractall(target_dir)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--modules", nargs="+", default=ENTRY_POINTS)
+    parser.add_argument("--runs", type=int, default=5, help="imports per module and tree, the median is reported")
+    parser.add_argument("--baseline-ref", help="git revision to compare with, e.g. HEAD~1")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as baseline_dir:
+        trees = {"working tree":ROOT_DIR}
+        if args.baseline_ref:
+            export_revision(args.baseline_ref,baseline_dir)
+            trees = {args.baseline_ref:baseline_dir,**trees}
+
+        print(f"{'module':<38} {'tree':<14} {'import ms':>10} {'modules':>8} {'threads':>8} {'logs dir':>9}  heavy dependencies")
+        for module in args.modules:
+            for name,tree_dir in trees.items():
+                #entry points added after the baseline revision have no before number
+                if not module_exists(tree_dir,module):
+                    print(f"{module:<38} {name:<14} {'-':>10} {'-':>8} {'-':>8} {'-':>9}  not in this tree")
+                    continue
+                result = measure_import(tree_dir,module,args.runs)
+                print(f"{module:<38} {name:<14} {result['seconds']*1000:>10.1f} {result['modules']:>8} {result['threads']:>8} "
+                      f"{str(result['logs_dir']):>9}  {', '.join(result['heavy']) or '-'}")
+
+
+if __name__=="__main__":
+    main()
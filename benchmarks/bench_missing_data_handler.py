@@ -0,0 +1,33 @@
+"""
+Rows/sec of utils.missing_data_handler against the previous row-by-row status trimming.
+
+Usage: python benchmarks/bench_missing_data_handler.py [--rows 10000 100000 1000000] [--legacy-max-rows 100000]
+"""
+import argparse
+from common import synthetic_thyroid_frame, timed
+from _legacy import legacy_missing_data_handler
+from thyroid.utils import missing_data_handler
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--legacy-max-rows", type=int, default=100_000,
+                        help="skip the legacy run above this size, it is O(n) python-level indexing")
+    args = parser.parse_args()
+
+    print(f"{'rows':>10} {'legacy rows/s':>15} {'columnar rows/s':>17} {'speedup':>9}")
+    for n_rows in args.rows:
+        df = synthetic_thyroid_frame(n_rows)
+        _, new_seconds = timed(missing_data_handler, df.copy())
+        new_rate = n_rows/new_seconds
+        if n_rows<=args.legacy_max_rows:
+            _, legacy_seconds = timed(legacy_missing_data_handler, df.copy())
+            legacy_rate = n_rows/legacy_seconds
+            print(f"{n_rows:>10} {legacy_rate:>15,.0f} {new_rate:>17,.0f} {legacy_seconds/new_seconds:>8.1f}x")
+        else:
+            print(f"{n_rows:>10} {'skipped':>15} {new_rate:>17,.0f} {'-':>9}")
+
+
+if __name__=="__main__":
+    main()
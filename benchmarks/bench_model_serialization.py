@@ -0,0 +1,90 @@
+"""
+Load time and memory of a saved model for 1, 4 and 16 concurrent worker processes: the forest in
+dill and in the memory mapped joblib format of utils.save_object, and its CompiledForest in joblib
+(what ModelPusherConfig.memory_mapped_forest saves). sklearn copies memory mapped tree arrays on
+load, the compiled forest keeps using the mapped pages.
+
+Every worker process loads the model once and reports its load time together with Rss, Pss
+(resident memory with shared pages divided between the processes mapping them) and private
+memory from /proc/self/smaps_rollup, so the column totals show how much is actually shared.
+
+Usage: python benchmarks/bench_model_serialization.py [--workers 1 4 16] [--rows 20000] [--n-estimators 100]
+"""
+import argparse
+import multiprocessing
+import os
+import tempfile
+import time
+import numpy as np
+import common
+from sklearn.ensemble import RandomForestClassifier
+from thyroid.compiled_forest import CompiledForest
+from thyroid.utils import load_object, save_object
+
+
+def memory_kb():
+    values = dict()
+    with open("/proc/self/smaps_rollup") as file_obj:
+        for line in file_obj:
+            parts = line.split()
+            if len(parts)==3 and parts[2]=="kB":
+                values[parts[0].rstrip(":")] = int(parts[1])
+    return values
+
+
+def load_worker(file_path,start_event,queue):
+    start_event.wait()
+    before = memory_kb()
+    start = time.perf_counter()
+    model = load_object(file_path=file_path)
+    seconds = time.perf_counter()-start
+    after = memory_kb()
+    private = after["Private_Clean"]+after["Private_Dirty"]-before["Private_Clean"]-before["Private_Dirty"]
+    queue.put((seconds,after["Rss"]-before["Rss"],after["Pss"]-before["Pss"],private))
+    #keep the model mapped until every worker measured
+    start_event.wait()
+    time.sleep(1)
+    del model
+
+
+def run(file_path,n_workers):
+    context = multiprocessing.get_context("spawn")
+    start_event,queue = context.Event(),context.Queue()
+    workers = [context.Process(target=load_worker,args=(file_path,start_event,queue)) for _ in range(n_workers)]
+    for worker in workers:
+        worker.start()
+    time.sleep(2)
+    start_event.set()
+    results = np.array([queue.get() for _ in workers])
+    for worker in workers:
+        worker.join()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, nargs="+", default=[1,4,16])
+    parser.add_argument("--rows", type=int, default=20_000)
+    parser.add_argument("--n-estimators", type=int, default=100)
+    args = parser.parse_args()
+
+    random_generator = np.random.default_rng(42)
+    x = random_generator.normal(size=(args.rows,27))
+    y = (x[:,0]+random_generator.normal(scale=2,size=args.rows)>0).astype(int)
+    model = RandomForestClassifier(n_estimators=args.n_estimators,random_state=42).fit(x,y)
+
+    #label: (object, serialization format)
+    artifacts = {"dill":(model,"dill"),"joblib":(model,"joblib"),"compiled":(CompiledForest.from_sklearn(model),"joblib")}
+    print(f"{'format':>8} {'workers':>8} {'load s (mean)':>14} {'rss MB (sum)':>13} {'pss MB (sum)':>13} {'private MB (sum)':>17}")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for label,(obj,serialization_format) in artifacts.items():
+            file_path = os.path.join(tmp_dir,label,"model.pkl")
+            save_object(file_path=file_path,obj=obj,serialization_format=serialization_format)
+            for n_workers in args.workers:
+                results = run(file_path,n_workers)
+                print(f"{label:>8} {n_workers:>8} {results[:,0].mean():>14.3f} {results[:,1].sum()/1024:>13.1f} "
+                      f"{results[:,2].sum()/1024:>13.1f} {results[:,3].sum()/1024:>17.1f}")
+
+
+if __name__=="__main__":
+    main()
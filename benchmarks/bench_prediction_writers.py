@@ -0,0 +1,50 @@
+"""
+Write time and file size of the batch prediction writers (csv, parquet, feather) with and without
+compression, for full rows and for the id + prediction columns only output.
+
+Usage: python benchmarks/bench_prediction_writers.py [--rows 1000000] [--chunk-size 100000]
+"""
+import argparse
+import os
+import tempfile
+import numpy as np
+from common import synthetic_thyroid_frame, timed
+from thyroid.pipeline.batch_prediction import get_prediction_writer
+
+CASES = [("csv",None),("csv","gzip"),("parquet","snappy"),("parquet","zstd"),("feather",None),("feather","lz4"),("feather","zstd")]
+
+
+def write_all(output_format,compression,file_path,chunks):
+    writer = get_prediction_writer(file_path=file_path,output_format=output_format,compression=compression)
+    for chunk in chunks:
+        writer.write(chunk)
+    writer.close()
+    return writer.file_path
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--chunk-size", type=int, default=100_000)
+    args = parser.parse_args()
+
+    #scored frame as start_batch_prediction writes it: input columns as text plus predictions
+    df = synthetic_thyroid_frame(args.rows).astype(str).replace({"?":""})
+    df["prediction"] = np.random.default_rng(0).integers(0,2,len(df)).astype(float)
+    df["cat_pred"] = np.where(df["prediction"]==0,"neg","pos")
+    id_only = df[["prediction","cat_pred"]].copy()
+    id_only.insert(0,"row_id",np.arange(len(df)))
+
+    print(f"{'columns':>8} {'format':>8} {'compression':>12} {'seconds':>9} {'MB':>9}")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for columns,frame in [("all",df),("id+pred",id_only)]:
+            chunks = [frame.iloc[i:i+args.chunk_size] for i in range(0,len(frame),args.chunk_size)]
+            for output_format,compression in CASES:
+                file_path = os.path.join(tmp_dir,f"{columns}_{output_format}_{compression}".replace("+","_"))
+                written_path,seconds = timed(write_all,output_format,compression,file_path,chunks)
+                size = os.path.getsize(written_path)/1e6
+                print(f"{columns:>8} {output_format:>8} {str(compression):>12} {seconds:>9.3f} {size:>9.2f}")
+
+
+if __name__=="__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+Per row overhead of the schema validator checking a chunk before prediction.
+
+A forest, input encoder and scaler are fitted the way DataTransformation and ModelTrainer fit
+them on the cleaned base dataset, rows sampled from the base dataset are read back as text like
+start_batch_prediction reads them, and validation time is compared with the time of scoring
+the same chunk (transform and predict).
+
+Usage: python benchmarks/bench_schema_validator.py [--rows 1000 100000] [--repeat 5]
+"""
+import argparse
+import time
+import numpy as np
+import pandas as pd
+from common import BASE_FILE_PATH, synthetic_thyroid_frame
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.preprocessing import LabelEncoder, OrdinalEncoder, StandardScaler
+from thyroid.config import TARGET_COLUMN
+from thyroid.predictor import ThyroidModel
+from thyroid.schema_validator import SchemaValidator
+from thyroid.utils import missing_data_handler
+
+
+def best_time(func,repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter()-start)
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, nargs="+", default=[1_000,100_000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    df = missing_data_handler(pd.read_csv(BASE_FILE_PATH))
+    categorical = [column for column in df.columns if df[column].dtype=='O' and column!=TARGET_COLUMN]
+    numerical = [column for column in df.columns if df[column].dtype!='O']
+    encoder,scaler = OrdinalEncoder().fit(df[categorical]),StandardScaler().fit(df[numerical])
+    target_encoder = LabelEncoder().fit(df[TARGET_COLUMN])
+    x = np.c_[encoder.transform(df[categorical]),scaler.transform(df[numerical])]
+    model = RandomForestClassifier(random_state=42).fit(x,target_encoder.transform(df[TARGET_COLUMN]))
+    thyroid_model = ThyroidModel(transformer=scaler,input_encoder=encoder,model=model,target_encoder=target_encoder,
+                                 schema_validator=SchemaValidator.from_artifacts(scaler,encoder,numeric_df=df[numerical]))
+
+    print(f"{'rows':>8} {'validate ms':>12} {'us/row':>8} {'predict ms':>11} {'overhead':>9} {'rejected':>9}")
+    for n_rows in args.rows:
+        #read back as text with missing values blanked, the way batch prediction sees a file
+        chunk = synthetic_thyroid_frame(n_rows).astype(str).replace({"?":np.nan})
+        features = chunk.copy()
+        features[numerical] = features[numerical].astype(float)
+        reasons = thyroid_model.validate(chunk)
+        valid = features[reasons.isna().to_numpy()]
+        validate_seconds = best_time(lambda: thyroid_model.validate(chunk),args.repeat)
+        predict_seconds = best_time(lambda: thyroid_model.predict(valid),args.repeat)
+        print(f"{n_rows:>8} {validate_seconds*1000:>12.2f} {validate_seconds/n_rows*1e6:>8.2f} "
+              f"{predict_seconds*1000:>11.2f} {validate_seconds/predict_seconds:>8.1%} {int(reasons.notna().sum()):>9}")
+
+
+if __name__=="__main__":
+    main()
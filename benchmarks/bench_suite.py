@@ -0,0 +1,214 @@
+"""
+End to end benchmark of the train and predict hot paths, with results saved as json and compared
+against a previous run to flag regressions.
+
+Records are generated with common.generate_thyroid_records at the requested scale and served
+from mongomock, every repeat runs in its own temporary directory from an empty model registry:
+
+    missing_data_handler  cleaning of the raw generated frame
+    data_ingestion        mongo export, cleaning and train/test split
+    data_validation       drift report against the base dataset
+    data_transformation   encoders, scaler and resampling
+    model_trainer         hyperparameter search and final fit
+    model_pusher          saves the model, so evaluation has a registry model to compare with
+    model_evaluation      scores the test split with the trained and the registry model
+    batch_prediction      start_batch_prediction of --predict-rows generated rows
+
+Wall time, cpu time, peak rss and rows of every stage are measured with
+thyroid.instrumentation.StageInstrumentation, the median over --repeat runs is saved to
+<results dir>/<timestamp>.json. A stage is flagged as a regression when its wall time is more than
+--tolerance above the baseline and by at least --min-seconds. The baseline is --baseline or the
+latest result in the results dir with the same parameters.
+Needs the packages of requirements-dev.txt (mongomock).
+
+Usage: python benchmarks/bench_suite.py [--rows 20000] [--predict-rows 100000] [--repeat 1]
+       [--search-candidates 2] [--baseline results/<timestamp>.json] [--tolerance 0.2] [--fail-on-regression]
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+from datetime import datetime
+from glob import glob
+import mongomock
+import numpy as np
+from common import BASE_FILE_PATH, ROOT_DIR, generate_thyroid_records
+from thyroid.components.data_ingestion import DataIngestion
+from thyroid.components.data_transformation import DataTransformation
+from thyroid.components.data_validation import DataValidation
+from thyroid.components.model_evaluation import ModelEvaluation
+from thyroid.components.model_pusher import ModelPusher
+from thyroid.components.model_trainer import ModelTrainer
+from thyroid.entity import config_entity
+from thyroid.entity.artifact_entity import ModelEvaluationArtifact
+from thyroid.exception import thyroidException
+from thyroid.instrumentation import StageInstrumentation, count_rows
+from thyroid.pipeline.batch_prediction import start_batch_prediction
+from thyroid.utils import missing_data_handler
+
+STAGES = ["missing_data_handler","data_ingestion","data_validation","data_transformation","model_trainer",
+          "model_pusher","model_evaluation","batch_prediction"]
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)),"results")
+METRICS = ["wall_seconds","cpu_seconds","peak_rss_mb"]
+
+
+def evaluate(model_evaluation):
+    try:
+        return model_evaluation.initiate_model_evaluation()
+    except thyroidException as e:
+        #both models were scored, the registry holds the same model so it is not better
+        if "not better than previous model" not in str(e):
+            raise
+        return ModelEvaluationArtifact(is_model_accepted=False,improved_accuracy=0.0)
+
+
+def run_suite(client,raw_df,predict_file_path,search_candidates):
+    instrumentation = StageInstrumentation(profile_dir="profiles")
+    measure = instrumentation.measure
+    measure("missing_data_handler",lambda: missing_data_handler(raw_df.copy()),rows=len)
+
+    training_pipeline_config = config_entity.TrainingPipelineConfig()
+    data_ingestion_artifact = measure("data_ingestion",lambda: DataIngestion(
+        config_entity.DataIngestionConfig(training_pipeline_config),client=client).initiate_data_ingestion(),
+        rows=lambda artifact: count_rows(artifact.train_file_path,artifact.test_file_path))
+
+    data_validation_config = config_entity.DataValidationConfig(training_pipeline_config)
+    data_validation_config.base_file_path = BASE_FILE_PATH
+    measure("data_validation",lambda: DataValidation(data_validation_config,data_ingestion_artifact).initiate_data_validation(),
+        rows=lambda artifact: count_rows(data_ingestion_artifact.train_file_path,data_ingestion_artifact.test_file_path))
+
+    data_transformation_artifact = measure("data_transformation",lambda: DataTransformation(
+        config_entity.DataTransformationConfig(training_pipeline_config),data_ingestion_artifact).initiate_data_transformation(),
+        rows=lambda artifact: count_rows(artifact.transformed_train_path,artifact.transformed_test_path))
+
+    model_trainer_config = config_entity.ModelTrainerConfig(training_pipeline_config)
+    model_trainer_config.search_candidates = search_candidates
+    model_trainer_artifact = measure("model_trainer",lambda: ModelTrainer(
+        model_trainer_config,data_transformation_artifact).initiate_model_trainer(),
+        rows=lambda artifact: count_rows(data_transformation_artifact.transformed_train_path))
+
+    measure("model_pusher",lambda: ModelPusher(config_entity.ModelPusherConfig(training_pipeline_config),
+        data_transformation_artifact,model_trainer_artifact).initiate_model_pusher())
+    measure("model_evaluation",lambda: evaluate(ModelEvaluation(config_entity.ModelEvaluationConfig(training_pipeline_config),
+        data_ingestion_artifact,data_transformation_artifact,model_trainer_artifact)),
+        rows=lambda artifact: count_rows(data_ingestion_artifact.test_file_path))
+    measure("batch_prediction",lambda: start_batch_prediction(input_file_path=predict_file_path),rows=count_rows)
+    return instrumentation.stages
+
+
+def get_git_commit():
+    try:
+        return subprocess.run(["git","rev-parse","--short","HEAD"],cwd=ROOT_DIR,capture_output=True,
+                              text=True,check=True).stdout.strip()
+    except (OSError,subprocess.CalledProcessError):
+        return None
+
+
+def find_baseline(results_dir,params,exclude=None):
+    for file_path in sorted(glob(os.path.join(results_dir,"*.json")),reverse=True):
+        if file_path==exclude:
+            continue
+        with open(file_path) as file_obj:
+            result = json.load(file_obj)
+        if result.get("params")==params:
+            return file_path
+    return None
+
+
+def compare(result,baseline,tolerance,min_seconds):
+    """
+    returns rows of the comparison table and the stages flagged as regressions
+    """
+    rows,regressions = [],[]
+    for stage in STAGES+["total"]:
+        current = result["stages"][stage]["wall_seconds"] if stage!="total" else result["total_wall_seconds"]
+        previous = baseline["stages"].get(stage,{}).get("wall_seconds") if stage!="total" else baseline["total_wall_seconds"]
+        if previous is None:
+            rows.append((stage,current,None,None,""))
+            continue
+        change = (current-previous)/previous if previous>0 else 0.0
+        is_regression = change>tolerance and current-previous>=min_seconds
+        if is_regression:
+            regressions.append(stage)
+        rows.append((stage,current,previous,change,"REGRESSION" if is_regression else ""))
+    return rows,regressions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=20_000, help="generated records loaded into mongo for training")
+    parser.add_argument("--predict-rows", type=int, default=100_000, help="generated records scored by batch prediction")
+    parser.add_argument("--repeat", type=int, default=1, help="full runs, the median of every metric is saved")
+    parser.add_argument("--search-candidates", type=int, default=2)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--results-dir", default=RESULTS_DIR)
+    parser.add_argument("--baseline", help="result json to compare with, defaults to the latest one with the same parameters")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="relative wall time increase flagged as a regression")
+    parser.add_argument("--min-seconds", type=float, default=0.05, help="smaller wall time increases are never flagged")
+    parser.add_argument("--fail-on-regression", action="store_true", help="exit with status 1 when a stage regressed")
+    args = parser.parse_args()
+    params = {"rows":args.rows,"predict_rows":args.predict_rows,"search_candidates":args.search_candidates,"seed":args.seed}
+
+    client = mongomock.MongoClient()
+    raw_df = generate_thyroid_records(args.rows,seed=args.seed)
+    client["thyroid"]["disease"].insert_many(raw_df.to_dict("records"))
+
+    runs = []
+    cwd = os.getcwd()
+    for repeat in range(args.repeat):
+        with tempfile.TemporaryDirectory() as work_dir:
+            predict_file_path = os.path.join(work_dir,"predict.csv")
+            generate_thyroid_records(args.predict_rows,seed=args.seed+1).drop(columns="status").to_csv(predict_file_path,index=False)
+            os.chdir(work_dir)
+            try:
+                runs.append(run_suite(client=client,raw_df=raw_df,predict_file_path=predict_file_path,
+                                      search_candidates=args.search_candidates))
+            finally:
+                os.chdir(cwd)
+        print(f"run {repeat+1}/{args.repeat}: {round(sum(stage['wall_seconds'] for stage in runs[-1].values()),2)}s")
+
+    stages = {stage:{metric:round(float(np.median([run[stage][metric] for run in runs])),3) for metric in METRICS}
+              for stage in STAGES}
+    for stage in STAGES:
+        stages[stage]["rows"] = runs[-1][stage]["rows"]
+    result = {"created_at":datetime.now().isoformat(),"git_commit":get_git_commit(),"python":platform.python_version(),
+              "platform":platform.platform(),"cpu_count":os.cpu_count(),"repeat":args.repeat,"params":params,
+              "total_wall_seconds":round(sum(stages[stage]["wall_seconds"] for stage in STAGES),3),"stages":stages}
+    os.makedirs(args.results_dir,exist_ok=True)
+    result_file_path = os.path.join(args.results_dir,f"{datetime.now().strftime('%Y%m%d__%H%M%S')}.json")
+    with open(result_file_path,"w") as file_obj:
+        json.dump(result,file_obj,indent=2)
+
+    print(f"{'stage':<22} {'wall s':>9} {'cpu s':>9} {'peak rss mb':>12} {'rows':>9}")
+    for stage in STAGES:
+        metrics = stages[stage]
+        print(f"{stage:<22} {metrics['wall_seconds']:>9.3f} {metrics['cpu_seconds']:>9.3f} "
+              f"{metrics['peak_rss_mb']:>12.1f} {metrics['rows'] if metrics['rows'] is not None else '':>9}")
+    print(f"{'total':<22} {result['total_wall_seconds']:>9.3f}")
+    print(f"results: {result_file_path}")
+
+    baseline_file_path = args.baseline or find_baseline(args.results_dir,params,exclude=result_file_path)
+    if baseline_file_path is None:
+        print("no baseline with the same parameters, nothing to compare")
+        return
+    with open(baseline_file_path) as file_obj:
+        baseline = json.load(file_obj)
+    if baseline.get("params")!=params:
+        print(f"warning: baseline parameters {baseline.get('params')} differ from {params}")
+    rows,regressions = compare(result,baseline,tolerance=args.tolerance,min_seconds=args.min_seconds)
+    print(f"\nbaseline: {baseline_file_path} (commit {baseline.get('git_commit')})")
+    print(f"{'stage':<22} {'wall s':>9} {'baseline s':>11} {'change':>8}")
+    for stage,current,previous,change,flag in rows:
+        print(f"{stage:<22} {current:>9.3f} {'' if previous is None else f'{previous:.3f}':>11} "
+              f"{'' if change is None else f'{change:+.1%}':>8} {flag}")
+    if regressions:
+        print(f"regressions: {regressions}")
+        if args.fail_on_regression:
+            sys.exit(1)
+
+
+if __name__=="__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Wall time of every training pipeline stage with TrainingPipelineConfig n_jobs at 1, 4 and all cores.
+
+The collection is served from mongomock filled with a synthetic frame sampled from the base
+dataset, and every run works in its own temporary directory so each one trains from an empty
+model registry. Core counts above the available cores are skipped.
+
+Usage: python benchmarks/bench_training_pipeline.py [--n-jobs 1 4 -1] [--rows 20000] [--search-candidates 4]
+"""
+import argparse
+import os
+import tempfile
+import time
+import mongomock
+import pandas as pd
+from common import BASE_FILE_PATH, synthetic_thyroid_frame
+from thyroid.components.data_ingestion import DataIngestion
+from thyroid.components.data_transformation import DataTransformation
+from thyroid.components.data_validation import DataValidation
+from thyroid.components.model_evaluation import ModelEvaluation
+from thyroid.components.model_pusher import ModelPusher
+from thyroid.components.model_trainer import ModelTrainer
+from thyroid.entity import config_entity
+from thyroid.utils import resolve_n_jobs
+
+STAGES = ["data_ingestion","data_validation","data_transformation","model_trainer","model_evaluation","model_pusher"]
+
+
+def run_pipeline(client,n_jobs,search_candidates):
+    timings = dict()
+
+    def stage(name,func):
+        start = time.perf_counter()
+        result = func()
+        timings[name] = time.perf_counter()-start
+        return result
+
+    training_pipeline_config = config_entity.TrainingPipelineConfig(n_jobs=n_jobs)
+    data_ingestion_artifact = stage("data_ingestion",lambda: DataIngestion(
+        config_entity.DataIngestionConfig(training_pipeline_config),client=client).initiate_data_ingestion())
+
+    data_validation_config = config_entity.DataValidationConfig(training_pipeline_config)
+    data_validation_config.base_file_path = BASE_FILE_PATH
+    stage("data_validation",lambda: DataValidation(data_validation_config,data_ingestion_artifact).initiate_data_validation())
+
+    data_transformation_artifact = stage("data_transformation",lambda: DataTransformation(
+        config_entity.DataTransformationConfig(training_pipeline_config),data_ingestion_artifact).initiate_data_transformation())
+
+    model_trainer_config = config_entity.ModelTrainerConfig(training_pipeline_config)
+    model_trainer_config.search_candidates = search_candidates
+    model_trainer_artifact = stage("model_trainer",lambda: ModelTrainer(
+        model_trainer_config,data_transformation_artifact).initiate_model_trainer())
+
+    stage("model_evaluation",lambda: ModelEvaluation(config_entity.ModelEvaluationConfig(training_pipeline_config),
+        data_ingestion_artifact,data_transformation_artifact,model_trainer_artifact).initiate_model_evaluation())
+    stage("model_pusher",lambda: ModelPusher(config_entity.ModelPusherConfig(training_pipeline_config),
+        data_transformation_artifact,model_trainer_artifact).initiate_model_pusher())
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--n-jobs", type=int, nargs="+", default=[1,4,-1])
+    parser.add_argument("--rows", type=int, default=20_000)
+    parser.add_argument("--search-candidates", type=int, default=4)
+    args = parser.parse_args()
+
+    client = mongomock.MongoClient()
+    client["thyroid"]["disease"].insert_many(synthetic_thyroid_frame(args.rows).to_dict("records"))
+
+    available = resolve_n_jobs(None)
+    results = dict()
+    cwd = os.getcwd()
+    for n_jobs in args.n_jobs:
+        if n_jobs>available:
+            print(f"skipping n_jobs={n_jobs}, only {available} cores available")
+            continue
+        cores = resolve_n_jobs(n_jobs)
+        if cores in results:
+            continue
+        with tempfile.TemporaryDirectory() as work_dir:
+            os.chdir(work_dir)
+            try:
+                results[cores] = run_pipeline(client=client,n_jobs=cores,search_candidates=args.search_candidates)
+            finally:
+                os.chdir(cwd)
+
+    report = pd.DataFrame(results).reindex(STAGES)
+    report.loc["total"] = report.sum()
+    report.columns = [f"{cores} cores (s)" for cores in report.columns]
+    print(f"rows: {args.rows}, search candidates per model: {args.search_candidates}")
+    print(report.round(2).to_string())
+
+
+if __name__=="__main__":
+    main()
@@ -0,0 +1,78 @@
+import os,sys
+import time
+import pandas as pd
+import numpy as np
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASE_FILE_PATH = os.path.join(ROOT_DIR, "Thyroid-Disease-Data-Set.csv")
+
+#benchmarks run as plain scripts, make the thyroid package importable without an install
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+
+def synthetic_thyroid_frame(n_rows:int, seed:int=42)->pd.DataFrame:
+    """
+    Description: Build a raw (uncleaned) thyroid frame of n_rows by sampling base dataset rows
+    =========================================================
+    Params:
+    n_rows: number of rows to generate
+    seed: random seed for row sampling
+    =========================================================
+    return Pandas dataframe with the same schema as Thyroid-Disease-Data-Set.csv
+    """
+    base_df = pd.read_csv(BASE_FILE_PATH)
+    index = np.random.default_rng(seed).integers(0, len(base_df), size=n_rows)
+    return base_df.iloc[index].reset_index(drop=True)
+
+
+def timed(func, *args, **kwargs):
+    """
+    Run func once and return (result, elapsed seconds).
+    """
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def generate_thyroid_records(n_rows:int, seed:int=42, numeric_noise:float=0.05)->pd.DataFrame:
+    """
+    Description: Generate new raw thyroid records following the schema and class conditional value
+    distributions of the base dataset, so any number of distinct rows can be produced
+    =========================================================
+    Params:
+    n_rows: number of rows to generate
+    seed: random seed, the same seed gives the same frame
+    numeric_noise: standard deviation of the log normal factor applied to lab values and age
+    =========================================================
+    return Pandas dataframe with the same columns, '?' markers and status format as Thyroid-Disease-Data-Set.csv
+    Every column is drawn from the rows of the same class, *_measured flags together with their
+    value, and the status keeps the "<label>|<record id>" format with new record ids.
+    """
+    rng = np.random.default_rng(seed)
+    base_df = pd.read_csv(BASE_FILE_PATH, dtype=str, keep_default_na=False)
+    label = base_df["status"].str.split("|").str[0]
+    groups = [[column] for column in base_df.columns
+              if column!="status" and f"{column}_measured" not in base_df.columns and not column.endswith("_measured")]
+    groups += [[f"{column}_measured", column] for column in base_df.columns if f"{column}_measured" in base_df.columns]
+
+    class_frames = []
+    class_counts = rng.multinomial(n_rows, label.str[:3].value_counts(normalize=True).sort_index().to_numpy())
+    for (_, class_df), n_class in zip(base_df.groupby(label.str[:3], sort=True), class_counts):
+        class_label = label[class_df.index].to_numpy()
+        columns = {"status": class_label[rng.integers(0, len(class_df), size=n_class)]}
+        for group in groups:
+            index = rng.integers(0, len(class_df), size=n_class)
+            for column in group:
+                columns[column] = class_df[column].to_numpy()[index]
+        class_frames.append(pd.DataFrame(columns))
+    df = pd.concat(class_frames, ignore_index=True)
+    df = df.iloc[rng.permutation(len(df))].reset_index(drop=True)
+
+    for column in ["age", "TSH", "T3", "TT4", "T4U", "FTI"]:
+        values = pd.to_numeric(df[column], errors="coerce")
+        noisy = values*rng.lognormal(0, numeric_noise, size=len(df))
+        noisy = noisy.round(0).astype("Int64") if column=="age" else noisy.round(2)
+        df[column] = noisy.astype(str).mask(values.isna(), "?")
+    df["status"] = df["status"]+"|"+pd.RangeIndex(len(df)).astype(str)
+    return df[base_df.columns]
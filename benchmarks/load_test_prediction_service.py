@@ -0,0 +1,62 @@
+"""
+Load test for the online prediction service (app.py).
+
+Sends single record POST /predict requests from concurrent clients and reports p50/p99 latency
+and requests/sec. Records are read from a JSON lines file (one patient record per line); when
+no file is given they are taken from test.csv.
+
+Usage: python benchmarks/load_test_prediction_service.py [--url http://localhost:8000] [--records-file records.jsonl]
+                                                        [--requests 2000] [--concurrency 16]
+"""
+import argparse
+import json
+import os
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+from common import ROOT_DIR
+
+
+def load_records(records_file):
+    if records_file is not None:
+        with open(records_file) as file_obj:
+            return [json.loads(line) for line in file_obj if line.strip()]
+    df = pd.read_csv(os.path.join(ROOT_DIR,"test.csv")).drop("status",axis=1)
+    return json.loads(df.to_json(orient="records"))
+
+
+def post(url,record):
+    data = json.dumps(record).encode()
+    request = urllib.request.Request(url,data=data,headers={"Content-Type":"application/json"})
+    start = time.perf_counter()
+    with urllib.request.urlopen(request) as response:
+        response.read()
+    return time.perf_counter()-start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--records-file", default=None)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    args = parser.parse_args()
+
+    records = load_records(args.records_file)
+    url = f"{args.url}/predict"
+    payloads = [records[i%len(records)] for i in range(args.requests)]
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        latencies = np.array(list(executor.map(lambda record: post(url,record),payloads)))
+    elapsed = time.perf_counter()-start
+
+    print(f"requests: {args.requests} concurrency: {args.concurrency}")
+    print(f"p50: {np.percentile(latencies,50)*1000:.2f} ms p99: {np.percentile(latencies,99)*1000:.2f} ms")
+    print(f"requests/sec: {args.requests/elapsed:,.0f}")
+
+
+if __name__=="__main__":
+    main()
@@ -1,8 +1,5 @@
-import pymongo
-import pandas as pd
-import json
-
-from thyroid.config import mongo_client
+from thyroid.bulk_loader import load_csv_to_collection, LOADER_CHUNK_SIZE, LOADER_BATCH_SIZE, LOADER_WRITERS
+import argparse
 
 DATA_FILE_PATH="/config/workspace/Thyroid-Disease-Data-Set.csv"
 
@@ -10,13 +7,19 @@ DATABASE_NAME="thyroid"
 COLLECTION_NAME="disease"
 
 if __name__=="__main__":
-    df = pd.read_csv(DATA_FILE_PATH)
-    print(f"Rows and columns: {df.shape}")
-
-    #Convert dataframe to json so that we can dump these record in mongo db
-    df.reset_index(drop=True,inplace=True)
+    parser = argparse.ArgumentParser(description="Load a csv file into mongo db")
+    parser.add_argument("--file",default=DATA_FILE_PATH)
+    parser.add_argument("--database",default=DATABASE_NAME)
+    parser.add_argument("--collection",default=COLLECTION_NAME)
+    parser.add_argument("--upsert",action="store_true",help="replace documents with the same row key, reloading a file is idempotent")
+    parser.add_argument("--key-columns",nargs="+",default=None,help="columns forming the row key, defaults to file name and row number")
+    parser.add_argument("--chunk-size",type=int,default=LOADER_CHUNK_SIZE)
+    parser.add_argument("--batch-size",type=int,default=LOADER_BATCH_SIZE)
+    parser.add_argument("--writers",type=int,default=LOADER_WRITERS)
+    args = parser.parse_args()
 
-    json_record = list(json.loads(df.T.to_json()).values())
-    print(json_record[0])
-    #insert converted json record to mongo db
-    mongo_client[DATABASE_NAME][COLLECTION_NAME].insert_many(json_record)
+    stats = load_csv_to_collection(file_path=args.file,database_name=args.database,collection_name=args.collection,
+                                   upsert=args.upsert,key_columns=args.key_columns,chunk_size=args.chunk_size,
+                                   batch_size=args.batch_size,n_writers=args.writers)
+    print(f"Loaded {stats['documents']} documents in {stats['seconds']}s ({stats['docs_per_sec']} docs/sec), "
+          f"inserted: {stats['inserted']}, upserted: {stats['upserted']}, modified: {stats['modified']}")
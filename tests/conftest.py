@@ -0,0 +1,53 @@
+import os,sys
+import pandas as pd
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.preprocessing import LabelEncoder, OrdinalEncoder
+from thyroid.components.data_transformation import DataTransformation
+from thyroid.config import TARGET_COLUMN
+from thyroid.entity.config_entity import THYROID_MODEL_FILE_NAME
+from thyroid.predictor import ThyroidModel, model_cache
+from thyroid.schema_validator import SchemaValidator
+from thyroid.utils import missing_data_handler, save_object
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATASET_FILE_PATH = os.path.join(ROOT_DIR,"Thyroid-Disease-Data-Set.csv")
+#baseline implementations the benchmarks and the equivalence tests share (benchmarks/_legacy.py)
+sys.path.insert(0,os.path.join(ROOT_DIR,"benchmarks"))
+
+
+@pytest.fixture(scope="session")
+def raw_df():
+    return pd.read_csv(DATASET_FILE_PATH)
+
+
+@pytest.fixture(scope="session")
+def clean_df(raw_df):
+    return missing_data_handler(raw_df.copy())
+
+
+@pytest.fixture(scope="session")
+def thyroid_model(clean_df):
+    #fitted the way data transformation and model pusher do, with a small forest
+    cat_columns = [column for column in clean_df.columns if clean_df[column].dtype=="O" and column!=TARGET_COLUMN]
+    num_columns = [column for column in clean_df.columns if clean_df[column].dtype!="O"]
+    input_encoder = OrdinalEncoder().fit(clean_df[cat_columns])
+    transformer = DataTransformation.get_data_transformer_object().fit(clean_df[num_columns])
+    target_encoder = LabelEncoder().fit(clean_df[TARGET_COLUMN])
+    model = ThyroidModel(transformer=transformer,input_encoder=input_encoder,model=None,target_encoder=target_encoder,
+                         schema_validator=SchemaValidator.from_artifacts(transformer=transformer,input_encoder=input_encoder,
+                                                                         numeric_df=clean_df[num_columns]))
+    model.model = RandomForestClassifier(n_estimators=5,random_state=42).fit(
+        model.transform(clean_df),target_encoder.transform(clean_df[TARGET_COLUMN]))
+    return model
+
+
+@pytest.fixture
+def model_registry(tmp_path,monkeypatch,thyroid_model):
+    """
+    Runs the test in an empty directory holding saved_models/0 with the thyroid model
+    """
+    monkeypatch.chdir(tmp_path)
+    save_object(file_path=os.path.join("saved_models","0","thyroid_model",THYROID_MODEL_FILE_NAME),obj=thyroid_model)
+    yield os.path.join(tmp_path,"saved_models")
+    model_cache.invalidate()
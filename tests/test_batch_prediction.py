@@ -0,0 +1,73 @@
+import os
+import numpy as np
+import pandas as pd
+import pytest
+import yaml
+from thyroid.config import TARGET_COLUMN, numeric_features
+from thyroid.pipeline.batch_prediction import start_batch_prediction, start_parallel_batch_prediction
+from thyroid.utils import resolve_n_jobs
+
+CHUNK_SIZE = 50
+
+
+def read_prediction(file_path,output_format):
+    return pd.read_parquet(file_path) if output_format=="parquet" else pd.read_feather(file_path)
+
+
+def write_input(raw_df,thyroid_model,invalid_chunks,n_chunks=3):
+    """
+    csv of n_chunks chunks of CHUNK_SIZE valid rows, every row of the chunks in invalid_chunks gets a non numeric age
+    """
+    df = raw_df.drop(columns=[TARGET_COLUMN])
+    df = df[thyroid_model.validate(df.replace({"?":np.nan})).isna()].head(CHUNK_SIZE*n_chunks).copy()
+    for chunk in invalid_chunks:
+        df.iloc[chunk*CHUNK_SIZE:(chunk+1)*CHUNK_SIZE,df.columns.get_loc("age")] = "abc"
+    df.to_csv("input.csv",index=False)
+    return df
+
+
+@pytest.mark.parametrize("output_format",["parquet","feather"])
+@pytest.mark.parametrize("invalid_chunk",[0,1,2])
+def test_fully_rejected_chunk_does_not_break_columnar_output(model_registry,raw_df,thyroid_model,output_format,invalid_chunk):
+    write_input(raw_df,thyroid_model,invalid_chunks=[invalid_chunk])
+    prediction_file_path = start_batch_prediction(input_file_path="input.csv",chunk_size=CHUNK_SIZE,output_format=output_format)
+
+    df = read_prediction(prediction_file_path,output_format)
+    assert len(df)==2*CHUNK_SIZE
+    assert df[["prediction","cat_pred"]].notna().all().all()
+    for column in numeric_features:
+        assert df[column].dtype=="float64"
+    rejected = pd.read_csv(os.path.splitext(prediction_file_path)[0]+"_rejected.csv")
+    assert len(rejected)==CHUNK_SIZE
+    assert rejected["reject_reason"].str.startswith("age: not numeric").all()
+
+
+@pytest.mark.parametrize("output_format",["parquet","feather"])
+def test_every_row_rejected_still_creates_columnar_output(model_registry,raw_df,thyroid_model,output_format):
+    write_input(raw_df,thyroid_model,invalid_chunks=[0,1,2])
+    prediction_file_path = start_batch_prediction(input_file_path="input.csv",chunk_size=CHUNK_SIZE,
+                                                  output_format=output_format)
+    assert len(read_prediction(prediction_file_path,output_format))==0
+
+
+def test_columnar_output_matches_csv(model_registry,raw_df,thyroid_model):
+    write_input(raw_df,thyroid_model,invalid_chunks=[1])
+    csv_df = pd.read_csv(start_batch_prediction(input_file_path="input.csv",chunk_size=CHUNK_SIZE,output_format="csv"))
+    parquet_df = pd.read_parquet(start_batch_prediction(input_file_path="input.csv",chunk_size=CHUNK_SIZE,
+                                                        output_format="parquet"))
+    #csv is read back with type inference, blank text as NaN
+    pd.testing.assert_frame_equal(csv_df,parquet_df.replace({"":np.nan}),check_dtype=False)
+
+
+def test_parallel_workers_follow_resolve_n_jobs(model_registry,raw_df,thyroid_model):
+    write_input(raw_df,thyroid_model,invalid_chunks=[])
+    with open("input.csv") as file_obj:
+        text = file_obj.read()
+    for name in ["first.csv","second.csv"]:
+        with open(name,"w") as file_obj:
+            file_obj.write(text)
+    #-1 is every available core, capped by the number of files
+    with open(start_parallel_batch_prediction(["first.csv","second.csv"],n_workers=-1,chunk_size=CHUNK_SIZE)) as file_obj:
+        manifest = yaml.safe_load(file_obj)
+    assert manifest["n_workers"]==min(resolve_n_jobs(),2)
+    assert [result["status"] for result in manifest["files"]]==["success","success"]
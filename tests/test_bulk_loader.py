@@ -0,0 +1,35 @@
+import mongomock
+from thyroid.bulk_loader import load_csv_to_collection
+
+
+def load(client,file_path,**kwargs)->dict:
+    return load_csv_to_collection(file_path=file_path,database_name="thyroid",collection_name="disease",client=client,
+                                  chunk_size=300,batch_size=70,n_writers=3,**kwargs)
+
+
+def test_upsert_reload_is_idempotent(tmp_path,raw_df):
+    client = mongomock.MongoClient()
+    collection = client["thyroid"]["disease"]
+    file_path = str(tmp_path/"records.csv")
+    df = raw_df.head(1000)
+    df.to_csv(file_path,index=False)
+
+    stats = load(client,file_path,upsert=True)
+    assert stats["documents"]==stats["upserted"]==1000 and collection.count_documents({})==1000
+    stats = load(client,file_path,upsert=True)
+    assert stats["upserted"]==0 and collection.count_documents({})==1000
+
+    #a changed row replaces its document, found by its row key
+    df.assign(age=df["age"].where(df.index!=5,"99")).to_csv(file_path,index=False)
+    load(client,file_path,upsert=True)
+    assert collection.count_documents({})==1000
+    assert collection.find_one({"_id":"records.csv:5"})["age"]==99
+
+
+def test_insert_reload_duplicates(tmp_path,raw_df):
+    client = mongomock.MongoClient()
+    file_path = str(tmp_path/"records.csv")
+    raw_df.head(100).to_csv(file_path,index=False)
+    load(client,file_path)
+    assert load(client,file_path)["inserted"]==100
+    assert client["thyroid"]["disease"].count_documents({})==200
@@ -0,0 +1,37 @@
+import numpy as np
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+from thyroid.compiled_forest import CompiledForest
+from thyroid.components.model_trainer import ModelTrainer
+
+
+@pytest.fixture(scope="module")
+def forest_data():
+    random_generator = np.random.default_rng(0)
+    x = random_generator.normal(size=(2000,6))
+    y = (x[:,0]+x[:,1]*x[:,2]+random_generator.normal(scale=0.5,size=len(x))>0).astype(float)
+    #missing values while training and scoring, the trees learn on which side NaN goes
+    x[random_generator.random(x.shape)<0.1] = np.nan
+    model = RandomForestClassifier(n_estimators=30,random_state=42).fit(x[:1500],y[:1500])
+    return model,x[1500:]
+
+
+def test_compiled_forest_matches_sklearn(forest_data):
+    model,x = forest_data
+    compiled_model = CompiledForest.from_sklearn(model)
+    x = np.r_[x,np.full((1,x.shape[1]),np.nan)]
+    assert np.isnan(x).any(axis=1).sum()>100
+    assert np.array_equal(compiled_model.predict(x),model.predict(x))
+    assert np.array_equal(compiled_model.predict_proba(x),model.predict_proba(x))
+    #single rows, the online batch size
+    for row in x[:20]:
+        assert np.array_equal(compiled_model.predict(row[np.newaxis]),model.predict(row[np.newaxis]))
+
+
+def test_mismatching_compiled_forest_is_not_exported(forest_data,monkeypatch):
+    model,x = forest_data
+    monkeypatch.setattr(CompiledForest,"predict",lambda self,x: np.zeros(len(x)))
+    model_trainer = ModelTrainer.__new__(ModelTrainer)
+    y_pred = model.predict(x)
+    assert y_pred.any()
+    assert model_trainer.export_model(model=model,x=x,y_pred=y_pred) is None
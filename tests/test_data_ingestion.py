@@ -0,0 +1,94 @@
+import os
+import mongomock
+import pandas as pd
+import pytest
+import yaml
+from thyroid.bulk_loader import load_csv_to_collection
+from thyroid.components.data_ingestion import DataIngestion
+from thyroid.config import LOADER_TIMESTAMP_FIELD
+from thyroid.entity.config_entity import DataIngestionConfig, TrainingPipelineConfig
+
+
+@pytest.fixture
+def client(tmp_path,monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    return mongomock.MongoClient()
+
+
+@pytest.fixture
+def records(raw_df):
+    #record_id passes cleaning unchanged, so rows can be followed into the train and test files
+    return raw_df.head(1500).assign(record_id=range(1500))
+
+
+def load(client,df:pd.DataFrame,upsert:bool=True)->None:
+    df.to_csv("records.csv",index=False)
+    load_csv_to_collection(file_path="records.csv",database_name="thyroid",collection_name="disease",upsert=upsert,
+                           key_columns=["record_id"],client=client)
+
+
+def ingest(client,**settings)->DataIngestionConfig:
+    data_ingestion_config = DataIngestionConfig(training_pipeline_config=TrainingPipelineConfig(n_jobs=1))
+    for name,value in settings.items():
+        setattr(data_ingestion_config,name,value)
+    DataIngestion(data_ingestion_config=data_ingestion_config,client=client).initiate_data_ingestion()
+    return data_ingestion_config
+
+
+def get_split(data_ingestion_config:DataIngestionConfig):
+    return [set(pd.read_csv(file_path)["record_id"])
+            for file_path in [data_ingestion_config.train_file_path,data_ingestion_config.test_file_path]]
+
+
+def test_streaming_feature_store_matches_in_memory(client,records):
+    load(client,records.drop(columns=["record_id"]),upsert=False)
+    in_memory = pd.read_csv(ingest(client,streaming=False).feature_store_file_path)
+    streaming = pd.read_csv(ingest(client,streaming=True).feature_store_file_path)
+    pd.testing.assert_frame_equal(streaming,in_memory)
+
+
+def test_incremental_reruns_keep_splits(client,records):
+    load(client,records.head(1000))
+    data_ingestion_config = ingest(client,incremental=True,watermark_field=LOADER_TIMESTAMP_FIELD)
+    train_ids,test_ids = get_split(data_ingestion_config)
+
+    load(client,records)
+    data_ingestion_config = ingest(client,incremental=True,watermark_field=LOADER_TIMESTAMP_FIELD)
+    new_train_ids,new_test_ids = get_split(data_ingestion_config)
+    assert train_ids<=new_train_ids and test_ids<=new_test_ids
+    assert len(new_train_ids|new_test_ids)==len(records)
+
+    #nothing changed, the store is not rewritten and the split stays the same
+    store_mtime = os.path.getmtime(data_ingestion_config.incremental_store_file_path)
+    data_ingestion_config = ingest(client,incremental=True,watermark_field=LOADER_TIMESTAMP_FIELD)
+    assert os.path.getmtime(data_ingestion_config.incremental_store_file_path)==store_mtime
+    assert get_split(data_ingestion_config)==[new_train_ids,new_test_ids]
+
+
+def test_documents_stamped_with_the_watermark_after_a_run_are_ingested(client,records):
+    load(client,records.head(1000))
+    ingest(client,incremental=True,watermark_field=LOADER_TIMESTAMP_FIELD)
+    #the rest of a bulk load still writing when the run saved its watermark, with the same timestamp
+    collection = client["thyroid"]["disease"]
+    loaded_at = collection.find_one()[LOADER_TIMESTAMP_FIELD]
+    late_documents = records.iloc[1000:1100].astype(object).where(records.iloc[1000:1100].notna(),None).to_dict("records")
+    collection.insert_many([dict(document,**{"_id":str(document["record_id"]),LOADER_TIMESTAMP_FIELD:loaded_at})
+                            for document in late_documents])
+
+    train_ids,test_ids = get_split(ingest(client,incremental=True,watermark_field=LOADER_TIMESTAMP_FIELD))
+    assert train_ids|test_ids==set(range(1100))
+
+
+def test_watermark_field_change_reloads_collection(client,records):
+    load(client,records.head(1000))
+    data_ingestion_config = ingest(client,incremental=True,watermark_field="_id")
+    data_ingestion = DataIngestion(data_ingestion_config=data_ingestion_config,client=client)
+    assert data_ingestion.load_watermark() is not None
+
+    data_ingestion_config.watermark_field = LOADER_TIMESTAMP_FIELD
+    assert data_ingestion.load_watermark() is None
+    data_ingestion.initiate_data_ingestion()
+    with open(data_ingestion_config.watermark_file_path) as file_obj:
+        assert yaml.safe_load(file_obj)["field"]==LOADER_TIMESTAMP_FIELD
+    train_ids,test_ids = get_split(data_ingestion_config)
+    assert train_ids|test_ids==set(range(1000))
@@ -0,0 +1,45 @@
+import numpy as np
+import pandas as pd
+import pytest
+from scipy.stats import chisquare, ks_2samp
+from thyroid.drift import DriftEngine
+
+N_COLUMNS = ["TSH","age"]
+C_COLUMNS = ["sex","referral_source"]
+
+
+@pytest.fixture
+def base_and_current(clean_df):
+    base_df = clean_df.sample(frac=0.5,random_state=0)
+    current_df = clean_df.drop(base_df.index)
+    #shifted values, some of them between and beyond the base values
+    current_df = current_df.assign(age=current_df["age"]*1.1,TSH=current_df["TSH"].round(1))
+    return base_df,current_df
+
+
+def test_ks_matches_scipy(base_and_current):
+    base_df,current_df = base_and_current
+    report = DriftEngine.from_frame(base_df,numeric_columns=N_COLUMNS,categorical_columns=[]).compare([current_df])
+    for column in N_COLUMNS:
+        expected = ks_2samp(base_df[column],current_df[column],method="asymp")
+        assert report[column]["statistic"]==pytest.approx(expected.statistic,abs=1e-12)
+        assert report[column]["pvalues"]==pytest.approx(expected.pvalue,rel=1e-9,abs=1e-300)
+
+
+def test_chi_square_matches_scipy(base_and_current):
+    base_df,current_df = base_and_current
+    report = DriftEngine.from_frame(base_df,numeric_columns=[],categorical_columns=C_COLUMNS).compare([current_df])
+    for column in C_COLUMNS:
+        categories = sorted(base_df[column].unique())
+        observed = current_df[column].value_counts().reindex(categories,fill_value=0)
+        expected = base_df[column].value_counts(normalize=True).reindex(categories)*observed.sum()
+        statistic,pvalue = chisquare(observed,expected)
+        assert report[column]["statistic"]==pytest.approx(statistic)
+        assert report[column]["pvalues"]==pytest.approx(pvalue)
+
+
+def test_chunked_compare_matches_single_chunk(base_and_current):
+    base_df,current_df = base_and_current
+    drift_engine = DriftEngine.from_frame(base_df,numeric_columns=N_COLUMNS,categorical_columns=C_COLUMNS)
+    chunks = [current_df.iloc[start:start+101] for start in range(0,len(current_df),101)]
+    assert drift_engine.compare(chunks)==drift_engine.compare([current_df])
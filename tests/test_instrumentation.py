@@ -0,0 +1,35 @@
+import time
+import pytest
+import yaml
+from thyroid.exception import thyroidException
+from thyroid.instrumentation import StageInstrumentation
+
+
+def test_stages_are_timed_in_run_order(tmp_path):
+    instrumentation = StageInstrumentation(profile_dir=str(tmp_path/"profiles"),profile_stages=[])
+    assert instrumentation.measure("sleep",lambda: time.sleep(0.2) or [1,2,3],rows=len)==[1,2,3]
+    instrumentation.measure("busy",lambda: sum(i*i for i in range(2_000_000)))
+    sleep,busy = instrumentation.stages["sleep"],instrumentation.stages["busy"]
+    assert sleep["rows"]==3 and busy["rows"] is None
+    #sleeping takes wall time but next to no cpu time
+    assert sleep["wall_seconds"]>=0.2 and sleep["cpu_seconds"]<0.1
+    assert busy["cpu_seconds"]>0 and busy["peak_rss_mb"]>0
+    report = instrumentation.to_dict()
+    assert report["stage_order"]==["sleep","busy"]
+    assert report["total_wall_seconds"]==pytest.approx(sleep["wall_seconds"]+busy["wall_seconds"],abs=0.002)
+    assert not (tmp_path/"profiles").exists()
+
+
+def test_failed_stage_is_recorded_and_written(tmp_path):
+    instrumentation = StageInstrumentation(profile_dir=str(tmp_path/"profiles"),profile_stages=["fail"])
+    def fail():
+        raise ValueError("bad input")
+    with pytest.raises(thyroidException):
+        instrumentation.measure("fail",fail)
+    metrics = instrumentation.stages["fail"]
+    assert metrics["status"]=="failed" and "bad input" in metrics["error"]
+    assert (tmp_path/"profiles"/"fail.prof").exists()
+    report_path = tmp_path/"report"/"stages.yaml"
+    instrumentation.write(str(report_path))
+    with open(report_path) as file_obj:
+        assert yaml.safe_load(file_obj)["stages"]["fail"]["status"]=="failed"
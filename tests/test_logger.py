@@ -0,0 +1,33 @@
+import logging
+import multiprocessing
+import os
+from thyroid import logger
+
+
+def test_mutable_arguments_are_logged_as_they_were():
+    values = [1,2]
+    record = logging.LogRecord("root",logging.INFO,__file__,1,"values: %s",(values,),None)
+    prepared = logger.queue_handler.prepare(record)
+    values.append(3)
+    assert prepared.msg=="values: [1, 2]" and prepared.args is None
+    assert prepared.getMessage()=="values: [1, 2]"
+    #the record other handlers see is left unchanged
+    assert record.args==(values,)
+
+
+def log_in_child(message):
+    logging.info(message)
+
+
+def test_child_processes_write_their_own_log_file(tmp_path,monkeypatch):
+    monkeypatch.setattr(logger,"LOG_FILE_PATH",str(tmp_path/"run.log"))
+    context = multiprocessing.get_context("fork")
+    processes = [context.Process(target=log_in_child,args=(f"child {index}",)) for index in range(2)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    for index,process in enumerate(processes):
+        with open(tmp_path/f"run_{process.pid}.log") as file_obj:
+            assert f"child {index}" in file_obj.read()
+    assert not os.path.exists(tmp_path/"run.log")
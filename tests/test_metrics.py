@@ -0,0 +1,48 @@
+import re
+from fastapi.testclient import TestClient
+from thyroid.config import TARGET_COLUMN
+from thyroid.metrics import PROMETHEUS_CONTENT_TYPE, Counter, Histogram, MetricsRegistry
+from thyroid.pipeline.prediction_service import PredictionService, create_app
+
+
+def service_rows_scored(text:str)->float:
+    match = re.search(r'thyroid_prediction_rows_scored_total\{source="service"\} (\S+)',text)
+    return float(match.group(1)) if match else 0
+
+
+def test_histogram_and_counter_exposition_format():
+    registry = MetricsRegistry()
+    histogram = registry.register(Histogram("phase_seconds","Seconds per phase",label_names=["phase"],buckets=[0.1,1]))
+    counter = registry.register(Counter("rows_total","Rows scored",label_names=["source"]))
+    for value in [0.05,0.5,0.5,3]:
+        histogram.observe(value,phase="predict")
+    counter.inc(5,source="batch")
+    assert registry.render().splitlines()==[
+        "# HELP phase_seconds Seconds per phase",
+        "# TYPE phase_seconds histogram",
+        'phase_seconds_bucket{phase="predict",le="0.1"} 1',
+        'phase_seconds_bucket{phase="predict",le="1"} 3',
+        'phase_seconds_bucket{phase="predict",le="+Inf"} 4',
+        'phase_seconds_sum{phase="predict"} 4.05',
+        'phase_seconds_count{phase="predict"} 4',
+        "# HELP rows_total Rows scored",
+        "# TYPE rows_total counter",
+        'rows_total{source="batch"} 5',
+    ]
+
+
+def test_metrics_endpoint_counts_scored_rows(model_registry,raw_df):
+    records = raw_df.drop(columns=[TARGET_COLUMN]).head(3).to_dict("records")
+    with TestClient(create_app(PredictionService(model_registry=model_registry))) as client:
+        before = client.get("/metrics").text
+        assert client.post("/predict",json=records).status_code==200
+        response = client.get("/metrics")
+    assert response.headers["content-type"]==PROMETHEUS_CONTENT_TYPE
+    text = response.text
+    assert "# TYPE thyroid_prediction_phase_seconds histogram" in text
+    assert "# TYPE thyroid_prediction_rows_scored_total counter" in text
+    for phase in ["validate","predict"]:
+        assert f'thyroid_prediction_phase_seconds_bucket{{phase="{phase}",le="+Inf"}}' in text
+        assert f'thyroid_prediction_phase_seconds_sum{{phase="{phase}"}}' in text
+        assert f'thyroid_prediction_phase_seconds_count{{phase="{phase}"}}' in text
+    assert service_rows_scored(text)-service_rows_scored(before)==3
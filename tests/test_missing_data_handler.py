@@ -0,0 +1,19 @@
+import pandas as pd
+import pytest
+from _legacy import legacy_missing_data_handler
+from thyroid.utils import MissingDataImputer, missing_data_handler, prepare_raw_frame
+
+
+def test_missing_data_handler_matches_legacy(raw_df):
+    pd.testing.assert_frame_equal(missing_data_handler(raw_df.copy()),legacy_missing_data_handler(raw_df.copy()),
+                                  check_dtype=False)
+
+
+@pytest.mark.parametrize("chunk_size",[50,97,1000])
+def test_chunked_imputer_matches_single_pass(raw_df,clean_df,chunk_size):
+    chunks = [prepare_raw_frame(df=raw_df.iloc[start:start+chunk_size]) for start in range(0,len(raw_df),chunk_size)]
+    imputer = MissingDataImputer()
+    for chunk in chunks:
+        imputer.partial_fit(chunk)
+    df = pd.concat([imputer.transform(chunk) for chunk in chunks])
+    pd.testing.assert_frame_equal(df,clean_df)
@@ -0,0 +1,28 @@
+import os
+from thyroid.entity.config_entity import THYROID_MODEL_FILE_NAME
+from thyroid.predictor import ModelCache, ModelResolver
+from thyroid.utils import save_object
+
+
+def test_object_reloaded_only_when_file_changes(model_registry):
+    model_cache = ModelCache()
+    file_path = os.path.join(model_registry,"0","thyroid_model",THYROID_MODEL_FILE_NAME)
+    thyroid_model = model_cache.load_object(file_path)
+    assert model_cache.load_object(file_path) is thyroid_model
+
+    mtime = os.path.getmtime(file_path)
+    os.utime(file_path,(mtime+10,mtime+10))
+    assert model_cache.load_object(file_path) is not thyroid_model
+
+
+def test_new_version_drops_previous_one(model_registry,thyroid_model):
+    model_cache = ModelCache()
+    model_resolver = ModelResolver(model_registry=model_registry)
+    loaded_model = model_cache.load_latest(model_resolver=model_resolver)
+    assert model_cache.load_latest(model_resolver=model_resolver).thyroid_model is loaded_model.thyroid_model
+
+    save_object(file_path=os.path.join(model_registry,"1","thyroid_model",THYROID_MODEL_FILE_NAME),obj=thyroid_model)
+    new_loaded_model = model_cache.load_latest(model_resolver=model_resolver)
+    assert new_loaded_model.version_dir.endswith(os.path.join("saved_models","1"))
+    assert new_loaded_model.thyroid_model is not loaded_model.thyroid_model
+    assert all(not path.startswith(os.path.join(loaded_model.version_dir,"")) for path in model_cache.objects)
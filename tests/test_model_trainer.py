@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+from thyroid.components.model_trainer import ModelTrainer
+from thyroid.entity.artifact_entity import DataTransformationArtifact
+from thyroid.entity.config_entity import ModelTrainerConfig, TrainingPipelineConfig
+from thyroid.exception import thyroidException
+from thyroid.utils import save_numpy_array_data
+
+
+def make_split(random_generator,n_rows,leak:bool,test:bool):
+    """
+    Rows whose label follows a signal column with 10% flipped labels. With leak the training rows
+    also hold the label itself, the test rows only the signal, so a model fitting it overfits.
+    """
+    x = random_generator.normal(size=(n_rows,4))
+    signal = (x[:,0]>0.5).astype(float)
+    y = np.where(random_generator.random(n_rows)<0.1,1-signal,signal)
+    if leak:
+        x = np.c_[x,signal if test else y]
+    return np.c_[x,y]
+
+
+@pytest.fixture
+def model_trainer(tmp_path,monkeypatch):
+    def build(leak:bool):
+        monkeypatch.chdir(tmp_path)
+        random_generator = np.random.default_rng(0)
+        save_numpy_array_data(str(tmp_path/"train.npz"),make_split(random_generator,2000,leak=leak,test=False))
+        save_numpy_array_data(str(tmp_path/"test.npz"),make_split(random_generator,1000,leak=leak,test=True))
+        model_trainer_config = ModelTrainerConfig(training_pipeline_config=TrainingPipelineConfig(n_jobs=1))
+        model_trainer_config.fine_tune = False
+        artifact = DataTransformationArtifact(transform_object_path="",transformed_train_path=str(tmp_path/"train.npz"),
+                                              transformed_test_path=str(tmp_path/"test.npz"),input_encoder_path="",target_encoder_path="",
+                                              resampling="class_weight",schema_validator_path="")
+        return ModelTrainer(model_trainer_config=model_trainer_config,data_transformation_artifact=artifact)
+    return build
+
+
+def test_model_generalizing_to_test_set_is_accepted(model_trainer):
+    model_trainer_artifact = model_trainer(leak=False).initiate_model_trainer()
+    assert model_trainer_artifact.f1_test_score>0.7
+
+
+def test_overfit_model_is_rejected(model_trainer):
+    with pytest.raises(thyroidException,match="overfitting threshold"):
+        model_trainer(leak=True).initiate_model_trainer()
@@ -0,0 +1,64 @@
+import asyncio
+import numpy as np
+import pytest
+from thyroid.config import TARGET_COLUMN
+from thyroid.exception import InvalidInputError
+from thyroid.pipeline.prediction_service import MicroBatcher, PredictionService
+
+
+@pytest.fixture
+def service(model_registry):
+    service = PredictionService(model_registry=model_registry)
+    service.refresh()
+    return service
+
+
+@pytest.fixture
+def records(raw_df,thyroid_model):
+    df = raw_df.drop(columns=[TARGET_COLUMN])
+    df = df[thyroid_model.validate(df.replace({"?":np.nan})).isna()].head(8)
+    return df.to_dict("records")
+
+
+def test_invalid_request_fails_alone_and_others_share_one_model_call(service,records,monkeypatch):
+    requests = [records[:3],[dict(records[3],age="abc")],[records[4]],
+                [{key:value for key,value in records[5].items() if key!="TSH"}],records[6:]]
+    expected = service.predict_requests([records[:3]+[records[4]]+records[6:]])[0]
+    model_calls = []
+    predict = service.loaded_model.predict
+    monkeypatch.setattr(service.loaded_model,"predict",lambda df: model_calls.append(len(df)) or predict(df))
+
+    async def submit_all():
+        batcher = MicroBatcher(predict_func=service.predict_requests,max_wait=0.05)
+        task = asyncio.create_task(batcher.run())
+        try:
+            return await asyncio.gather(*[batcher.submit(request) for request in requests],return_exceptions=True)
+        finally:
+            task.cancel()
+
+    results = asyncio.run(submit_all())
+    assert model_calls==[len(expected)]
+    assert isinstance(results[1],InvalidInputError) and "age: not numeric" in str(results[1])
+    assert isinstance(results[3],InvalidInputError) and "missing columns: ['TSH']" in str(results[3])
+    assert results[0]+results[2]+results[4]==expected
+
+
+def test_batches_are_capped_by_records(service,records):
+    batch_sizes = []
+
+    def predict_requests(requests):
+        batch_sizes.append(sum(len(request) for request in requests))
+        return service.predict_requests(requests)
+
+    async def submit_all():
+        batcher = MicroBatcher(predict_func=predict_requests,max_batch_size=4,max_wait=0.05)
+        task = asyncio.create_task(batcher.run())
+        try:
+            return await asyncio.gather(*[batcher.submit(records[start:start+3]) for start in [0,3]]+
+                                        [batcher.submit(records[:1]) for _ in range(3)])
+        finally:
+            task.cancel()
+
+    results = asyncio.run(submit_all())
+    assert [len(result) for result in results]==[3,3,1,1,1]
+    assert max(batch_sizes)<=4 and sum(batch_sizes)==9
@@ -0,0 +1,37 @@
+import os
+import pytest
+import yaml
+from thyroid import reference_profile
+from thyroid.reference_profile import ReferenceProfile, get_reference_profile_path, load_reference_profile
+
+
+@pytest.fixture
+def base_file_path(tmp_path,raw_df):
+    file_path = str(tmp_path/"base.csv")
+    raw_df.head(500).to_csv(file_path,index=False)
+    return file_path
+
+
+def test_saved_profile_is_reused(tmp_path,base_file_path,monkeypatch):
+    profile = load_reference_profile(base_file_path=base_file_path,profile_dir=str(tmp_path/"profiles"))
+    assert os.path.exists(get_reference_profile_path(base_file_path,str(tmp_path/"profiles")))
+
+    def from_file(base_file_path):
+        raise AssertionError("profile rebuilt")
+    monkeypatch.setattr(ReferenceProfile,"from_file",from_file)
+    assert load_reference_profile(base_file_path=base_file_path,profile_dir=str(tmp_path/"profiles")).to_dict()==profile.to_dict()
+
+
+def test_profile_rebuilt_for_new_version_or_base_file(tmp_path,base_file_path,raw_df,monkeypatch):
+    profile_dir = str(tmp_path/"profiles")
+    load_reference_profile(base_file_path=base_file_path,profile_dir=profile_dir)
+
+    monkeypatch.setattr(reference_profile,"PROFILE_VERSION",reference_profile.PROFILE_VERSION+1)
+    load_reference_profile(base_file_path=base_file_path,profile_dir=profile_dir)
+    with open(get_reference_profile_path(base_file_path,profile_dir)) as file_obj:
+        assert yaml.safe_load(file_obj)["version"]==reference_profile.PROFILE_VERSION
+
+    #a changed base file gets a profile of its own
+    raw_df.head(400).to_csv(base_file_path,index=False)
+    load_reference_profile(base_file_path=base_file_path,profile_dir=profile_dir)
+    assert len(os.listdir(profile_dir))==2
@@ -0,0 +1,24 @@
+import numpy as np
+import pandas as pd
+from thyroid.config import TARGET_COLUMN
+
+
+def test_valid_rows_are_accepted(clean_df,thyroid_model):
+    assert thyroid_model.validate(clean_df.drop(columns=[TARGET_COLUMN])).isna().all()
+
+
+def test_chunk_validation_matches_row_by_row(clean_df,thyroid_model):
+    df = clean_df.drop(columns=[TARGET_COLUMN]).head(12).astype(object)
+    df.loc[df.index[0],"age"] = "abc"
+    df.loc[df.index[1],"TSH"] = 1e9
+    df.loc[df.index[2],"sex"] = np.nan
+    df.loc[df.index[3],"sex"] = "X"
+    #several failures, the first check in column order is reported
+    df.loc[df.index[4],["age","TSH","sex"]] = [1e9,"abc","X"]
+    df.loc[df.index[5],"TSH"] = np.nan
+    reasons = thyroid_model.validate(df)
+    row_reasons = pd.concat([thyroid_model.validate(df.loc[[index]]) for index in df.index])
+    pd.testing.assert_series_equal(reasons,row_reasons)
+    assert reasons.iloc[:5].notna().all() and reasons.iloc[5:].isna().all()
+    assert reasons.iloc[0]=="age: not numeric"
+    assert reasons.iloc[2]=="sex: missing" and reasons.iloc[3]=="sex: unknown category"
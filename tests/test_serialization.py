@@ -0,0 +1,27 @@
+import numpy as np
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+from thyroid.compiled_forest import CompiledForest
+from thyroid.utils import load_object, save_object
+
+
+@pytest.mark.parametrize("serialization_format",["dill","joblib"])
+def test_round_trip(tmp_path,serialization_format):
+    obj = {"array":np.arange(1000,dtype=np.float64),"name":"thyroid"}
+    file_path = str(tmp_path/"object.pkl")
+    save_object(file_path=file_path,obj=obj,serialization_format=serialization_format)
+    loaded = load_object(file_path=file_path)
+    assert loaded["name"]=="thyroid" and np.array_equal(loaded["array"],obj["array"])
+    assert (tmp_path/"object.pkl.joblib").exists()==(serialization_format=="joblib")
+
+
+def test_joblib_arrays_are_memory_mapped_read_only(tmp_path):
+    x = np.random.default_rng(0).normal(size=(200,4))
+    model = RandomForestClassifier(n_estimators=5,random_state=42).fit(x,x[:,0]>0)
+    file_path = str(tmp_path/"compiled_model.pkl")
+    save_object(file_path=file_path,obj=CompiledForest.from_sklearn(model),serialization_format="joblib")
+
+    compiled_model = load_object(file_path=file_path)
+    assert isinstance(compiled_model.threshold,np.memmap) and not compiled_model.threshold.flags.writeable
+    assert np.array_equal(compiled_model.predict(x),model.predict(x))
+    assert not isinstance(load_object(file_path=file_path,mmap_mode=None).threshold,np.memmap)
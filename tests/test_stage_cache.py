@@ -0,0 +1,55 @@
+import mongomock
+import pytest
+from thyroid.config import LOADER_TIMESTAMP_FIELD
+from thyroid.entity.artifact_entity import DataIngestionArtifact
+from thyroid.stage_cache import StageCache, stage_key
+from thyroid.utils import get_collection_fingerprint
+
+
+@pytest.fixture
+def artifact(tmp_path):
+    file_paths = [tmp_path/name for name in ["thyroid.csv","train.csv","test.csv"]]
+    for file_path in file_paths:
+        file_path.write_text("age\n1\n")
+    return DataIngestionArtifact(*map(str,file_paths))
+
+
+def test_stage_runs_once_for_the_same_key(tmp_path,artifact):
+    calls = []
+    run = lambda: calls.append(1) or artifact
+    key = stage_key("data_ingestion","code","data")
+    assert StageCache(cache_dir=str(tmp_path/"cache")).run("data_ingestion",key,run)==artifact
+
+    stage_cache = StageCache(cache_dir=str(tmp_path/"cache"))
+    assert stage_cache.run("data_ingestion",key,run)==artifact
+    assert len(calls)==1 and stage_cache.skipped_stages()==["data_ingestion"]
+
+    #another key is a miss
+    stage_cache.run("data_ingestion",stage_key("data_ingestion","code","changed data"),run)
+    assert len(calls)==2 and stage_cache.report["data_ingestion"]=="ran"
+
+
+def test_force_runs_the_stage_and_records_it(tmp_path,artifact):
+    key = stage_key("data_ingestion")
+    StageCache(cache_dir=str(tmp_path/"cache")).put("data_ingestion",key,artifact)
+    assert StageCache(cache_dir=str(tmp_path/"cache"),force=True).get("data_ingestion",key) is None
+    assert StageCache(cache_dir=str(tmp_path/"cache")).get("data_ingestion",key)==artifact
+
+
+def test_missing_artifact_file_invalidates_the_entry(tmp_path,artifact):
+    key = stage_key("data_ingestion")
+    StageCache(cache_dir=str(tmp_path/"cache")).put("data_ingestion",key,artifact)
+    (tmp_path/"train.csv").unlink()
+    assert StageCache(cache_dir=str(tmp_path/"cache")).get("data_ingestion",key) is None
+
+
+def test_fingerprint_changes_with_inserts_and_upserts():
+    client = mongomock.MongoClient()
+    collection = client["thyroid"]["disease"]
+    fingerprint = lambda: get_collection_fingerprint(database_name="thyroid",collection_name="disease",client=client)
+    empty = fingerprint()
+    collection.insert_one({"_id":"a",LOADER_TIMESTAMP_FIELD:1,"age":30})
+    inserted = fingerprint()
+    assert inserted!=empty and fingerprint()==inserted
+    collection.replace_one({"_id":"a"},{"_id":"a",LOADER_TIMESTAMP_FIELD:2,"age":31})
+    assert fingerprint()!=inserted
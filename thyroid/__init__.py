@@ -1,3 +1,4 @@
 from dotenv import load_dotenv
-print(f"Loading environment variable from .env file")
-load_dotenv()
\ No newline at end of file
+#settings such as MONGO_DB_URL and PREDICTION_CHUNK_SIZE are read from the environment when the
+#modules using them are imported, so the .env file is loaded first; nothing else runs on import
+load_dotenv()
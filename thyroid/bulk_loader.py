@@ -0,0 +1,110 @@
+from thyroid.exception import thyroidException
+from thyroid.logger import logging
+from thyroid.config import get_mongo_client, LOADER_TIMESTAMP_FIELD
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import List, Optional
+import pandas as pd
+import threading
+import time
+import os,sys
+
+#rows read from the csv at a time, and documents sent to mongo per insert_many / bulk_write call
+LOADER_CHUNK_SIZE = 50000
+LOADER_BATCH_SIZE = 5000
+#concurrent insert_many / bulk_write calls
+LOADER_WRITERS = 4
+
+
+def frame_to_documents(df:pd.DataFrame)->List[dict]:
+    """
+    Documents built straight from the typed columns, missing values stored as null.
+    """
+    df = df.astype(object).where(df.notna(),None)
+    return df.to_dict(orient="records")
+
+
+def get_row_keys(df:pd.DataFrame,file_path:str,start_row:int,key_columns:Optional[List[str]]=None)->pd.Series:
+    """
+    Upsert key of every row: the key column values joined by "|", or file name and row number
+    when the file has no natural key.
+    """
+    if key_columns:
+        return df[key_columns].astype(str).agg("|".join,axis=1)
+    row_numbers = pd.RangeIndex(start_row,start_row+len(df)).astype(str)
+    return pd.Series(os.path.basename(file_path)+":"+row_numbers,index=df.index)
+
+
+def load_csv_to_collection(file_path:str,database_name:str,collection_name:str,upsert:bool=False,
+                        key_columns:Optional[List[str]]=None,chunk_size:int=LOADER_CHUNK_SIZE,
+                        batch_size:int=LOADER_BATCH_SIZE,n_writers:int=LOADER_WRITERS,client=None)->dict:
+    """
+    Description: Streams a csv file into a mongo collection
+    =========================================================
+    Params:
+    file_path: csv file to load
+    database_name: database name
+    collection_name: collection name
+    upsert: replace documents with the same row key instead of inserting, so reloading a file is
+    idempotent. Upserted documents get _id = row key and LOADER_TIMESTAMP_FIELD = load time,
+    which incremental ingestion can use as its watermark field
+    key_columns: columns forming the row key, None uses file name and row number
+    chunk_size: rows read from the csv at a time
+    batch_size: documents per unordered insert_many / bulk_write call
+    n_writers: calls in flight at the same time, the reader waits when all writers are busy
+    client: mongo client (or a mongomock stand-in), defaults to the configured client
+    =========================================================
+    return load statistics: documents, seconds, docs_per_sec, inserted, upserted, modified
+    """
+    try:
+        from pymongo import ReplaceOne
+        client = get_mongo_client() if client is None else client
+        collection = client[database_name][collection_name]
+        loaded_at = datetime.now(timezone.utc)
+        stats = {"documents":0,"inserted":0,"upserted":0,"modified":0}
+        stats_lock = threading.Lock()
+        #bounds the batches queued or in flight, so memory does not grow with file size
+        slots = threading.BoundedSemaphore(n_writers*2)
+
+        def write(documents:List[dict]):
+            try:
+                if upsert:
+                    result = collection.bulk_write([ReplaceOne({"_id":document["_id"]},document,upsert=True)
+                                                    for document in documents],ordered=False)
+                    counts = {"upserted":result.upserted_count,"modified":result.modified_count}
+                else:
+                    result = collection.insert_many(documents,ordered=False)
+                    counts = {"inserted":len(result.inserted_ids)}
+                with stats_lock:
+                    stats["documents"]+=len(documents)
+                    for name,count in counts.items():
+                        stats[name]+=count
+            finally:
+                slots.release()
+
+        start = time.perf_counter()
+        futures = []
+        logging.info(f"Loading {file_path} into {database_name}.{collection_name} with {n_writers} writers, upsert: {upsert}")
+        with ThreadPoolExecutor(max_workers=n_writers) as executor:
+            start_row = 0
+            for df in pd.read_csv(file_path,chunksize=chunk_size):
+                documents = frame_to_documents(df)
+                if upsert:
+                    row_keys = get_row_keys(df,file_path=file_path,start_row=start_row,key_columns=key_columns)
+                    for document,row_key in zip(documents,row_keys):
+                        document["_id"] = row_key
+                        document[LOADER_TIMESTAMP_FIELD] = loaded_at
+                start_row+=len(df)
+                for batch_start in range(0,len(documents),batch_size):
+                    slots.acquire()
+                    futures.append(executor.submit(write,documents[batch_start:batch_start+batch_size]))
+            for future in futures:
+                #re-raises the first failed batch
+                future.result()
+
+        stats["seconds"] = round(time.perf_counter()-start,3)
+        stats["docs_per_sec"] = round(stats["documents"]/stats["seconds"],1) if stats["seconds"]>0 else None
+        logging.info(f"Load statistics: {stats}")
+        return stats
+    except Exception as e:
+        raise thyroidException(e, sys)
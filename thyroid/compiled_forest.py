@@ -0,0 +1,123 @@
+from thyroid.exception import thyroidException
+import numpy as np
+import sys
+
+#rows evaluated together, bounds the (rows x trees) node index arrays of a batch
+BLOCK_SIZE = 8192
+
+
+class CompiledForest:
+    """
+    Flattened RandomForestClassifier for inference.
+    The nodes of every tree are concatenated into contiguous arrays (feature, threshold, left,
+    right, leaf class probabilities) with child indices global to the forest, so predict_proba
+    moves every (row, tree) pair of a batch one level down per step with plain numpy gathers
+    and no per tree python loop during traversal.
+    Class outputs are identical to the sklearn model it was exported from.
+    """
+
+    def __init__(self,feature:np.ndarray,threshold:np.ndarray,left:np.ndarray,right:np.ndarray,
+                missing_go_to_left:np.ndarray,value:np.ndarray,roots:np.ndarray,max_depth:int,
+                classes:np.ndarray,n_features_in:int):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.missing_go_to_left = missing_go_to_left
+        self.value = value
+        self.roots = roots
+        self.max_depth = max_depth
+        self.classes_ = classes
+        self.n_features_in_ = n_features_in
+        self.is_leaf = left==np.arange(len(left))
+        self.children = np.column_stack([left,right]).ravel()
+
+    @classmethod
+    def from_sklearn(cls,model)->"CompiledForest":
+        """
+        Export a fitted single output RandomForestClassifier.
+        """
+        try:
+            features,thresholds,lefts,rights,missing,values,roots = [],[],[],[],[],[],[]
+            offset = 0
+            n_classes = len(model.classes_)
+            for estimator in model.estimators_:
+                tree = estimator.tree_
+                nodes = tree.__getstate__()["nodes"]
+                node_ids = np.arange(offset,offset+tree.node_count)
+                is_leaf = nodes["left_child"]==-1
+                features.append(np.where(is_leaf,0,nodes["feature"]))
+                thresholds.append(nodes["threshold"])
+                lefts.append(np.where(is_leaf,node_ids,nodes["left_child"]+offset))
+                rights.append(np.where(is_leaf,node_ids,nodes["right_child"]+offset))
+                if "missing_go_to_left" in nodes.dtype.names:
+                    missing.append(nodes["missing_go_to_left"].astype(bool))
+                else:
+                    #trees without missing value support send NaN right, like a failed comparison
+                    missing.append(np.zeros(tree.node_count,dtype=bool))
+                #same normalisation as DecisionTreeClassifier.predict_proba
+                proba = tree.value[:,0,:n_classes]
+                normalizer = proba.sum(axis=1)[:,np.newaxis]
+                normalizer[normalizer==0.0] = 1.0
+                values.append(proba/normalizer)
+                roots.append(offset)
+                offset+=tree.node_count
+            return cls(feature=np.concatenate(features).astype(np.intp),
+                       threshold=np.concatenate(thresholds).astype(np.float64),
+                       left=np.concatenate(lefts).astype(np.intp),
+                       right=np.concatenate(rights).astype(np.intp),
+                       missing_go_to_left=np.concatenate(missing),
+                       value=np.concatenate(values).astype(np.float64),
+                       roots=np.asarray(roots,dtype=np.intp),
+                       max_depth=max(estimator.tree_.max_depth for estimator in model.estimators_),
+                       classes=np.asarray(model.classes_),
+                       n_features_in=model.n_features_in_)
+        except Exception as e:
+            raise thyroidException(e, sys)
+
+    def apply(self,X:np.ndarray)->np.ndarray:
+        """
+        Leaf index of every row in every tree, shape (rows, trees).
+        Works on the flat list of (row, tree) pairs that have not reached a leaf yet, so every
+        level only gathers for pairs still travelling down.
+        """
+        n_rows,n_trees = X.shape[0],len(self.roots)
+        n_features = X.shape[1]
+        X_flat = X.ravel()
+        node = np.tile(self.roots,n_rows)
+        #offset of the row of every pair in the flattened feature matrix
+        row_offset = np.repeat(np.arange(0,n_rows*n_features,n_features,dtype=np.intp),n_trees)
+        active = np.flatnonzero(~self.is_leaf[node])
+        has_missing = np.isnan(X_flat).any()
+        while len(active)>0:
+            active_node = node.take(active)
+            x = X_flat.take(row_offset.take(active)+self.feature.take(active_node))
+            go_left = x<=self.threshold.take(active_node)
+            if has_missing:
+                go_left = np.where(np.isnan(x),self.missing_go_to_left.take(active_node),go_left)
+            #children holds left and right child side by side, index 2*node+1 is the right one
+            active_node = self.children.take(2*active_node+~go_left)
+            node[active] = active_node
+            active = active[~self.is_leaf.take(active_node)]
+        return node.reshape(n_rows,n_trees)
+
+    def predict_proba(self,X)->np.ndarray:
+        try:
+            #sklearn trees compare float32 features against float64 thresholds
+            X = np.asarray(X,dtype=np.float32).astype(np.float64)
+            if X.ndim!=2 or X.shape[1]!=self.n_features_in_:
+                raise Exception(f"Expected {self.n_features_in_} features, got shape {X.shape}")
+            proba = np.zeros((X.shape[0],len(self.classes_)),dtype=np.float64)
+            for start in range(0,X.shape[0],BLOCK_SIZE):
+                leaves = self.apply(np.ascontiguousarray(X[start:start+BLOCK_SIZE]))
+                block = proba[start:start+BLOCK_SIZE]
+                #accumulate tree by tree in estimator order, the same float sums sklearn makes
+                for tree_index in range(leaves.shape[1]):
+                    block+=self.value[leaves[:,tree_index]]
+            proba/=len(self.roots)
+            return proba
+        except Exception as e:
+            raise thyroidException(e, sys)
+
+    def predict(self,X)->np.ndarray:
+        return self.classes_.take(np.argmax(self.predict_proba(X),axis=1),axis=0)
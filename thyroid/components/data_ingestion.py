@@ -7,23 +7,164 @@ import os,sys
 import pandas as pd 
 import numpy as np
 from sklearn.model_selection import train_test_split
+from thyroid.config import LOADER_TIMESTAMP_FIELD
 
 class DataIngestion:
     
-    def __init__(self,data_ingestion_config:config_entity.DataIngestionConfig ):
+    def __init__(self,data_ingestion_config:config_entity.DataIngestionConfig,client=None):
         try:
             logging.info(f"{'>>'*20} Data Ingestion {'<<'*20}")
             self.data_ingestion_config = data_ingestion_config
+            #mongo client, None uses the configured one (tests can pass a mongomock client)
+            self.client = client
+        except Exception as e:
+            raise thyroidException(e, sys)
+
+    def stream_data_ingestion(self)->None:
+        """
+        Writes feature store, train and test file chunk by chunk so the collection is never held in memory.
+        First pass streams mongo into a raw staging file while collecting missing data statistics,
+        second pass cleans the staging file chunk by chunk and splits every row into train or test.
+        Rows are assigned to test independently with probability test_size, so the split sizes are
+        approximate and the train/test membership differs from the in memory train_test_split of the
+        same data; the two modes do not give the same split.
+        """
+        try:
+            config = self.data_ingestion_config
+            feature_store_dir = os.path.dirname(config.feature_store_file_path)
+            dataset_dir = os.path.dirname(config.train_file_path)
+            os.makedirs(feature_store_dir,exist_ok=True)
+            os.makedirs(dataset_dir,exist_ok=True)
+            raw_file_path = os.path.join(feature_store_dir,config_entity.RAW_FILE_NAME)
+
+            logging.info(f"Streaming collection into raw staging file: {raw_file_path}")
+            imputer = utils.MissingDataImputer()
+            for chunk in utils.get_collection_chunks(database_name=config.database_name,
+                                                    collection_name=config.collection_name,
+                                                    batch_size=config.batch_size,client=self.client):
+                first_chunk = imputer.columns is None
+                if not first_chunk:
+                    chunk = chunk.reindex(columns=imputer.columns)
+                imputer.partial_fit(chunk)
+                chunk.to_csv(path_or_buf=raw_file_path,mode="w" if first_chunk else "a",index=False,header=first_chunk)
+
+            if imputer.columns is None:
+                raise Exception(f"Collection: {config.collection_name} is empty")
+            logging.info(f"column to drop which have one unique category : {imputer.get_drop_columns()}")
+
+            logging.info("Cleaning staging file and writing feature store, train and test file")
+            #fixed seed so reruns over the same collection give the same split, not the train_test_split one
+            random_generator = np.random.default_rng(42)
+            output_paths = [config.feature_store_file_path,config.train_file_path,config.test_file_path]
+            rows_written = dict.fromkeys(output_paths,0)
+            for chunk in pd.read_csv(raw_file_path,chunksize=config.batch_size):
+                df = imputer.transform(utils.prepare_raw_frame(df=chunk))
+                is_test = random_generator.random(len(df))<config.test_size
+                for file_path,part in zip(output_paths,[df,df[~is_test],df[is_test]]):
+                    part.to_csv(path_or_buf=file_path,mode="w" if rows_written[file_path]==0 else "a",
+                                index=False,header=rows_written[file_path]==0)
+                    rows_written[file_path]+=len(part)
+            os.remove(raw_file_path)
+            logging.info(f"Rows written: {rows_written}")
+        except Exception as e:
+            raise thyroidException(e, sys)
+
+    def load_watermark(self):
+        #bson and yaml are imported on first use, not when the package is imported
+        import yaml
+        from bson import ObjectId
+        config = self.data_ingestion_config
+        if not os.path.exists(config.watermark_file_path) or not os.path.exists(config.incremental_store_file_path):
+            return None
+        with open(config.watermark_file_path) as file_obj:
+            state = yaml.safe_load(file_obj)
+        if state["field"]!=config.watermark_field:
+            logging.info(f"Watermark field changed from {state['field']} to {config.watermark_field}, reloading collection")
+            return None
+        return ObjectId(state["value"]) if state["type"]=="ObjectId" else state["value"]
+
+    def save_watermark(self,watermark)->None:
+        from bson import ObjectId
+        utils.write_yaml_file(file_path=self.data_ingestion_config.watermark_file_path,
+                              data={"field":self.data_ingestion_config.watermark_field,"type":type(watermark).__name__,
+                                    "value":str(watermark) if isinstance(watermark,ObjectId) else watermark})
+
+    def incremental_data_ingestion(self)->None:
+        """
+        Merges the documents added or changed since the last watermark into the persistent parquet
+        store (latest version of every record key wins), then cleans the whole store into the
+        feature store and splits it by a hash of the record key, so a row stays in the same split
+        across runs.
+        """
+        try:
+            config = self.data_ingestion_config
+            watermark = self.load_watermark()
+            logging.info(f"Fetching documents with {config.watermark_field} after: {watermark}")
+            chunks,new_watermark = [],watermark
+            for chunk,new_watermark in utils.get_collection_delta(database_name=config.database_name,
+                                                    collection_name=config.collection_name,
+                                                    watermark_field=config.watermark_field,watermark=watermark,
+                                                    batch_size=config.batch_size,client=self.client):
+                chunks.append(chunk)
+
+            store = pd.read_parquet(config.incremental_store_file_path) if watermark is not None else None
+            if store is not None and len(chunks)>0:
+                #documents at the watermark itself are fetched again, those already in the store are not new
+                delta = pd.concat(chunks,ignore_index=True)
+                saved_watermark = str(watermark) if config.watermark_field==utils.RECORD_KEY else watermark
+                is_known = (delta[config.watermark_field]==saved_watermark)&delta[utils.RECORD_KEY].isin(store[utils.RECORD_KEY])
+                chunks = [delta[~is_known]]
+            delta_rows = sum(len(chunk) for chunk in chunks)
+            logging.info(f"Documents added or changed: {delta_rows}")
+
+            if delta_rows>0:
+                store = pd.concat(([] if store is None else [store])+chunks,ignore_index=True)
+                store = store.drop_duplicates(subset=[utils.RECORD_KEY],keep="last").reset_index(drop=True)
+                os.makedirs(config.incremental_store_dir,exist_ok=True)
+                #written next to the store and renamed, an interrupted run keeps the previous store and watermark
+                tmp_file_path = f"{config.incremental_store_file_path}.tmp"
+                store.to_parquet(tmp_file_path,index=False)
+                os.replace(tmp_file_path,config.incremental_store_file_path)
+                self.save_watermark(new_watermark)
+            if store is None:
+                raise Exception(f"Collection: {config.collection_name} is empty")
+            logging.info(f"Rows in incremental store: {len(store)}")
+
+            record_keys = store[utils.RECORD_KEY]
+            df = store.drop(columns=[utils.RECORD_KEY,config.watermark_field,LOADER_TIMESTAMP_FIELD],errors="ignore")
+            imputer = utils.MissingDataImputer().partial_fit(df)
+            logging.info(f"column to drop which have one unique category : {imputer.get_drop_columns()}")
+            df = imputer.transform(df)
+
+            #position of the key hash in [0,1) decides the split, independent of row order and store size
+            key_hash = pd.util.hash_pandas_object(record_keys,index=False).values
+            is_test = (key_hash%1_000_000)/1_000_000<config.test_size
+            for file_path,part in zip([config.feature_store_file_path,config.train_file_path,config.test_file_path],
+                                      [df,df[~is_test],df[is_test]]):
+                os.makedirs(os.path.dirname(file_path),exist_ok=True)
+                part.to_csv(path_or_buf=file_path,index=False,header=True)
         except Exception as e:
             raise thyroidException(e, sys)
 
     def initiate_data_ingestion(self)->artifact_entity.DataIngestionArtifact:
         try:
+            if self.data_ingestion_config.incremental:
+                logging.info(f"Merging collection changes into incremental store")
+                self.incremental_data_ingestion()
+                return self.get_data_ingestion_artifact()
+
+            if self.data_ingestion_config.streaming:
+                logging.info(f"Streaming collection data into feature store and train/test files")
+                self.stream_data_ingestion()
+                return self.get_data_ingestion_artifact()
+
             logging.info(f"Exporting collection data as pandas dataframe")
             #Exporting collection data as pandas dataframe
             df:pd.DataFrame  = utils.get_collection_as_dataframe(
                 database_name=self.data_ingestion_config.database_name, 
-                collection_name=self.data_ingestion_config.collection_name)
+                collection_name=self.data_ingestion_config.collection_name,
+                batch_size=self.data_ingestion_config.batch_size,
+                client=self.client)
 
             logging.info("Save data in feature store")
 
@@ -52,18 +193,20 @@ class DataIngestion:
             test_df.to_csv(path_or_buf=self.data_ingestion_config.test_file_path,index=False,header=True)
             
             #Prepare artifact
-
-            data_ingestion_artifact = artifact_entity.DataIngestionArtifact(
-                feature_store_file_path=self.data_ingestion_config.feature_store_file_path,
-                train_file_path=self.data_ingestion_config.train_file_path, 
-                test_file_path=self.data_ingestion_config.test_file_path)
-
-            logging.info(f"Data ingestion artifact: {data_ingestion_artifact}")
-            return data_ingestion_artifact
+            return self.get_data_ingestion_artifact()
 
         except Exception as e:
             raise thyroidException(error_message=e, error_detail=sys)
 
+    def get_data_ingestion_artifact(self)->artifact_entity.DataIngestionArtifact:
+        data_ingestion_artifact = artifact_entity.DataIngestionArtifact(
+            feature_store_file_path=self.data_ingestion_config.feature_store_file_path,
+            train_file_path=self.data_ingestion_config.train_file_path, 
+            test_file_path=self.data_ingestion_config.test_file_path)
+
+        logging.info(f"Data ingestion artifact: {data_ingestion_artifact}")
+        return data_ingestion_artifact
+
 
 
         
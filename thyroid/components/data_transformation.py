@@ -10,9 +10,17 @@ import numpy as np
 from sklearn.preprocessing import LabelEncoder
 from sklearn.preprocessing import OrdinalEncoder
 from imblearn.combine import SMOTETomek
+from imblearn.over_sampling import SMOTE
+from sklearn.neighbors import NearestNeighbors
 from sklearn.preprocessing import StandardScaler
 from thyroid.config import TARGET_COLUMN
+from thyroid.schema_validator import SchemaValidator
 
+#smote_tomek: SMOTE oversampling followed by a tomek links cleaning pass over every row
+#smote: SMOTE oversampling only, skips the tomek links neighbour search
+#class_weight: no resampling, the trainer weights rows inversely to class frequency
+#none: no resampling and no weighting
+RESAMPLING_STRATEGIES = ["smote_tomek","smote","class_weight","none"]
 
 
 class DataTransformation:
@@ -40,6 +48,27 @@ class DataTransformation:
             raise thyroidException(e, sys)
 
 
+    @classmethod
+    def get_resampler(cls,strategy:str,n_jobs:Optional[int]=None):
+        """
+        strategy: one of RESAMPLING_STRATEGIES
+        n_jobs: cores used by the nearest neighbour searches
+        returns imblearn sampler, None for strategies that keep the rows as they are
+        """
+        try:
+            if strategy not in RESAMPLING_STRATEGIES:
+                raise Exception(f"Unknown resampling strategy: {strategy}, expected one of {RESAMPLING_STRATEGIES}")
+            if strategy in ["class_weight","none"]:
+                return None
+            #SMOTE default k_neighbors=5 searched on n_jobs cores
+            smote = SMOTE(random_state=42,k_neighbors=NearestNeighbors(n_neighbors=6,n_jobs=n_jobs))
+            if strategy=="smote":
+                return smote
+            return SMOTETomek(random_state=42,smote=smote,n_jobs=n_jobs)
+        except Exception as e:
+            raise thyroidException(e, sys)
+
+
     def initiate_data_transformation(self,) -> artifact_entity.DataTransformationArtifact:
         try:
             #reading training and testing file
@@ -95,14 +124,17 @@ class DataTransformation:
            
             input_feature_test_arr = np.c_[input_feature_test_arr_cat, input_feature_test_arr_num]
             
-            smt = SMOTETomek(random_state=42)
-            logging.info(f"Before resampling in training set Input: {input_feature_train_arr.shape} Target:{target_feature_train_arr.shape}")
-            input_feature_train_arr, target_feature_train_arr = smt.fit_resample(input_feature_train_arr, target_feature_train_arr)
-            logging.info(f"After resampling in training set Input: {input_feature_train_arr.shape} Target:{target_feature_train_arr.shape}")
-            
-            logging.info(f"Before resampling in testing set Input: {input_feature_test_arr.shape} Target:{target_feature_test_arr.shape}")
-            input_feature_test_arr, target_feature_test_arr = smt.fit_resample(input_feature_test_arr, target_feature_test_arr)
-            logging.info(f"After resampling in testing set Input: {input_feature_test_arr.shape} Target:{target_feature_test_arr.shape}")
+            #only the training set is resampled, the test set keeps the real class balance it is evaluated on
+            resampling = self.data_transformation_config.resampling
+            resampler = DataTransformation.get_resampler(strategy=resampling,n_jobs=self.data_transformation_config.n_jobs)
+            unsampled_train_path = None
+            if resampler is not None:
+                unsampled_train_path = self.data_transformation_config.unsampled_train_path
+                utils.save_numpy_array_data(file_path=unsampled_train_path,
+                                            array=np.c_[input_feature_train_arr, target_feature_train_arr])
+                logging.info(f"Before {resampling} resampling in training set Input: {input_feature_train_arr.shape} Target:{target_feature_train_arr.shape}")
+                input_feature_train_arr, target_feature_train_arr = resampler.fit_resample(input_feature_train_arr, target_feature_train_arr)
+                logging.info(f"After {resampling} resampling in training set Input: {input_feature_train_arr.shape} Target:{target_feature_train_arr.shape}")
             
             #target encoder
             train_arr = np.c_[input_feature_train_arr, target_feature_train_arr ]
@@ -126,6 +158,12 @@ class DataTransformation:
             utils.save_object(file_path=self.data_transformation_config.target_encoder_path,
              obj=label_encoder)
 
+            #request time input checks, ranges taken from the numerical training features
+            schema_validator = SchemaValidator.from_artifacts(transformer=transformation_pipleine,input_encoder=enc,
+                                                              numeric_df=input_feature_train_df_num)
+            utils.save_object(file_path=self.data_transformation_config.schema_validator_path,
+             obj=schema_validator)
+
 
 
             data_transformation_artifact = artifact_entity.DataTransformationArtifact(
@@ -133,7 +171,10 @@ class DataTransformation:
                 transformed_train_path = self.data_transformation_config.transformed_train_path,
                 transformed_test_path = self.data_transformation_config.transformed_test_path,
                 input_encoder_path = self.data_transformation_config.input_encoder_path,
-                target_encoder_path = self.data_transformation_config.target_encoder_path
+                target_encoder_path = self.data_transformation_config.target_encoder_path,
+                resampling = resampling,
+                schema_validator_path = self.data_transformation_config.schema_validator_path,
+                unsampled_train_path = unsampled_train_path
 
             )
 
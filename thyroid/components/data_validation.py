@@ -1,14 +1,13 @@
 from thyroid.entity import artifact_entity,config_entity
 from thyroid.exception import thyroidException
 from thyroid.logger import logging
-from scipy.stats import ks_2samp
-from typing import Optional
+from thyroid.drift import DriftEngine
+from thyroid.reference_profile import ReferenceProfile, load_reference_profile
 import os,sys 
 import pandas as pd
 from thyroid import utils
 import numpy as np
 from thyroid.config import TARGET_COLUMN, numeric_features
-from thyroid.utils import missing_data_handler
 
 
 
@@ -29,44 +28,12 @@ class DataValidation:
 
     
 
-    def drop_missing_values_columns(self,df:pd.DataFrame,report_key_name:str)->Optional[pd.DataFrame]:
-        """
-        This function will drop column which contains missing value more than specified threshold
-
-        df: Accepts a pandas dataframe
-        threshold: Percentage criteria to drop a column
-        =====================================================================================
-        returns Pandas DataFrame if atleast a single column is available after missing columns drop else None
-        """
+    def is_required_columns_exists(self,base_columns:list,current_columns:list,report_key_name:str)->bool:
         try:
-            
-            threshold = self.data_validation_config.missing_threshold
-            null_report = df.isna().sum()/df.shape[0]
-            #selecting column name which contains null
-            logging.info(f"selecting column name which contains null above to {threshold}")
-            drop_column_names = null_report[null_report>threshold].index
-
-            logging.info(f"Columns to drop: {list(drop_column_names)}")
-            self.validation_error[report_key_name]=list(drop_column_names)
-            df.drop(list(drop_column_names),axis=1,inplace=True)
-
-            #return None no columns left
-            if len(df.columns)==0:
-                return None
-            return df
-        except Exception as e:
-            raise thyroidException(e, sys)
-
-    def is_required_columns_exists(self,base_df:pd.DataFrame,current_df:pd.DataFrame,report_key_name:str)->bool:
-        try:
-           
-            base_columns = base_df.columns
-            current_columns = current_df.columns
-
             missing_columns = []
             for base_column in base_columns:
                 if base_column not in current_columns:
-                    logging.info(f"Column: [{base} is not available.]")
+                    logging.info(f"Column: [{base_column} is not available.]")
                     missing_columns.append(base_column)
 
             if len(missing_columns)>0:
@@ -76,84 +43,79 @@ class DataValidation:
         except Exception as e:
             raise thyroidException(e, sys)
 
-    def data_drift(self,base_df:pd.DataFrame,current_df:pd.DataFrame,report_key_name:str):
+    def get_base_columns(self,reference_profile:ReferenceProfile,report_key_name:str)->list:
+        """
+        Base columns left after dropping those with more missing values than the threshold,
+        taken from the null fractions of the reference profile.
+        """
+        try:
+            threshold = self.data_validation_config.missing_threshold
+            drop_column_names = [column for column,fraction in reference_profile.null_fractions.items() if fraction>threshold]
+            logging.info(f"Base columns to drop: {drop_column_names}")
+            self.validation_error[report_key_name]=drop_column_names
+            return [column for column in reference_profile.columns if column not in drop_column_names]
+        except Exception as e:
+            raise thyroidException(e, sys)
+
+    def scan_dataset(self,drift_engine:DriftEngine,file_path:str,report_key_name:str):
+        """
+        One chunked pass over a current dataset collecting null counts and drift statistics, so the
+        dataset is never held in memory. Columns with more missing values than the threshold are
+        reported under report_key_name.
+        returns columns left after dropping those and drift report
+        """
         try:
-            drift_report=dict()
+            threshold = self.data_validation_config.missing_threshold
+            scan = {"rows":0,"null_counts":None}
 
-            base_columns = numeric_features
-            current_columns = numeric_features
+            def chunks():
+                for chunk in pd.read_csv(file_path,chunksize=self.data_validation_config.chunk_size):
+                    null_counts = chunk.isna().sum()
+                    scan["null_counts"] = null_counts if scan["null_counts"] is None else scan["null_counts"].add(null_counts,fill_value=0)
+                    scan["rows"]+=len(chunk)
+                    yield chunk
 
-            for base_column in base_columns:
-                base_data,current_data = base_df[base_column],current_df[base_column]
-                #Null hypothesis is that both column data drawn from same distrubtion
-                
-                logging.info(f"Hypothesis {base_column}: {base_data.dtype}, {current_data.dtype} ")
-                same_distribution =ks_2samp(base_data,current_data)
-
-                if same_distribution.pvalue>0.05:
-                    #We are accepting null hypothesis
-                    drift_report[base_column]={
-                        "pvalues":float(same_distribution.pvalue),
-                        "same_distribution": True
-                    }
-                else:
-                    drift_report[base_column]={
-                        "pvalues":float(same_distribution.pvalue),
-                        "same_distribution":False
-                    }
-                    #different distribution
-
-            self.validation_error[report_key_name]=drift_report
+            drift_report = drift_engine.compare(chunks())
+            null_report = scan["null_counts"]/max(scan["rows"],1)
+            logging.info(f"selecting column name which contains null above to {threshold}")
+            drop_column_names = list(null_report[null_report>threshold].index)
+            logging.info(f"Columns to drop: {drop_column_names}")
+            self.validation_error[report_key_name]=drop_column_names
+            return [column for column in null_report.index if column not in drop_column_names],drift_report
         except Exception as e:
             raise thyroidException(e, sys)
 
     def initiate_data_validation(self)->artifact_entity.DataValidationArtifact:
         try:
-            logging.info(f"Reading base dataframe")
-            base_df1 = pd.read_csv(self.data_validation_config.base_file_path)
-            base_df = missing_data_handler(df=base_df1)
-            #base_df.replace({"?":np.NAN},inplace=True)
-            #logging.info(f"Replace na value in base df")
-            #base_df has na as null
-            logging.info(f"Drop null values colums from base df")
-            base_df=self.drop_missing_values_columns(df=base_df,report_key_name="missing_values_within_base_dataset")
-
-            logging.info(f"Reading train dataframe")
-            train_df = pd.read_csv(self.data_ingestion_artifact.train_file_path)
-            logging.info(f"Reading test dataframe")
-            test_df = pd.read_csv(self.data_ingestion_artifact.test_file_path)
-
-            logging.info(f"Drop null values colums from train df")
-            train_df = self.drop_missing_values_columns(df=train_df,report_key_name="missing_values_within_train_dataset")
-            logging.info(f"Drop null values colums from test df")
-            test_df = self.drop_missing_values_columns(df=test_df,report_key_name="missing_values_within_test_dataset")
-            
-            #exclude_columns = [TARGET_COLUMN]
-            #base_df = utils.convert_columns_float(df=base_df, exclude_columns=exclude_columns)
-            #train_df = utils.convert_columns_float(df=train_df, exclude_columns=exclude_columns)
-            #test_df = utils.convert_columns_float(df=test_df, exclude_columns=exclude_columns)
-
-
-            logging.info(f"Is all required columns present in train df")
-            train_df_columns_status = self.is_required_columns_exists(base_df=base_df, current_df=train_df,report_key_name="missing_columns_within_train_dataset")
-            logging.info(f"Is all required columns present in test df")
-            test_df_columns_status = self.is_required_columns_exists(base_df=base_df, current_df=test_df,report_key_name="missing_columns_within_test_dataset")
-
-            if train_df_columns_status:
-                logging.info(f"As all column are available in train df hence detecting data drift")
-                self.data_drift(base_df=base_df, current_df=train_df,report_key_name="data_drift_within_train_dataset")
-            if test_df_columns_status:
-                logging.info(f"As all column are available in test df hence detecting data drift")
-                self.data_drift(base_df=base_df, current_df=test_df,report_key_name="data_drift_within_test_dataset")
+            logging.info(f"Loading reference profile of base dataset")
+            #built from the base file once per content hash, validation only reads the current data
+            reference_profile = load_reference_profile(base_file_path=self.data_validation_config.base_file_path,
+                                                       profile_dir=self.data_validation_config.reference_profile_dir)
+            base_columns = self.get_base_columns(reference_profile=reference_profile,report_key_name="missing_values_within_base_dataset")
+            drift_engine = reference_profile.drift_engine(columns=base_columns,
+                                                          pvalue_threshold=self.data_validation_config.drift_pvalue_threshold,
+                                                          psi_threshold=self.data_validation_config.psi_threshold)
+
+            for dataset_name,file_path in [("train",self.data_ingestion_artifact.train_file_path),
+                                           ("test",self.data_ingestion_artifact.test_file_path)]:
+                logging.info(f"Scanning {dataset_name} dataset for null values and data drift")
+                current_columns,drift_report = self.scan_dataset(drift_engine=drift_engine,file_path=file_path,
+                                                    report_key_name=f"missing_values_within_{dataset_name}_dataset")
+                logging.info(f"Is all required columns present in {dataset_name} df")
+                columns_status = self.is_required_columns_exists(base_columns=base_columns,current_columns=current_columns,
+                                                    report_key_name=f"missing_columns_within_{dataset_name}_dataset")
+                if columns_status:
+                    logging.info(f"As all column are available in {dataset_name} df hence reporting data drift")
+                    self.validation_error[f"data_drift_within_{dataset_name}_dataset"]=drift_report
 
             #write the report
             logging.info("Write reprt in yaml file")
             utils.write_yaml_file(file_path=self.data_validation_config.report_file_path,
             data=self.validation_error)
 
-            data_validation_artifact = artifact_entity.DataValidationArtifact(report_file_path=self.data_validation_config.report_file_path,)
+            data_validation_artifact = artifact_entity.DataValidationArtifact(report_file_path=self.data_validation_config.report_file_path,
+            reference_profile_path=os.path.join(self.data_validation_config.reference_profile_dir,f"{reference_profile.base_file_hash}.yaml"))
             logging.info(f"Data validation artifact: {data_validation_artifact}")
             return data_validation_artifact
         except Exception as e:
             raise thyroidException(e, sys)
-
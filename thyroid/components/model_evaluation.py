@@ -1,4 +1,4 @@
-from thyroid.predictor import ModelResolver
+from thyroid.predictor import ModelResolver, ThyroidModel, model_cache
 from thyroid.entity import config_entity,artifact_entity
 from thyroid.exception import thyroidException
 from thyroid.logger import logging
@@ -44,68 +44,37 @@ class ModelEvaluation:
                 return model_eval_artifact
 
 
-            #Finding location of transformer model and target encoder
-            logging.info("Finding location of transformer model and target encoder")
-            transformer_path = self.model_resolver.get_latest_transformer_path()
-            model_path = self.model_resolver.get_latest_model_path()
-            input_encoder_path = self.model_resolver.get_latest_input_encoder_path()
-            target_encoder_path = self.model_resolver.get_latest_target_encoder_path()
-            print(model_path)
-            print(input_encoder_path)
-
-            logging.info("Previous trained objects of transformer, model and target encoder")
-            #Previous trained  objects
-            transformer = load_object(file_path=transformer_path)
-            model = load_object(file_path=model_path)
-            input_encoder = load_object(file_path=input_encoder_path)
-            target_encoder = load_object(file_path=target_encoder_path)
-            
+            logging.info("Previous trained thyroid model")
+            #Previous trained model, shared with batch prediction through the model cache
+            loaded_model = model_cache.load_latest(model_resolver=self.model_resolver)
+            logging.info(f"Previous model version: {loaded_model.version_dir}")
+            thyroid_model = loaded_model.thyroid_model
 
             logging.info("Currently trained model objects")
-            #Currently trained model objects
-            current_transformer = load_object(file_path=self.data_transformation_artifact.transform_object_path)
-            current_model  = load_object(file_path=self.model_trainer_artifact.model_path)
-            current_input_encoder = load_object(file_path=self.data_transformation_artifact.input_encoder_path)
-            current_target_encoder = load_object(file_path=self.data_transformation_artifact.target_encoder_path)
-            
-
+            #Currently trained model objects fused the same way model pusher saves them
+            current_thyroid_model = ThyroidModel(
+                transformer=load_object(file_path=self.data_transformation_artifact.transform_object_path),
+                input_encoder=load_object(file_path=self.data_transformation_artifact.input_encoder_path),
+                model=load_object(file_path=self.model_trainer_artifact.model_path),
+                target_encoder=load_object(file_path=self.data_transformation_artifact.target_encoder_path),
+                compiled_model=None if self.model_trainer_artifact.compiled_model_path is None
+                else load_object(file_path=self.model_trainer_artifact.compiled_model_path),
+                schema_validator=load_object(file_path=self.data_transformation_artifact.schema_validator_path))
 
             test_df = pd.read_csv(self.data_ingestion_artifact.test_file_path)
             target_df = test_df[TARGET_COLUMN]
-            y_true =target_encoder.transform(target_df)
-            # accuracy using previous trained model
-            
-            input_feature_name_num = list(transformer.feature_names_in_)
-            input_feature_name_cat = list(input_encoder.feature_names_in_)
-            input_arr_num =transformer.transform(test_df[input_feature_name_num])
-            input_arr_cat =input_encoder.transform(test_df[input_feature_name_cat])
-            logging.info(input_arr_cat)
-            logging.info(input_arr_num)
 
-            input_arr = np.c_[input_arr_cat,input_arr_num]
-            logging.info(test_df[input_feature_name_cat + input_feature_name_num].columns)
-
-            y_pred = model.predict(input_arr)
-            print(f"Prediction using previous model: {target_encoder.inverse_transform(y_pred[:5].astype('int'))}")
+            # accuracy using previous trained model
+            y_true =thyroid_model.encode_target(target_df)
+            y_pred = thyroid_model.predict_encoded(test_df)
+            print(f"Prediction using previous model: {thyroid_model.target_encoder.inverse_transform(y_pred[:5].astype('int'))}")
             previous_model_score = f1_score(y_true=y_true, y_pred=y_pred)
             logging.info(f"Accuracy using previous trained model: {previous_model_score}")
            
-            # accuracy using current trained model >>........
-            #>input_feature_name = list(current_transformer.feature_names_in_)
-            #>input_arr =current_transformer.transform(test_df[input_feature_name])
-
-            input_feature_name_num = list(current_transformer.feature_names_in_)
-            input_feature_name_cat = list(current_input_encoder.feature_names_in_)
-            input_arr_num =current_transformer.transform(test_df[input_feature_name_num])
-            input_arr_cat =current_input_encoder.transform(test_df[input_feature_name_cat])
-
-            input_arr = np.c_[input_arr_cat,input_arr_num]
-
-
-            y_pred = current_model.predict(input_arr)
-            y_true =current_target_encoder.transform(target_df)
-            #print([current_target_encoder.inverse_transform(i) for i in y_pred])
-            print(f"Prediction using trained model: {current_target_encoder.inverse_transform(y_pred[:5].astype('int'))}")
+            # accuracy using current trained model
+            y_true =current_thyroid_model.encode_target(target_df)
+            y_pred = current_thyroid_model.predict_encoded(test_df)
+            print(f"Prediction using trained model: {current_thyroid_model.target_encoder.inverse_transform(y_pred[:5].astype('int'))}")
             current_model_score = f1_score(y_true=y_true, y_pred=y_pred)
             logging.info(f"Accuracy using current trained model: {current_model_score}")
             if current_model_score<=previous_model_score:
@@ -1,4 +1,4 @@
-from thyroid.predictor import ModelResolver
+from thyroid.predictor import ModelResolver, ThyroidModel
 from thyroid.entity.config_entity import ModelPusherConfig
 from thyroid.exception import thyroidException
 import os,sys
@@ -29,25 +29,29 @@ class ModelPusher:
             input_encoder = load_object(file_path=self.data_transformation_artifact.input_encoder_path)
             target_encoder = load_object(file_path=self.data_transformation_artifact.target_encoder_path)
 
-            #model pusher dir
-            logging.info(f"Saving model into model pusher directory")
-            save_object(file_path=self.model_pusher_config.pusher_transformer_path, obj=transformer)
-            save_object(file_path=self.model_pusher_config.pusher_model_path, obj=model)
-            save_object(file_path=self.model_pusher_config.pusher_input_encoder_path, obj=input_encoder)
-            save_object(file_path=self.model_pusher_config.pusher_target_encoder_path, obj=target_encoder)
+            #fuse them into the single inference artifact consumers load
+            compiled_model = None
+            if self.model_trainer_artifact.compiled_model_path is not None:
+                compiled_model = load_object(file_path=self.model_trainer_artifact.compiled_model_path)
+            schema_validator = load_object(file_path=self.data_transformation_artifact.schema_validator_path)
+            serialization_format = self.model_pusher_config.serialization_format
+            if self.model_pusher_config.memory_mapped_forest and compiled_model is not None:
+                #every batch is scored by the flattened forest, its arrays are shared between processes
+                model,compiled_model,serialization_format = compiled_model,None,"joblib"
+            thyroid_model = ThyroidModel(transformer=transformer,input_encoder=input_encoder,
+                                        model=model,target_encoder=target_encoder,compiled_model=compiled_model,
+                                        schema_validator=schema_validator)
 
+            #model pusher dir
+            logging.info(f"Saving thyroid model into model pusher directory")
+            save_object(file_path=self.model_pusher_config.pusher_thyroid_model_path, obj=thyroid_model,
+                        serialization_format=serialization_format)
 
             #saved model dir
-            logging.info(f"Saving model in saved model dir")
-            transformer_path=self.model_resolver.get_latest_save_transformer_path()
-            model_path=self.model_resolver.get_latest_save_model_path()
-            input_encoder_path=self.model_resolver.get_latest_save_input_encoder_path()
-            target_encoder_path=self.model_resolver.get_latest_save_target_encoder_path()
-
-            save_object(file_path=transformer_path, obj=transformer)
-            save_object(file_path=model_path, obj=model)
-            save_object(file_path=input_encoder_path, obj=input_encoder)
-            save_object(file_path=target_encoder_path, obj=target_encoder)
+            logging.info(f"Saving thyroid model in saved model dir")
+            thyroid_model_path=self.model_resolver.get_latest_save_thyroid_model_path()
+            save_object(file_path=thyroid_model_path, obj=thyroid_model,
+                        serialization_format=serialization_format)
 
             model_pusher_artifact = ModelPusherArtifact(pusher_model_dir=self.model_pusher_config.pusher_model_dir,
              saved_model_dir=self.model_pusher_config.saved_model_dir)
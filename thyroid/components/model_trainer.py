@@ -5,7 +5,63 @@ from typing import Optional
 import os,sys 
 from sklearn.ensemble import RandomForestClassifier
 from thyroid import utils
+from thyroid.compiled_forest import CompiledForest
 from sklearn.metrics import f1_score
+from sklearn.model_selection import StratifiedKFold
+from sklearn.utils.class_weight import compute_sample_weight
+from joblib import Parallel, delayed
+import numpy as np
+import time
+
+#values sampled for every hyperparameter of a model family during fine tuning
+SEARCH_SPACE = {
+    "random_forest":{
+        "n_estimators":[100,200,400],
+        "max_depth":[None,8,16,32],
+        "min_samples_leaf":[1,2,4],
+        "max_features":["sqrt","log2",0.5],
+    },
+    "xgboost":{
+        "n_estimators":[100,200,400],
+        "max_depth":[3,6,9],
+        "learning_rate":[0.03,0.1,0.3],
+        "subsample":[0.7,1.0],
+        "colsample_bytree":[0.7,1.0],
+    },
+}
+
+
+def build_model(model_name:str,params:dict,n_jobs:Optional[int]=None):
+    if model_name=="random_forest":
+        return RandomForestClassifier(n_jobs=n_jobs,**params)
+    if model_name=="xgboost":
+        from xgboost import XGBClassifier
+        return XGBClassifier(n_jobs=n_jobs,**params)
+    raise Exception(f"Unknown model: {model_name}")
+
+
+def get_sample_weight(y,class_weighted:bool)->Optional[np.ndarray]:
+    #rows weighted inversely to class frequency when the training set was not resampled
+    return compute_sample_weight("balanced",y) if class_weighted else None
+
+
+def evaluate_candidate(model_name:str,params:dict,x,y,folds:list,n_samples:int,n_jobs:int=1,
+                    class_weighted:bool=False)->dict:
+    """
+    Mean cross validation f1 score of one configuration trained on n_samples rows of every fold.
+    Runs in a worker process, x and y arrive as memory maps shared by all candidates.
+    n_jobs: cores of the model itself, more than one once fewer candidates than cores remain
+    """
+    start = time.perf_counter()
+    scores = []
+    for train_index,test_index in folds:
+        train_index = train_index[:n_samples]
+        model = build_model(model_name,params,n_jobs=n_jobs)
+        model.fit(x[train_index],y[train_index].astype(int),
+                  sample_weight=get_sample_weight(y[train_index],class_weighted))
+        scores.append(f1_score(y_true=y[test_index].astype(int),y_pred=model.predict(x[test_index])))
+    return {"model":model_name,"params":params,"n_samples":int(n_samples),
+            "f1_score":float(np.mean(scores)),"seconds":round(time.perf_counter()-start,3)}
 
 
 class ModelTrainer:
@@ -18,40 +74,137 @@ class ModelTrainer:
             logging.info(f"{'>>'*20} Model Trainer {'<<'*20}")
             self.model_trainer_config=model_trainer_config
             self.data_transformation_artifact=data_transformation_artifact
+            self.class_weighted = data_transformation_artifact.resampling=="class_weight"
 
         except Exception as e:
             raise thyroidException(e, sys)
 
-    def fine_tune(self):
+    def get_search_candidates(self)->list:
+        config = self.model_trainer_config
+        random_generator = np.random.default_rng(42)
+        model_names = list(SEARCH_SPACE)
         try:
-            #Wite code for Grid Search CV
-            pass
-            
+            import xgboost
+        except ImportError:
+            logging.info("xgboost is not installed, searching random forest only")
+            model_names.remove("xgboost")
+        candidates = []
+        for model_name in model_names:
+            for _ in range(config.search_candidates):
+                params = {name:values[random_generator.integers(len(values))] for name,values in SEARCH_SPACE[model_name].items()}
+                #numpy scalars do not serialize cleanly into the yaml trace
+                params = {name:value.item() if isinstance(value,np.generic) else value for name,value in params.items()}
+                if (model_name,params) not in candidates:
+                    candidates.append((model_name,params))
+        return candidates
+
+    def fine_tune(self,x,y):
+        """
+        Random search narrowed by successive halving: every rung scores the remaining candidates
+        with cross validation on a growing number of training rows in a process pool, and keeps
+        the best 1/search_halving_factor of them. Stops at one candidate, at all rows, or once
+        search_time_budget is spent.
+        returns best model name, its parameters and the search trace
+        """
+        try:
+            config = self.model_trainer_config
+            deadline = time.monotonic()+config.search_time_budget
+            candidates = self.get_search_candidates()
+            folds = list(StratifiedKFold(n_splits=config.search_cv_folds,shuffle=True,random_state=42).split(x,y))
+            max_samples = min(len(train_index) for train_index,_ in folds)
+            n_samples = min(config.search_min_samples,max_samples)
+            trace = []
+            with Parallel(n_jobs=config.n_jobs,backend="loky") as parallel:
+                while True:
+                    #cores a pool worker can give its model without oversubscribing the machine
+                    model_n_jobs = max(1,config.n_jobs//len(candidates))
+                    logging.info(f"Scoring {len(candidates)} candidates on {n_samples} rows per fold")
+                    results = parallel(delayed(evaluate_candidate)(model_name,params,x,y,folds,n_samples,model_n_jobs,self.class_weighted)
+                                       for model_name,params in candidates)
+                    trace.extend(results)
+                    results = sorted(results,key=lambda result:result["f1_score"],reverse=True)
+                    if len(results)==1 or n_samples>=max_samples or time.monotonic()>deadline:
+                        break
+                    n_keep = max(1,int(np.ceil(len(results)/config.search_halving_factor)))
+                    candidates = [(result["model"],result["params"]) for result in results[:n_keep]]
+                    n_samples = min(n_samples*config.search_halving_factor,max_samples)
+            best = results[0]
+            logging.info(f"Best configuration: {best}")
+            return best["model"],dict(best["params"]),trace
+        except Exception as e:
+            raise thyroidException(e, sys)
 
+    def train_model(self,x,y,model_name:str="random_forest",params:Optional[dict]=None):
+        try:
+            model = build_model(model_name,params or {},n_jobs=self.model_trainer_config.n_jobs)
+            model.fit(x,y if model_name=="random_forest" else y.astype(int),
+                      sample_weight=get_sample_weight(y,self.class_weighted))
+            #the saved model predicts on one core, servers scale out with processes instead
+            model.set_params(n_jobs=None if model_name=="random_forest" else 1)
+            return model
         except Exception as e:
             raise thyroidException(e, sys)
 
-    def train_model(self,x,y):
+
+    def cross_val_train_score(self,model_name:str,params:dict,search_trace:Optional[list]=None)->float:
+        """
+        Cross validated f1 of the chosen configuration on the training rows before resampling.
+        Folds of a resampled set share synthetic neighbours and score ~0.25 above the test set,
+        so the real rows are class weighted instead of resampled again. When the training set was
+        not resampled this is the score fine tuning computed on all rows, taken from its trace.
+        """
         try:
-            rf_clf =  RandomForestClassifier()
-            rf_clf.fit(x,y)
-            return rf_clf
+            data_transformation_artifact = self.data_transformation_artifact
+            resampled = data_transformation_artifact.unsampled_train_path is not None
+            train_arr = utils.load_numpy_array_data(file_path=data_transformation_artifact.unsampled_train_path
+                                                    or data_transformation_artifact.transformed_train_path,mmap_mode="r")
+            x,y = train_arr[:,:-1],train_arr[:,-1]
+            folds = list(StratifiedKFold(n_splits=self.model_trainer_config.search_cv_folds,shuffle=True,random_state=42).split(x,y))
+            n_samples = min(len(train_index) for train_index,_ in folds)
+            if not resampled:
+                for result in search_trace or []:
+                    if result["model"]==model_name and result["params"]==params and result["n_samples"]>=n_samples:
+                        return result["f1_score"]
+            return evaluate_candidate(model_name,params,x,y,folds,n_samples,n_jobs=self.model_trainer_config.n_jobs,
+                                      class_weighted=resampled or self.class_weighted)["f1_score"]
         except Exception as e:
             raise thyroidException(e, sys)
 
+    def export_model(self,model,x,y_pred)->Optional[CompiledForest]:
+        """
+        Flatten the trained forest for inference and check it predicts exactly the same classes.
+        returns None when it does not, predictions then stay on the trained model
+        """
+        try:
+            compiled_model = CompiledForest.from_sklearn(model)
+            if not np.array_equal(compiled_model.predict(x),y_pred):
+                logging.warning("Compiled model predictions differ from the trained model, not exporting it")
+                return None
+            return compiled_model
+        except Exception as e:
+            raise thyroidException(e, sys)
 
     def initiate_model_trainer(self,)->artifact_entity.ModelTrainerArtifact:
         try:
             logging.info(f"Loading train and test array.")
-            train_arr = utils.load_numpy_array_data(file_path=self.data_transformation_artifact.transformed_train_path)
+            #memory mapped so search workers share the training rows instead of copying them
+            train_arr = utils.load_numpy_array_data(file_path=self.data_transformation_artifact.transformed_train_path,mmap_mode="r")
             test_arr = utils.load_numpy_array_data(file_path=self.data_transformation_artifact.transformed_test_path)
 
             logging.info(f"Splitting input and target feature from both train and test arr.")
             x_train,y_train = train_arr[:,:-1],train_arr[:,-1]
             x_test,y_test = test_arr[:,:-1],test_arr[:,-1]
 
-            logging.info(f"Train the model")
-            model = self.train_model(x=x_train,y=y_train)
+            model_name,params,search_trace_path,trace = "random_forest",{},None,None
+            if self.model_trainer_config.fine_tune:
+                logging.info(f"Searching model hyperparameters")
+                model_name,params,trace = self.fine_tune(x=x_train,y=y_train)
+                search_trace_path = self.model_trainer_config.search_trace_path
+                utils.write_yaml_file(file_path=search_trace_path,
+                                      data={"best_model":model_name,"best_params":params,"trace":trace})
+
+            logging.info(f"Train the model: {model_name} {params}")
+            model = self.train_model(x=x_train,y=y_train,model_name=model_name,params=params)
 
             logging.info(f"Calculating f1 train score")
             yhat_train = model.predict(x_train)
@@ -69,19 +222,31 @@ class ModelTrainer:
                 expected accuracy: {self.model_trainer_config.expected_score}: model actual score: {f1_test_score}")
 
             logging.info(f"Checking if our model is overfiiting or not")
-            diff = abs(f1_train_score-f1_test_score)
+            f1_cv_train_score = self.cross_val_train_score(model_name=model_name,params=params,search_trace=trace)
+            logging.info(f"cross validated train score:{f1_cv_train_score}")
+            diff = f1_cv_train_score-f1_test_score
 
             if diff>self.model_trainer_config.overfitting_threshold:
-                raise Exception(f"Train and test score diff: {diff} is more than overfitting threshold {self.model_trainer_config.overfitting_threshold}")
+                raise Exception(f"Cross validated train and test score diff: {diff} is more than overfitting threshold {self.model_trainer_config.overfitting_threshold}")
 
             #save the trained model
             logging.info(f"Saving mode object")
             utils.save_object(file_path=self.model_trainer_config.model_path, obj=model)
 
+            #export the compiled model used for small batch inference, random forest only
+            compiled_model_path = None
+            if isinstance(model,RandomForestClassifier):
+                logging.info(f"Exporting compiled model")
+                compiled_model = self.export_model(model=model,x=x_test,y_pred=yhat_test)
+                if compiled_model is not None:
+                    compiled_model_path = self.model_trainer_config.compiled_model_path
+                    utils.save_object(file_path=compiled_model_path, obj=compiled_model)
+
             #prepare artifact
             logging.info(f"Prepare the artifact")
             model_trainer_artifact  = artifact_entity.ModelTrainerArtifact(model_path=self.model_trainer_config.model_path, 
-            f1_train_score=f1_train_score, f1_test_score=f1_test_score)
+            f1_train_score=f1_train_score, f1_test_score=f1_test_score,
+            compiled_model_path=compiled_model_path, search_trace_path=search_trace_path)
             logging.info(f"Model trainer artifact: {model_trainer_artifact}")
             return model_trainer_artifact
         except Exception as e:
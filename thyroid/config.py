@@ -1,8 +1,6 @@
-import pymongo
-import pandas as pd
-import json
 from dataclasses import dataclass
 # Provide the mongodb localhost url to connect python to mongodb.
+import threading
 import os
 
 @dataclass
@@ -13,7 +11,32 @@ class EnvironmentVariable:
 
 
 env_var = EnvironmentVariable()
-mongo_client = pymongo.MongoClient(env_var.mongo_db_url)
+#created by get_mongo_client on first use, importing the package does not import pymongo or connect
+_mongo_client = None
+_mongo_client_lock = threading.Lock()
+
+
+def get_mongo_client():
+    """
+    The configured mongo client, created on the first call and shared afterwards.
+    """
+    global _mongo_client
+    if _mongo_client is None:
+        with _mongo_client_lock:
+            if _mongo_client is None:
+                import pymongo
+                _mongo_client = pymongo.MongoClient(env_var.mongo_db_url)
+    return _mongo_client
+
+
+def __getattr__(name:str):
+    #thyroid.config.mongo_client keeps working, resolved on access
+    if name=="mongo_client":
+        return get_mongo_client()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
 TARGET_COLUMN  = "status"
-numeric_features=['age', 'TSH', 'T3','TT4', 'T4U','FTI']
\ No newline at end of file
+numeric_features=['age', 'TSH', 'T3','TT4', 'T4U','FTI']
+#load time stamped on documents upserted by thyroid.bulk_loader, not a feature
+LOADER_TIMESTAMP_FIELD = "updated_at"
@@ -0,0 +1,133 @@
+from thyroid.exception import thyroidException
+from scipy.stats import chi2, kstwo
+from typing import Dict, Iterable, List
+import pandas as pd
+import numpy as np
+import sys
+
+#floor of category proportions in PSI and of expected counts in chi-square, so categories
+#missing from one side do not divide by zero
+MIN_PROPORTION = 1e-4
+
+
+class NumericSummary:
+    """
+    Exact empirical distribution of a numerical base column: its distinct values in sorted order
+    and the fraction of base values less or equal to each of them.
+    """
+
+    def __init__(self,values:np.ndarray,cdf:np.ndarray,n:int):
+        self.values = values
+        self.cdf = cdf
+        self.n = n
+
+    @classmethod
+    def from_series(cls,series:pd.Series)->"NumericSummary":
+        values,counts = np.unique(series.dropna().to_numpy(dtype=np.float64),return_counts=True)
+        return cls(values=values,cdf=np.cumsum(counts)/counts.sum(),n=int(counts.sum()))
+
+
+class CategoricalSummary:
+    """
+    Category proportions of a categorical base column.
+    """
+
+    def __init__(self,frequencies:Dict[str,float],n:int):
+        self.frequencies = frequencies
+        self.n = n
+
+    @classmethod
+    def from_series(cls,series:pd.Series)->"CategoricalSummary":
+        counts = series.dropna().astype(str).value_counts()
+        return cls(frequencies=(counts/counts.sum()).to_dict(),n=int(counts.sum()))
+
+
+class DriftEngine:
+    """
+    Compares current data with base distributions summarised once, so every comparison costs one
+    pass over the current data only.
+    Numerical columns: two sample Kolmogorov-Smirnov test. Current values are counted into the
+    bins formed by the distinct base values chunk by chunk, which gives the exact KS statistic
+    without holding or sorting the current data, the p value is the asymptotic one.
+    Categorical columns: chi-square goodness of fit against the base proportions and the
+    population stability index (PSI).
+    """
+
+    def __init__(self,numeric_summaries:Dict[str,NumericSummary],categorical_summaries:Dict[str,CategoricalSummary],
+                pvalue_threshold:float=0.05,psi_threshold:float=0.2):
+        self.numeric_summaries = numeric_summaries
+        self.categorical_summaries = categorical_summaries
+        self.pvalue_threshold = pvalue_threshold
+        self.psi_threshold = psi_threshold
+
+    @classmethod
+    def from_frame(cls,df:pd.DataFrame,numeric_columns:List[str],categorical_columns:List[str],**kwargs)->"DriftEngine":
+        try:
+            return cls(numeric_summaries={column:NumericSummary.from_series(df[column]) for column in numeric_columns},
+                       categorical_summaries={column:CategoricalSummary.from_series(df[column]) for column in categorical_columns},
+                       **kwargs)
+        except Exception as e:
+            raise thyroidException(e, sys)
+
+    def compare(self,chunks:Iterable[pd.DataFrame])->dict:
+        """
+        chunks: current data as one or more dataframes, columns missing from a chunk are skipped
+        returns drift report per column
+        """
+        try:
+            #per numeric column, counts of current values equal to base value i (equal[i]) and
+            #strictly between base values i-1 and i (between[i], between[-1] is above the largest)
+            equal = {column:np.zeros(len(summary.values),dtype=np.int64) for column,summary in self.numeric_summaries.items()}
+            between = {column:np.zeros(len(summary.values)+1,dtype=np.int64) for column,summary in self.numeric_summaries.items()}
+            category_counts = {column:pd.Series(dtype=np.int64) for column in self.categorical_summaries}
+            for chunk in chunks:
+                for column,summary in self.numeric_summaries.items():
+                    if column not in chunk.columns:
+                        continue
+                    values = chunk[column].to_numpy(dtype=np.float64)
+                    values = values[~np.isnan(values)]
+                    index = np.searchsorted(summary.values,values,side="left")
+                    is_equal = summary.values.take(np.minimum(index,len(summary.values)-1))==values
+                    equal[column]+=np.bincount(index[is_equal],minlength=len(summary.values))
+                    between[column]+=np.bincount(index[~is_equal],minlength=len(summary.values)+1)
+                for column in self.categorical_summaries:
+                    if column in chunk.columns:
+                        category_counts[column] = category_counts[column].add(
+                            chunk[column].dropna().astype(str).value_counts(),fill_value=0)
+
+            report = dict()
+            for column,summary in self.numeric_summaries.items():
+                report[column] = self.ks_test(summary,equal[column],between[column])
+            for column,summary in self.categorical_summaries.items():
+                report[column] = self.categorical_test(summary,category_counts[column])
+            return report
+        except Exception as e:
+            raise thyroidException(e, sys)
+
+    def ks_test(self,summary:NumericSummary,equal:np.ndarray,between:np.ndarray)->dict:
+        n = int(equal.sum()+between.sum())
+        if n==0 or summary.n==0:
+            return {"pvalues":None,"statistic":None,"same_distribution":None}
+        #current cdf just below and at every base value
+        below = (np.cumsum(between[:-1])+np.concatenate([[0],np.cumsum(equal)[:-1]]))/n
+        at = below+equal/n
+        #base cdf just below every base value is the cdf at the previous one
+        base_below = np.concatenate([[0.0],summary.cdf[:-1]])
+        statistic = float(max(np.abs(summary.cdf-at).max(),np.abs(base_below-below).max()))
+        pvalue = float(kstwo.sf(statistic,np.round(summary.n*n/(summary.n+n))))
+        return {"pvalues":pvalue,"statistic":statistic,"same_distribution":pvalue>self.pvalue_threshold}
+
+    def categorical_test(self,summary:CategoricalSummary,counts:pd.Series)->dict:
+        n = float(counts.sum())
+        if n==0 or summary.n==0:
+            return {"pvalues":None,"statistic":None,"psi":None,"same_distribution":None}
+        categories = sorted(set(summary.frequencies)|set(counts.index))
+        base = np.maximum(np.array([summary.frequencies.get(category,0.0) for category in categories]),MIN_PROPORTION)
+        base = base/base.sum()
+        observed = counts.reindex(categories,fill_value=0).to_numpy(dtype=np.float64)
+        statistic = float(((observed-base*n)**2/(base*n)).sum())
+        pvalue = float(chi2.sf(statistic,max(len(categories)-1,1)))
+        current = np.maximum(observed/n,MIN_PROPORTION)
+        psi = float(((current-base)*np.log(current/base)).sum())
+        return {"pvalues":pvalue,"statistic":statistic,"psi":psi,
+                "same_distribution":bool(pvalue>self.pvalue_threshold and psi<=self.psi_threshold)}
@@ -1,4 +1,5 @@
 from dataclasses import dataclass
+from typing import Optional
 
 @dataclass
 class DataIngestionArtifact:
@@ -9,6 +10,7 @@ class DataIngestionArtifact:
 @dataclass
 class DataValidationArtifact:
     report_file_path:str
+    reference_profile_path:str
 
 
 @dataclass
@@ -18,12 +20,18 @@ class DataTransformationArtifact:
     transformed_test_path:str
     input_encoder_path:str
     target_encoder_path:str
+    resampling:str
+    schema_validator_path:str
+    #training rows before resampling, None when the training set was not resampled
+    unsampled_train_path:Optional[str] = None
 
 @dataclass
 class ModelTrainerArtifact:
     model_path:str 
     f1_train_score:float 
     f1_test_score:float
+    compiled_model_path:Optional[str]
+    search_trace_path:Optional[str]
 
 @dataclass
 class ModelEvaluationArtifact:
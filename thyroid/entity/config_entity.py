@@ -1,9 +1,13 @@
 import os,sys
 from thyroid.exception import thyroidException
 from thyroid.logger import logging
+from thyroid.utils import resolve_n_jobs
+from typing import List, Optional
 from datetime import datetime
 
 FILE_NAME = "thyroid.csv"
+RAW_FILE_NAME = "raw_thyroid.csv"
+INCREMENTAL_STORE_FILE_NAME = "thyroid.parquet"
 TRAIN_FILE_NAME = "train.csv"
 TEST_FILE_NAME = "test.csv"
 
@@ -11,12 +15,28 @@ TRANSFORMER_OBJECT_FILE_NAME = "transformer.pkl"
 INPUT_ENCODER_OBJECT_FILE_NAME = "input_encoder.pkl"
 TARGET_ENCODER_OBJECT_FILE_NAME = "target_encoder.pkl"
 MODEL_FILE_NAME = "model.pkl"
+SCHEMA_VALIDATOR_FILE_NAME = "schema_validator.pkl"
+COMPILED_MODEL_FILE_NAME = "compiled_model.pkl"
+THYROID_MODEL_FILE_NAME = "thyroid_model.pkl"
 
 class TrainingPipelineConfig:
 
-    def __init__(self):
+    def __init__(self,n_jobs:Optional[int]=None,profile_stages:Optional[List[str]]=None,profiler:Optional[str]=None):
         try:
             self.artifact_dir = os.path.join(os.getcwd(),"artifact",f"{datetime.now().strftime('%m%d%Y__%H%M%S')}")
+            #cores used by every component, None reads TRAINING_N_JOBS env variable or uses all cores
+            if n_jobs is None and os.getenv("TRAINING_N_JOBS"):
+                n_jobs = int(os.getenv("TRAINING_N_JOBS"))
+            self.n_jobs = resolve_n_jobs(n_jobs)
+            #wall time, cpu time, peak rss and rows of every stage
+            self.run_profile_file_path = os.path.join(self.artifact_dir,"run_profile.yaml")
+            #stages run under a flame profiler, None reads comma separated TRAINING_PROFILE_STAGES env variable
+            if profile_stages is None:
+                profile_stages = [stage for stage in os.getenv("TRAINING_PROFILE_STAGES","").split(",") if stage]
+            self.profile_stages = profile_stages
+            #one of instrumentation.PROFILERS, None reads TRAINING_PROFILER env variable
+            self.profiler = profiler or os.getenv("TRAINING_PROFILER","cprofile")
+            self.profile_dir = os.path.join(self.artifact_dir,"profiles")
         except Exception  as e:
             raise thyroidException(e,sys)     
 
@@ -32,6 +52,20 @@ class DataIngestionConfig:
             self.train_file_path = os.path.join(self.data_ingestion_dir,"dataset",TRAIN_FILE_NAME)
             self.test_file_path = os.path.join(self.data_ingestion_dir,"dataset",TEST_FILE_NAME)
             self.test_size = 0.2
+            #number of documents read from mongo and written to disk at a time
+            self.batch_size = 10000
+            #write feature store and train/test split chunk by chunk instead of building the whole dataframe,
+            #rows are split by a seeded per row draw so membership differs from the in memory train_test_split
+            self.streaming = False
+            #fetch only documents added or changed since the last run and merge them into a persistent
+            #columnar store shared by every run, train/test membership is decided by a hash of the record key
+            self.incremental = False
+            #field increasing on every insert or update, _id (ObjectId) tracks inserts only,
+            #collections loaded with bulk_loader upserts carry config.LOADER_TIMESTAMP_FIELD
+            self.watermark_field = "_id"
+            self.incremental_store_dir = os.path.join("artifact","feature_store")
+            self.incremental_store_file_path = os.path.join(self.incremental_store_dir,INCREMENTAL_STORE_FILE_NAME)
+            self.watermark_file_path = os.path.join(self.incremental_store_dir,"watermark.yaml")
         except Exception  as e:
             raise thyroidException(e,sys)     
 
@@ -48,6 +82,13 @@ class DataValidationConfig:
         self.report_file_path=os.path.join(self.data_validation_dir, "report.yaml")
         self.missing_threshold:float = 0.2
         self.base_file_path = os.path.join("Thyroid-Disease-Data-Set.csv")
+        #reference profiles of base files, one per base file content hash, shared by every run
+        self.reference_profile_dir = os.path.join("artifact","reference_profile")
+        #rows of the train and test file scanned at a time
+        self.chunk_size = 10000
+        #distributions differ below this KS / chi-square p value, categorical ones also above this PSI
+        self.drift_pvalue_threshold = 0.05
+        self.psi_threshold = 0.2
 
 class DataTransformationConfig:
 
@@ -58,6 +99,14 @@ class DataTransformationConfig:
         self.transformed_test_path =os.path.join(self.data_transformation_dir,"transformed",TEST_FILE_NAME.replace("csv","npz"))
         self.input_encoder_path = os.path.join(self.data_transformation_dir,"input_encoder",INPUT_ENCODER_OBJECT_FILE_NAME)
         self.target_encoder_path = os.path.join(self.data_transformation_dir,"target_encoder",TARGET_ENCODER_OBJECT_FILE_NAME)
+        self.schema_validator_path = os.path.join(self.data_transformation_dir,"schema_validator",SCHEMA_VALIDATOR_FILE_NAME)
+        #training set resampling, one of data_transformation.RESAMPLING_STRATEGIES, class_weight is opt-in:
+        #it skips the neighbour search but scored lower test f1 on the base dataset (0.741 vs 0.754, 5 split seeds)
+        self.resampling = "smote_tomek"
+        #training rows before resampling, the trainer cross validates the chosen model on them
+        self.unsampled_train_path = os.path.join(self.data_transformation_dir,"transformed",TRAIN_FILE_NAME.replace(".csv","_unsampled.npz"))
+        #cores used by the nearest neighbour searches of resampling
+        self.n_jobs = training_pipeline_config.n_jobs
         
 
 class ModelTrainerConfig:
@@ -65,8 +114,23 @@ class ModelTrainerConfig:
     def __init__(self,training_pipeline_config:TrainingPipelineConfig):
         self.model_trainer_dir = os.path.join(training_pipeline_config.artifact_dir , "model_trainer")
         self.model_path = os.path.join(self.model_trainer_dir,"model",MODEL_FILE_NAME)
+        self.compiled_model_path = os.path.join(self.model_trainer_dir,"compiled_model",COMPILED_MODEL_FILE_NAME)
         self.expected_score = 0.7
+        #largest amount the cross validated f1 of the training rows may exceed the test f1. Out of fold
+        #because forests score ~1.0 on the rows they were fit on. Models passing expected_score on the
+        #base dataset stayed below +0.05 (5 split seeds), a training set the test set does not resemble goes above
         self.overfitting_threshold = 0.1
+        #hyperparameter search, random configurations per model family narrowed by successive halving
+        self.fine_tune = True
+        self.search_candidates = 8
+        self.search_cv_folds = 3
+        self.search_halving_factor = 3
+        self.search_min_samples = 500
+        #seconds, the search stops after the rung running when the budget is spent
+        self.search_time_budget = 30*60
+        #cores used by the search candidate processes and by the final model fit
+        self.n_jobs = training_pipeline_config.n_jobs
+        self.search_trace_path = os.path.join(self.model_trainer_dir,"search_trace.yaml")
 
 
 class ModelEvaluationConfig:
@@ -83,6 +147,13 @@ class ModelPusherConfig:
         self.pusher_transformer_path = os.path.join(self.pusher_model_dir,TRANSFORMER_OBJECT_FILE_NAME)
         self.pusher_input_encoder_path = os.path.join(self.pusher_model_dir,INPUT_ENCODER_OBJECT_FILE_NAME)
         self.pusher_target_encoder_path = os.path.join(self.pusher_model_dir,TARGET_ENCODER_OBJECT_FILE_NAME)
+        self.pusher_thyroid_model_path = os.path.join(self.pusher_model_dir,THYROID_MODEL_FILE_NAME)
+        #dill: single pickle, the fastest to load. joblib: numpy arrays are memory mapped on load, but
+        #sklearn copies the tree arrays of its forest so every process still holds its own copy
+        self.serialization_format = "dill"
+        #save the compiled forest in place of the sklearn forest with joblib, so prediction workers memory
+        #map its node arrays and share them; batches above COMPILED_FOREST_MAX_ROWS rows are scored slower
+        self.memory_mapped_forest = False
 
 
 
@@ -18,3 +18,10 @@ class thyroidException(Exception):
 
     def __str__(self):
         return self.error_message
+
+
+class InvalidInputError(Exception):
+    """
+    Input rejected by schema validation. The message only names the rejected rows and their
+    reasons, so unlike thyroidException it can be returned to the caller of the service.
+    """
@@ -0,0 +1,169 @@
+from thyroid.exception import thyroidException
+from thyroid.logger import logging
+from thyroid.utils import write_yaml_file
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Callable, List, Optional
+import numpy as np
+import cProfile
+import resource
+import shutil
+import signal
+import subprocess
+import time
+import os,sys
+
+#flame profile of a stage: cProfile stats (<stage>.prof, snakeviz / flameprof / gprof2dot) or a
+#py-spy flamegraph (<stage>.svg), py-spy must be on PATH and allowed to attach to the process
+PROFILERS = ["cprofile","py-spy"]
+
+
+def reset_peak_rss()->bool:
+    """
+    Resets the peak resident set size of the process (linux only), returns False when unsupported.
+    """
+    try:
+        with open("/proc/self/clear_refs","w") as file_obj:
+            file_obj.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def get_peak_rss_mb()->float:
+    """
+    Peak resident set size of the process in MB, since the last reset_peak_rss on linux.
+    """
+    try:
+        with open("/proc/self/status") as file_obj:
+            for line in file_obj:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])/1024
+    except OSError:
+        pass
+    #ru_maxrss is KB on linux and bytes on macOS
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return max_rss/(1024*1024) if sys.platform=="darwin" else max_rss/1024
+
+
+def count_rows(*file_paths:str)->int:
+    """
+    Description: Total number of rows of csv, npy/npz and parquet files, without loading them
+    =========================================================
+    Params:
+    file_paths: files to count, missing files are skipped
+    =========================================================
+    return number of rows
+    """
+    try:
+        rows = 0
+        for file_path in file_paths:
+            if file_path is None or not os.path.exists(file_path):
+                continue
+            extension = os.path.splitext(file_path)[1]
+            if extension==".parquet":
+                import pyarrow.parquet as pq
+                rows+=pq.ParquetFile(file_path).metadata.num_rows
+            elif extension in (".npy",".npz"):
+                #utils.save_numpy_array_data writes the .npy format whatever the extension
+                arrays = np.load(file_path,mmap_mode="r")
+                rows+=arrays.shape[0] if isinstance(arrays,np.ndarray) else arrays[arrays.files[0]].shape[0]
+            else:
+                #csv rows minus the header, counted in 1MB blocks
+                with open(file_path,"rb") as file_obj:
+                    rows+=sum(block.count(b"\n") for block in iter(lambda: file_obj.read(1<<20),b""))-1
+        return rows
+    except Exception as e:
+        raise thyroidException(e, sys)
+
+
+class StageInstrumentation:
+    """
+    Records wall time, CPU time, peak RSS and row count of every pipeline stage run through measure().
+    CPU time is the time of every thread of the process plus child processes that exited during
+    the stage, long lived worker pools (joblib loky) are not included. Peak RSS is the peak of the
+    stage on linux, elsewhere the peak of the process so far.
+    Stages listed in profile_stages are run under a flame profiler, the files go to profile_dir.
+    """
+
+    def __init__(self,profile_dir:str,profile_stages:Optional[List[str]]=None,profiler:str="cprofile"):
+        try:
+            if profiler not in PROFILERS:
+                raise Exception(f"Unknown profiler: {profiler}, expected one of {PROFILERS}")
+        except Exception as e:
+            raise thyroidException(e, sys)
+        self.profile_dir = profile_dir
+        self.profile_stages = profile_stages or []
+        self.profiler = profiler
+        self.started_at = datetime.now().isoformat()
+        #stage name: metrics
+        self.stages = dict()
+
+    @contextmanager
+    def flame_profile(self,stage:str):
+        """
+        Runs the enclosed code under the configured profiler, yields the profile file path.
+        """
+        os.makedirs(self.profile_dir,exist_ok=True)
+        py_spy = shutil.which("py-spy") if self.profiler=="py-spy" else None
+        if self.profiler=="py-spy" and py_spy is None:
+            logging.warning("py-spy not found on PATH, profiling with cProfile")
+        if py_spy is not None:
+            profile_path = os.path.join(self.profile_dir,f"{stage}.svg")
+            process = subprocess.Popen([py_spy,"record","--pid",str(os.getpid()),"--subprocesses",
+                                        "--output",profile_path,"--format","flamegraph"])
+            try:
+                yield profile_path
+            finally:
+                #py-spy writes the flamegraph when interrupted
+                process.send_signal(signal.SIGINT)
+                process.wait()
+        else:
+            profile_path = os.path.join(self.profile_dir,f"{stage}.prof")
+            profile = cProfile.Profile()
+            profile.enable()
+            try:
+                yield profile_path
+            finally:
+                profile.disable()
+                profile.dump_stats(profile_path)
+
+    def measure(self,stage:str,func:Callable,rows:Optional[Callable]=None):
+        """
+        stage: stage name
+        func: runs the stage, its return value is returned
+        rows: called with the return value of func, returns the number of rows the stage produced
+        A stage that raises is recorded with status "failed" before the error is re-raised.
+        """
+        peak_rss_scope = "stage" if reset_peak_rss() else "process"
+        start_times = os.times()
+        start = time.perf_counter()
+        metrics = dict()
+        try:
+            if stage in self.profile_stages:
+                with self.flame_profile(stage) as profile_path:
+                    metrics["profile_path"] = profile_path
+                    result = func()
+            else:
+                result = func()
+            metrics["rows"] = rows(result) if rows is not None and result is not None else None
+            return result
+        except Exception as e:
+            metrics["status"] = "failed"
+            metrics["error"] = str(e)
+            raise thyroidException(e, sys)
+        finally:
+            end_times = os.times()
+            metrics.update({"wall_seconds":round(time.perf_counter()-start,3),
+                            "cpu_seconds":round(sum(end-begin for end,begin in zip(end_times[:4],start_times[:4])),3),
+                            "peak_rss_mb":round(get_peak_rss_mb(),1),"peak_rss_scope":peak_rss_scope})
+            self.stages[stage] = metrics
+            logging.info(f"Stage {stage}: {metrics}")
+
+    def write(self,file_path:str)->None:
+        write_yaml_file(file_path=file_path,data=self.to_dict())
+
+    def to_dict(self)->dict:
+        return {"started_at":self.started_at,"pid":os.getpid(),
+                "total_wall_seconds":round(sum(metrics["wall_seconds"] for metrics in self.stages.values()),3),
+                "stage_order":list(self.stages),"stages":self.stages}
@@ -1,22 +1,204 @@
 import logging
+import logging.handlers
+import atexit
+import copy
+import json
+import queue
+import threading
 import os, sys
 from datetime import datetime
 
 #log file name
 LOG_FILE_NAME = f"{datetime.now().strftime('%m%d%Y__%H%M%S')}.log"
 
-#log directory
+#log directory, created with the log file when the first record is written
 LOG_FILE_DIR = os.path.join(os.getcwd(),"logs")
 
-#create folder if not available
-os.makedirs(LOG_FILE_DIR,exist_ok=True)
-
 #log file path
 
 LOG_FILE_PATH = os.path.join(LOG_FILE_DIR,LOG_FILE_NAME)
 
-logging.basicConfig(
-    filename=LOG_FILE_PATH,
-    format="[ %(asctime)s ] %(lineno)d %(name)s - %(levelname)s - %(message)s",
-    level=logging.INFO,
-)
\ No newline at end of file
+#json: one json object per line, text: the previous "[ time ] line name - level - message" lines
+LOG_FORMAT = os.getenv("LOG_FORMAT","json")
+#the log file is rotated at this size, keeping this many previous files
+LOG_MAX_BYTES = int(os.getenv("LOG_MAX_BYTES",10*1024*1024))
+LOG_BACKUP_COUNT = int(os.getenv("LOG_BACKUP_COUNT",5))
+#records waiting for the writer thread, further records are dropped instead of blocking the caller
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE",10000))
+#sequences up to this length are logged in full, longer ones and every array or dataframe are summarised
+MAX_INLINE_ITEMS = 50
+
+TEXT_FORMAT = "[ %(asctime)s ] %(lineno)d %(name)s - %(levelname)s - %(message)s"
+
+
+def summarize(obj)->object:
+    """
+    Short description of large objects (shape and dtype of arrays, shape and columns of
+    dataframes), other objects are returned unchanged. Costs the same for any object size.
+    """
+    if obj is None or isinstance(obj,(str,int,float)):
+        return obj
+    #looked up instead of imported, logging never imports numpy or pandas itself
+    np = sys.modules.get("numpy")
+    pd = sys.modules.get("pandas")
+    if np is not None and isinstance(obj,np.ndarray):
+        return f"ndarray(shape={obj.shape}, dtype={obj.dtype})"
+    if pd is not None:
+        if isinstance(obj,pd.DataFrame):
+            return f"DataFrame(shape={obj.shape}, columns={summarize(obj.columns)})"
+        if isinstance(obj,pd.Series):
+            return f"Series(name={obj.name}, length={len(obj)}, dtype={obj.dtype})"
+        if isinstance(obj,pd.Index):
+            return list(obj) if len(obj)<=MAX_INLINE_ITEMS else f"Index(length={len(obj)}, dtype={obj.dtype})"
+    if isinstance(obj,(list,tuple,set,dict)) and len(obj)>MAX_INLINE_ITEMS:
+        return f"{type(obj).__name__}(length={len(obj)})"
+    return obj
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    One json object per record: time, level, logger, module, line, process, thread and message,
+    plus the exception traceback when there is one.
+    """
+
+    def format(self,record:logging.LogRecord)->str:
+        entry = {"time":datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+                 "level":record.levelname,"logger":record.name,"module":record.module,"line":record.lineno,
+                 "process":record.process,"thread":record.threadName,"message":record.getMessage()}
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry,default=str)
+
+
+class AsyncQueueHandler(logging.handlers.QueueHandler):
+    """
+    Hands records to the writer thread of a QueueListener. The caller merges the summarised
+    arguments into the message and puts a copy of the record on a bounded queue, formatting and
+    file writes happen in the writer thread. When the queue is full the record is dropped and
+    counted in dropped.
+    """
+
+    def __init__(self,log_queue:queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self,record:logging.LogRecord)->logging.LogRecord:
+        #a large message object or argument (logging.info(array), logging.info("%s",df)) is replaced
+        #by its summary so it is never rendered
+        record = copy.copy(record)
+        if not isinstance(record.msg,str):
+            record.msg = summarize(record.msg)
+        if isinstance(record.args,tuple):
+            record.args = tuple(summarize(arg) for arg in record.args)
+        elif isinstance(record.args,dict):
+            record.args = {name:summarize(arg) for name,arg in record.args.items()}
+        #merged like QueueHandler.prepare does, arguments changed after the call are logged as they were
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            #tracebacks hold frames, render them now
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self,record:logging.LogRecord)->None:
+        #the writer thread starts with the first record, importing the package starts nothing
+        if queue_listener is None:
+            start_listener()
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped+=1
+
+
+class LazyRotatingFileHandler(logging.handlers.RotatingFileHandler):
+    """
+    Rotating file handler creating the log directory when it opens the file.
+    """
+
+    def _open(self):
+        os.makedirs(os.path.dirname(self.baseFilename),exist_ok=True)
+        return super()._open()
+
+
+def get_log_file_path()->str:
+    """
+    LOG_FILE_PATH in the main process, <log file name>_<pid>.log in multiprocessing workers and
+    forked children, so every process rotates only its own file.
+    """
+    if in_child_process():
+        return f"{os.path.splitext(LOG_FILE_PATH)[0]}_{os.getpid()}.log"
+    return LOG_FILE_PATH
+
+
+def in_child_process()->bool:
+    multiprocessing = sys.modules.get("multiprocessing")
+    return is_child_process or (multiprocessing is not None and multiprocessing.parent_process() is not None)
+
+
+def get_file_handler()->logging.Handler:
+    file_handler = LazyRotatingFileHandler(get_log_file_path(),maxBytes=LOG_MAX_BYTES,
+                                           backupCount=LOG_BACKUP_COUNT,delay=True)
+    file_handler.setFormatter(JsonFormatter() if LOG_FORMAT=="json" else logging.Formatter(TEXT_FORMAT))
+    return file_handler
+
+
+def install_handler()->None:
+    """
+    Routes the root logger through a new queue, also called in forked child processes, which
+    inherit the handler but not the writer thread of their parent.
+    """
+    global queue_handler, queue_listener
+    root_logger = logging.getLogger()
+    if queue_handler is not None:
+        root_logger.removeHandler(queue_handler)
+    queue_handler = AsyncQueueHandler(queue.Queue(maxsize=LOG_QUEUE_SIZE))
+    queue_listener = None
+    root_logger.addHandler(queue_handler)
+    root_logger.setLevel(logging.INFO)
+
+
+def start_listener()->logging.handlers.QueueListener:
+    global queue_listener
+    with listener_lock:
+        if queue_listener is None:
+            listener = logging.handlers.QueueListener(queue_handler.queue,get_file_handler(),respect_handler_level=True)
+            listener.start()
+            queue_listener = listener
+            if in_child_process():
+                #multiprocessing workers leave through os._exit, which skips atexit but runs its finalizers.
+                #registered here, a worker clears the finalizers it inherited after the fork hooks ran
+                multiprocessing_util = sys.modules.get("multiprocessing.util")
+                if multiprocessing_util is not None:
+                    multiprocessing_util.Finalize(None,stop_listener,exitpriority=0)
+    return queue_listener
+
+
+def stop_listener()->None:
+    #writes the records still queued, registered to run at interpreter exit
+    if queue_listener is not None and queue_listener._thread is not None:
+        queue_listener.stop()
+        for handler in queue_listener.handlers:
+            if queue_handler.dropped>0:
+                handler.handle(logging.makeLogRecord({"levelno":logging.WARNING,"levelname":"WARNING",
+                               "msg":f"{queue_handler.dropped} log records dropped, the log queue was full"}))
+            handler.close()
+
+
+def restart_in_child()->None:
+    global listener_lock, is_child_process
+    listener_lock = threading.Lock()
+    is_child_process = True
+    install_handler()
+
+
+queue_handler = None
+queue_listener = None
+listener_lock = threading.Lock()
+is_child_process = False
+install_handler()
+atexit.register(stop_listener)
+if hasattr(os,"register_at_fork"):
+    os.register_at_fork(after_in_child=restart_in_child)
@@ -0,0 +1,151 @@
+from thyroid.exception import thyroidException
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+import bisect
+import threading
+import time
+import os,sys
+
+#seconds, prediction phases of one record take tens of microseconds, of a large batch seconds
+LATENCY_BUCKETS = [0.0001,0.00025,0.0005,0.001,0.0025,0.005,0.01,0.025,0.05,0.1,0.25,0.5,1,2.5,5,10,30]
+#phases of the prediction path, from finding the model version to writing the scored rows
+PREDICTION_PHASES = ["resolve","load","read","validate","encode","scale","predict","decode","write"]
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def format_labels(label_names:List[str],label_values:Tuple[str,...],extra:str="")->str:
+    labels = [f'{name}="{value}"' for name,value in zip(label_names,label_values)]
+    if extra:
+        labels.append(extra)
+    return "{"+",".join(labels)+"}" if labels else ""
+
+
+def format_value(value:float)->str:
+    if value==float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Counter:
+    """
+    Monotonic count per label values.
+    """
+    type_name = "counter"
+
+    def __init__(self,name:str,documentation:str,label_names:Optional[List[str]]=None):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = label_names or []
+        self.lock = threading.Lock()
+        self.values:Dict[Tuple[str,...],float] = dict()
+
+    def inc(self,amount:float=1,**labels)->None:
+        key = tuple(str(labels[name]) for name in self.label_names)
+        with self.lock:
+            self.values[key] = self.values.get(key,0)+amount
+
+    def samples(self)->List[str]:
+        with self.lock:
+            return [f"{self.name}{format_labels(self.label_names,key)} {format_value(value)}"
+                    for key,value in sorted(self.values.items())]
+
+
+class Histogram:
+    """
+    Observations counted into buckets per label values, with their sum and count.
+    """
+    type_name = "histogram"
+
+    def __init__(self,name:str,documentation:str,label_names:Optional[List[str]]=None,buckets:List[float]=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = label_names or []
+        self.buckets = sorted(buckets)+[float("inf")]
+        self.lock = threading.Lock()
+        #label values: [bucket counts (not cumulative), sum, count]
+        self.values:Dict[Tuple[str,...],list] = dict()
+
+    def observe(self,value:float,**labels)->None:
+        key = tuple(str(labels[name]) for name in self.label_names)
+        bucket = bisect.bisect_left(self.buckets,value)
+        with self.lock:
+            if key not in self.values:
+                self.values[key] = [[0]*len(self.buckets),0.0,0]
+            counts = self.values[key]
+            counts[0][bucket]+=1
+            counts[1]+=value
+            counts[2]+=1
+
+    @contextmanager
+    def time(self,**labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter()-start,**labels)
+
+    def samples(self)->List[str]:
+        lines = []
+        with self.lock:
+            for key,(bucket_counts,total,count) in sorted(self.values.items()):
+                cumulative = 0
+                for bound,bucket_count in zip(self.buckets,bucket_counts):
+                    cumulative+=bucket_count
+                    bucket_labels = format_labels(self.label_names,key,'le="'+format_value(bound)+'"')
+                    lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+                lines.append(f"{self.name}_sum{format_labels(self.label_names,key)} {format_value(total)}")
+                lines.append(f"{self.name}_count{format_labels(self.label_names,key)} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    """
+    Metrics of this process rendered in the Prometheus text exposition format, served by the
+    prediction service on /metrics and written to a file by batch prediction (the format the
+    node_exporter textfile collector reads).
+    """
+
+    def __init__(self):
+        self.metrics = []
+
+    def register(self,metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self)->str:
+        lines = []
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type_name}")
+            lines.extend(metric.samples())
+        return "\n".join(lines)+"\n"
+
+    def write(self,file_path:str)->None:
+        """
+        Description: Write the metrics to a file, replaced atomically so a collector never reads a partial file
+        =========================================================
+        Params:
+        file_path: metrics file, usually with a .prom extension
+        =========================================================
+        """
+        try:
+            file_dir = os.path.dirname(file_path)
+            if file_dir:
+                os.makedirs(file_dir,exist_ok=True)
+            tmp_file_path = f"{file_path}.tmp"
+            with open(tmp_file_path,"w") as file_obj:
+                file_obj.write(self.render())
+            os.replace(tmp_file_path,file_path)
+        except Exception as e:
+            raise thyroidException(e, sys)
+
+
+registry = MetricsRegistry()
+#phase: one of PREDICTION_PHASES
+PHASE_SECONDS = registry.register(Histogram("thyroid_prediction_phase_seconds",
+                "Seconds spent in each phase of the prediction path",label_names=["phase"]))
+#source: batch or service
+ROWS_SCORED = registry.register(Counter("thyroid_prediction_rows_scored_total",
+                "Rows scored by the model",label_names=["source"]))
+ROWS_REJECTED = registry.register(Counter("thyroid_prediction_rows_rejected_total",
+                "Rows rejected by schema validation, for the service every row of a rejected request",label_names=["source"]))
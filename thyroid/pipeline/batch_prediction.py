@@ -1,54 +1,337 @@
 from thyroid.exception import thyroidException
 from thyroid.logger import logging
-from thyroid.predictor import ModelResolver
+from thyroid.predictor import ModelResolver, model_cache
+from thyroid.metrics import PHASE_SECONDS, ROWS_REJECTED, ROWS_SCORED, registry
+from thyroid import utils
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import List, Optional, Tuple
 import pandas as pd
-from thyroid.utils import load_object
 import os,sys
+import time
 from datetime import datetime
 PREDICTION_DIR="prediction"
+MODEL_REGISTRY="saved_models"
+#number of worker processes used by start_parallel_batch_prediction, defaults to all cores
+BATCH_PREDICTION_WORKERS=os.getenv("BATCH_PREDICTION_WORKERS")
+
+#rows read, scored and written at a time by start_batch_prediction, None reads the whole file
+PREDICTION_CHUNK_SIZE=os.getenv("PREDICTION_CHUNK_SIZE")
+#prediction file format (csv, parquet or feather) and compression, None is the format default
+PREDICTION_OUTPUT_FORMAT=os.getenv("PREDICTION_OUTPUT_FORMAT","csv")
+PREDICTION_COMPRESSION=os.getenv("PREDICTION_COMPRESSION")
+#prometheus text file the metrics of the prediction path are written to after every file, None skips it
+PREDICTION_METRICS_FILE=os.getenv("PREDICTION_METRICS_FILE")
+PREDICTION_COLUMNS=["prediction","cat_pred"]
+#column of the reject file explaining why a row was not scored
+REJECT_REASON_COLUMN="reject_reason"
 
 import numpy as np
-def start_batch_prediction(input_file_path):
+
+
+class PredictionWriter:
+    """
+    Appends scored chunks to a prediction file. Subclasses implement one output format.
+    """
+    extension = ""
+    #columnar formats store the numerical features as float columns, csv keeps the input text
+    typed = False
+
+    def __init__(self,file_path:str,compression:Optional[str]=None):
+        self.file_path = file_path
+        self.compression = compression
+        self.n_rows = 0
+        #columns of an empty chunk, written on close when no row was written at all
+        self.empty_df:Optional[pd.DataFrame] = None
+
+    def write(self,df:pd.DataFrame)->None:
+        if len(df)==0:
+            #a chunk where every row was rejected, its empty columns have no arrow types and would
+            #fix a file schema the scored chunks do not match
+            self.empty_df = df
+            return
+        self.write_chunk(df)
+        self.n_rows+=len(df)
+
+    def write_chunk(self,df:pd.DataFrame)->None:
+        raise NotImplementedError
+
+    def close(self)->None:
+        #no row scored, the file is still created with the columns of the output
+        if self.n_rows==0 and self.empty_df is not None:
+            self.write_chunk(self.empty_df)
+
+
+class CsvPredictionWriter(PredictionWriter):
+    extension = ".csv"
+    compression_extensions = {"gzip":".gz","bz2":".bz2","xz":".xz","zstd":".zst"}
+
+    def __init__(self,file_path:str,compression:Optional[str]=None):
+        super().__init__(file_path=file_path+self.compression_extensions.get(compression,""),compression=compression)
+
+    def write_chunk(self,df:pd.DataFrame)->None:
+        df.to_csv(self.file_path,mode="w" if self.n_rows==0 else "a",index=False,header=self.n_rows==0,
+                  compression=self.compression)
+
+
+class ParquetPredictionWriter(PredictionWriter):
+    extension = ".parquet"
+    typed = True
+
+    def __init__(self,file_path:str,compression:Optional[str]=None):
+        super().__init__(file_path=file_path,compression=compression or "snappy")
+        self.writer = None
+
+    def write_chunk(self,df:pd.DataFrame)->None:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        table = pa.Table.from_pandas(df,preserve_index=False)
+        if self.writer is None:
+            self.writer = pq.ParquetWriter(self.file_path,table.schema,compression=self.compression)
+        #every chunk becomes a row group
+        self.writer.write_table(table)
+
+    def close(self)->None:
+        super().close()
+        if self.writer is not None:
+            self.writer.close()
+
+
+class FeatherPredictionWriter(PredictionWriter):
+    extension = ".feather"
+    typed = True
+
+    def __init__(self,file_path:str,compression:Optional[str]=None):
+        super().__init__(file_path=file_path,compression=compression)
+        self.writer = None
+
+    def write_chunk(self,df:pd.DataFrame)->None:
+        import pyarrow as pa
+        table = pa.Table.from_pandas(df,preserve_index=False)
+        if self.writer is None:
+            options = pa.ipc.IpcWriteOptions(compression=self.compression)
+            self.writer = pa.ipc.new_file(self.file_path,table.schema,options=options)
+        self.writer.write_table(table)
+
+    def close(self)->None:
+        super().close()
+        if self.writer is not None:
+            self.writer.close()
+
+
+PREDICTION_WRITERS = {"csv":CsvPredictionWriter,"parquet":ParquetPredictionWriter,"feather":FeatherPredictionWriter}
+
+
+def get_prediction_writer(file_path:str,output_format:str="csv",compression:Optional[str]=None)->PredictionWriter:
+    """
+    file_path: output path without extension, the writer adds the extension of its format
+    """
+    if output_format not in PREDICTION_WRITERS:
+        raise Exception(f"Unknown prediction output format: {output_format}, expected one of {list(PREDICTION_WRITERS)}")
+    writer_class = PREDICTION_WRITERS[output_format]
+    return writer_class(file_path=file_path+writer_class.extension,compression=compression)
+
+
+def predict_chunk(df:pd.DataFrame,loaded_model,typed:bool=False)->Tuple[pd.DataFrame,pd.DataFrame]:
+    """
+    Scores one chunk of input rows read as text.
+    Rows are checked by the schema validator of the model first, rows that would fail
+    transformation are not scored.
+    Input columns are echoed as read with '?' blanked, so the output does not depend on
+    how the file was split into chunks. typed: echo the numerical features as float instead.
+    returns valid rows with prediction and cat_pred columns, rejected rows with REJECT_REASON_COLUMN
+    """
+    df = df.replace({"?":""})
+    features = df.replace({"":np.nan})
+    with PHASE_SECONDS.time(phase="validate"):
+        reasons = loaded_model.thyroid_model.validate(features)
+    is_valid = reasons.isna().to_numpy()
+    rejected = df[~is_valid].assign(**{REJECT_REASON_COLUMN:reasons[~is_valid]})
+    df,features = df[is_valid].copy(),features[is_valid]
+    if len(df)==0:
+        return df.assign(prediction=pd.Series(dtype=float),cat_pred=pd.Series(dtype=object)),rejected
+    numeric_columns = loaded_model.thyroid_model.numeric_columns
+    features[numeric_columns] = features[numeric_columns].astype('float')
+    if typed:
+        df[numeric_columns] = features[numeric_columns]
+    prediction,cat_prediction = loaded_model.predict(features)
+    df["prediction"]=prediction
+    df["cat_pred"]=cat_prediction
+    return df,rejected
+
+
+def start_batch_prediction(input_file_path,chunk_size:Optional[int]=None,output_format:Optional[str]=None,
+                        compression:Optional[str]=None,id_column:Optional[str]=None,metrics_file_path:Optional[str]=None):
+    """
+    Description: Scores an input csv file with the latest saved model
+    =========================================================
+    Params:
+    input_file_path: csv file to score
+    chunk_size: rows read, scored and appended to the output at a time, so memory use does not
+    depend on file size. None uses PREDICTION_CHUNK_SIZE env variable or reads the whole file.
+    The output is byte identical for every chunk size.
+    output_format: csv, parquet or feather, None uses PREDICTION_OUTPUT_FORMAT env variable (csv)
+    compression: codec of the output format (e.g. gzip for csv, snappy/zstd for parquet, lz4/zstd
+    for feather), None uses PREDICTION_COMPRESSION env variable or the format default
+    id_column: write only this column and the prediction columns instead of every input column,
+    a running row number is used when the input has no such column
+    metrics_file_path: prometheus text file the phase latencies, scored and rejected rows of this
+    process are written to, None uses PREDICTION_METRICS_FILE env variable or skips it
+    =========================================================
+    return path of the prediction file
+    Rows failing the schema validator of the model are written with their reason to a
+    <prediction file>_rejected.csv file instead of failing the batch.
+    """
+    try:
+        return score_file(input_file_path=input_file_path,chunk_size=chunk_size,output_format=output_format,
+                          compression=compression,id_column=id_column,metrics_file_path=metrics_file_path)["prediction_file_path"]
+    except Exception as e:
+        raise thyroidException(e, sys)
+
+
+def score_file(input_file_path,chunk_size:Optional[int]=None,output_format:Optional[str]=None,
+            compression:Optional[str]=None,id_column:Optional[str]=None,metrics_file_path:Optional[str]=None)->dict:
+    """
+    start_batch_prediction returning prediction file, reject file (None when no row was rejected)
+    and the number of scored and rejected rows
+    """
     try:
         os.makedirs(PREDICTION_DIR,exist_ok=True)
+        if chunk_size is None and PREDICTION_CHUNK_SIZE:
+            chunk_size = int(PREDICTION_CHUNK_SIZE)
+        output_format = output_format or PREDICTION_OUTPUT_FORMAT
+        compression = compression or PREDICTION_COMPRESSION
+        metrics_file_path = metrics_file_path or PREDICTION_METRICS_FILE
         logging.info(f"Creating model resolver object")
-        model_resolver = ModelResolver(model_registry="saved_models")
-        logging.info(f"Reading file :{input_file_path}")
-        df = pd.read_csv(input_file_path)
-        df.replace({"?":np.NAN},inplace=True)
-        #validation
-        
-        logging.info(f"Loading transformer to transform dataset")
-        transformer = load_object(file_path=model_resolver.get_latest_transformer_path())
-        input_encoder = load_object(file_path=model_resolver.get_latest_input_encoder_path())
-
-        input_feature_name_num = list(transformer.feature_names_in_)
-        input_feature_name_cat = list(input_encoder.feature_names_in_)
-        input_arr_num =transformer.transform(df[input_feature_name_num])
-        input_arr_cat =input_encoder.transform(df[input_feature_name_cat])
-        logging.info(input_arr_cat)
-        logging.info(input_arr_num)
-
-        input_arr = np.c_[input_arr_cat,input_arr_num]
-        logging.info(df[input_feature_name_cat + input_feature_name_num].columns)
-
-
-        logging.info(f"Loading model to make prediction")
-        model = load_object(file_path=model_resolver.get_latest_model_path())
-        prediction = model.predict(input_arr)
-        
-        logging.info(f"Target encoder to convert predicted column into categorical")
-        target_encoder = load_object(file_path=model_resolver.get_latest_target_encoder_path())
-
-        cat_prediction = target_encoder.inverse_transform(prediction.astype('int'))
-
-        df["prediction"]=prediction
-        df["cat_pred"]=cat_prediction
-
-
-        prediction_file_name = os.path.basename(input_file_path).replace(".csv",f"{datetime.now().strftime('%m%d%Y__%H%M%S')}.csv")
-        prediction_file_path = os.path.join(PREDICTION_DIR,prediction_file_name)
-        df.to_csv(prediction_file_path,index=False,header=True)
-        return prediction_file_path
+        model_resolver = ModelResolver(model_registry=MODEL_REGISTRY)
+
+        logging.info(f"Loading transformer, encoders and model from model cache")
+        loaded_model = model_cache.load_latest(model_resolver=model_resolver)
+
+        prediction_file_name = os.path.splitext(os.path.basename(input_file_path))[0]+datetime.now().strftime('%m%d%Y__%H%M%S')
+        writer = get_prediction_writer(file_path=os.path.join(PREDICTION_DIR,prediction_file_name),
+                                       output_format=output_format,compression=compression)
+        #created on the first rejected row
+        reject_writer = CsvPredictionWriter(file_path=os.path.join(PREDICTION_DIR,f"{prediction_file_name}_rejected.csv"))
+
+        logging.info(f"Reading file :{input_file_path} in chunks of {chunk_size} rows")
+        #read everything as text, dtypes inferred per chunk would change how values are written back,
+        #numerical features are cast to float for the columnar formats
+        reader = pd.read_csv(input_file_path,dtype=str,keep_default_na=False,chunksize=chunk_size)
+        chunks = iter([reader] if chunk_size is None else reader)
+
+        logging.info(f"Transforming dataset and making prediction using model version: {loaded_model.version_dir}")
+        try:
+            while True:
+                with PHASE_SECONDS.time(phase="read"):
+                    df = next(chunks,None)
+                if df is None:
+                    break
+                if id_column is not None and id_column not in df.columns:
+                    row_start = writer.n_rows+reject_writer.n_rows
+                    df[id_column] = np.arange(row_start,row_start+len(df))
+                df,rejected = predict_chunk(df=df,loaded_model=loaded_model,typed=writer.typed)
+                if id_column is not None:
+                    df = df[[id_column]+PREDICTION_COLUMNS]
+                with PHASE_SECONDS.time(phase="write"):
+                    writer.write(df)
+                    if len(rejected)>0:
+                        reject_writer.write(rejected)
+                ROWS_SCORED.inc(len(df),source="batch")
+                ROWS_REJECTED.inc(len(rejected),source="batch")
+        finally:
+            writer.close()
+            if metrics_file_path:
+                registry.write(metrics_file_path)
+        if reject_writer.n_rows>0:
+            logging.info(f"Rows rejected by schema validation: {reject_writer.n_rows}, reject file: {reject_writer.file_path}")
+        logging.info(f"Rows scored: {writer.n_rows}, prediction file: {writer.file_path}")
+        return {"prediction_file_path":writer.file_path,"rows_scored":writer.n_rows,"rows_rejected":reject_writer.n_rows,
+                "reject_file_path":reject_writer.file_path if reject_writer.n_rows>0 else None}
+    except Exception as e:
+        raise thyroidException(e, sys)
+
+
+def _init_prediction_worker():
+    #load the model artifacts once per worker process, every file scored by it hits the model cache
+    model_cache.load_latest(model_resolver=ModelResolver(model_registry=MODEL_REGISTRY))
+
+
+def _predict_file(input_file_path:str,prediction_kwargs:dict)->dict:
+    start = time.perf_counter()
+    metrics_file_path = prediction_kwargs.get("metrics_file_path") or PREDICTION_METRICS_FILE
+    if metrics_file_path:
+        #one metrics file per worker process, each holds the totals of its own process
+        root,extension = os.path.splitext(metrics_file_path)
+        prediction_kwargs = dict(prediction_kwargs,metrics_file_path=f"{root}_{os.getpid()}{extension}")
+    try:
+        result = score_file(input_file_path=input_file_path,**prediction_kwargs)
+    except Exception as e:
+        logging.info(f"Batch prediction failed for file: {input_file_path}: {e}")
+        return _failed_file(input_file_path=input_file_path,error=str(e),seconds=time.perf_counter()-start)
+    #success: every row scored, partial: some rows rejected, failed: no row scored
+    status,error = "success",None
+    if result["rows_scored"]==0:
+        status,error = "failed",f"No row scored, rows rejected: {result['rows_rejected']}"
+    elif result["rows_rejected"]>0:
+        status = "partial"
+    return {"input_file_path":input_file_path,"status":status,**result,"error":error,
+            "seconds":round(time.perf_counter()-start,3)}
+
+
+def _failed_file(input_file_path:str,error:str,seconds:float=0.0)->dict:
+    return {"input_file_path":input_file_path,"status":"failed","prediction_file_path":None,"rows_scored":0,
+            "rows_rejected":0,"reject_file_path":None,"error":error,"seconds":round(seconds,3)}
+
+
+def start_parallel_batch_prediction(input_file_paths:List[str],n_workers:Optional[int]=None,**prediction_kwargs)->str:
+    """
+    Description: Scores many input files across a process pool
+    =========================================================
+    Params:
+    input_file_paths: csv files to score
+    n_workers: worker processes, defaults to BATCH_PREDICTION_WORKERS env variable or all cores available
+    to the process, negative values leave cores free (utils.resolve_n_jobs)
+    prediction_kwargs: passed to start_batch_prediction (chunk_size, output_format, ...)
+    =========================================================
+    return path of the yaml manifest with per file status (success, partial when rows were rejected,
+    failed when no row was scored), output and reject file, scored and rejected rows, error and time
+    A failing file is recorded in the manifest and does not stop the other files. When the pool
+    breaks (e.g. the model cannot be loaded by the workers) the manifest is still written with the
+    files that were not scored marked failed.
+    """
+    try:
+        os.makedirs(PREDICTION_DIR,exist_ok=True)
+        if n_workers is None and BATCH_PREDICTION_WORKERS:
+            n_workers = int(BATCH_PREDICTION_WORKERS)
+        #same core count and limits as the training side
+        n_workers = min(utils.resolve_n_jobs(n_workers),max(1,len(input_file_paths)))
+        logging.info(f"Scoring {len(input_file_paths)} files with {n_workers} worker processes")
+
+        results = [None]*len(input_file_paths)
+        pool_error = None
+        try:
+            with ProcessPoolExecutor(max_workers=n_workers,initializer=_init_prediction_worker) as executor:
+                futures = [executor.submit(_predict_file,input_file_path,prediction_kwargs)
+                           for input_file_path in input_file_paths]
+                for index,future in enumerate(futures):
+                    results[index] = future.result()
+        except BrokenProcessPool as e:
+            #raised by submit or result once a worker died, files without a result are marked failed
+            logging.info(f"Batch prediction worker pool broken: {e}")
+            pool_error = f"Worker pool broken: {e}"
+        results = [result if result is not None else _failed_file(input_file_path=input_file_path,error=pool_error)
+                   for input_file_path,result in zip(input_file_paths,results)]
+
+        failed = [result["input_file_path"] for result in results if result["status"]=="failed"]
+        partial = [result["input_file_path"] for result in results if result["status"]=="partial"]
+        manifest_file_path = os.path.join(PREDICTION_DIR,f"manifest_{datetime.now().strftime('%m%d%Y__%H%M%S')}.yaml")
+        utils.write_yaml_file(file_path=manifest_file_path,data={"n_workers":n_workers,"n_files":len(results),
+                                                                "n_failed":len(failed),"n_partial":len(partial),
+                                                                "rows_scored":sum(result["rows_scored"] for result in results),
+                                                                "rows_rejected":sum(result["rows_rejected"] for result in results),
+                                                                "files":results})
+        logging.info(f"Batch prediction manifest: {manifest_file_path}, failed files: {failed}, partial files: {partial}")
+        return manifest_file_path
     except Exception as e:
-        raise thyroidException(e, sys)
\ No newline at end of file
+        raise thyroidException(e, sys)
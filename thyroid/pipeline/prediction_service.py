@@ -0,0 +1,250 @@
+from thyroid.exception import InvalidInputError, thyroidException
+from thyroid.logger import logging
+from thyroid.predictor import ModelResolver, LoadedModel, model_cache
+from thyroid.metrics import PHASE_SECONDS, PROMETHEUS_CONTENT_TYPE, ROWS_REJECTED, ROWS_SCORED, registry
+from contextlib import asynccontextmanager
+from typing import Annotated, Any, Callable, Dict, List, Optional, Union
+import pandas as pd
+import numpy as np
+import asyncio
+import os,sys
+
+MODEL_REGISTRY="saved_models"
+#seconds between checks of the model registry for a new saved_models/<n> version
+MODEL_RELOAD_INTERVAL=float(os.getenv("MODEL_RELOAD_INTERVAL",30))
+#records scored together by one model call and seconds a request may wait for others to join it
+MAX_BATCH_SIZE=int(os.getenv("MAX_BATCH_SIZE",64))
+MAX_BATCH_WAIT=float(os.getenv("MAX_BATCH_WAIT",0.005))
+BATCH_SIZE_BUCKETS=[1,2,4,8,16,32,64,128,256,512,1024]
+
+
+class PredictionService:
+    """
+    Holds the latest saved model in memory and scores records with it.
+    refresh() loads a new version next to the current one and swaps the reference in a
+    single assignment, so requests already running finish on the version they started with.
+    """
+
+    def __init__(self,model_registry:str=MODEL_REGISTRY):
+        try:
+            self.model_resolver = ModelResolver(model_registry=model_registry)
+            self.loaded_model:Optional[LoadedModel] = None
+        except Exception as e:
+            raise thyroidException(e, sys)
+
+    def refresh(self)->bool:
+        """
+        Load the latest model version, returns True when the served version changed.
+        """
+        try:
+            loaded_model = model_cache.load_latest(model_resolver=self.model_resolver)
+            if self.loaded_model is not None and loaded_model.version_dir==self.loaded_model.version_dir:
+                return False
+            logging.info(f"Serving model version: {loaded_model.version_dir}")
+            self.loaded_model = loaded_model
+            return True
+        except Exception as e:
+            raise thyroidException(e, sys)
+
+    def predict_records(self,records:List[Dict[str,Any]])->List[Dict[str,Any]]:
+        result = self.predict_requests([records])[0]
+        if isinstance(result,Exception):
+            raise result
+        return result
+
+    def predict_requests(self,requests:List[List[Dict[str,Any]]])->List[Union[List[Dict[str,Any]],InvalidInputError]]:
+        """
+        Scores the records of many requests with one validation and one model call.
+        returns per request its predictions, or an InvalidInputError naming its rejected records,
+        a request with an invalid record does not fail the others
+        """
+        try:
+            loaded_model = self.loaded_model
+            if loaded_model is None:
+                raise Exception(f"Model is not available")
+            thyroid_model = loaded_model.thyroid_model
+            records = [record for request_records in requests for record in request_records]
+            df = pd.DataFrame.from_records(records)
+            df.replace({"?":np.nan},inplace=True)
+            #checked before any model work, a bad record fails its request with the reason
+            with PHASE_SECONDS.time(phase="validate"):
+                reasons = thyroid_model.validate(df)
+                #a column other requests of the batch have is NaN here instead of missing
+                columns = thyroid_model.numeric_columns+thyroid_model.categorical_columns
+                missing_columns = pd.Series([[column for column in columns if column not in record] for record in records],
+                                            index=df.index)
+                has_missing = missing_columns.str.len().to_numpy()>0
+                reasons[has_missing] = "missing columns: "+missing_columns[has_missing].astype(str)
+            request_ids = np.repeat(np.arange(len(requests)),[len(request_records) for request_records in requests])
+            invalid_ids = set(request_ids[reasons.notna().to_numpy()])
+            is_valid = ~np.isin(request_ids,list(invalid_ids))
+
+            predictions = []
+            if is_valid.any():
+                prediction,cat_prediction = loaded_model.predict(df[is_valid])
+                ROWS_SCORED.inc(int(is_valid.sum()),source="service")
+                predictions = [{"prediction":float(pred),"cat_pred":str(cat_pred)}
+                               for pred,cat_pred in zip(prediction,cat_prediction)]
+
+            results,start,offset = [],0,0
+            for request_id,request_records in enumerate(requests):
+                n_records = len(request_records)
+                if request_id in invalid_ids:
+                    #reasons keyed by the position of the record in its own request
+                    request_reasons = reasons.iloc[offset:offset+n_records].reset_index(drop=True)
+                    results.append(InvalidInputError(f"Invalid records: {dict(request_reasons.dropna())}"))
+                else:
+                    results.append(predictions[start:start+n_records])
+                    start+=n_records
+                offset+=n_records
+            return results
+        except Exception as e:
+            raise thyroidException(e, sys)
+
+
+class MicroBatcher:
+    """
+    Coalesces concurrent prediction requests into one vectorized call.
+    Requests are queued; the run() loop takes the first waiting request, keeps waiting for
+    more until max_batch_size records or max_wait seconds, scores the records of all requests
+    with one call of predict_func in a worker thread and hands every caller its own result.
+    predict_func returns per request its result or the exception failing only that request.
+    """
+
+    def __init__(self,predict_func:Callable[[List[List[Dict[str,Any]]]],List[Union[List[Dict[str,Any]],Exception]]],
+                max_batch_size:int=MAX_BATCH_SIZE,max_wait:float=MAX_BATCH_WAIT):
+        self.predict_func = predict_func
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.queue = asyncio.Queue()
+        #number of batches by size, keyed by the bucket upper bound (records)
+        self.batch_size_histogram = dict.fromkeys(BATCH_SIZE_BUCKETS+[float("inf")],0)
+
+    @property
+    def queue_depth(self)->int:
+        return self.queue.qsize()
+
+    async def submit(self,records:List[Dict[str,Any]])->List[Dict[str,Any]]:
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((records,future))
+        return await future
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        #request that did not fit into the previous batch, it starts the next one
+        pending = None
+        while True:
+            batch = [pending if pending is not None else await self.queue.get()]
+            pending = None
+            batch_size = len(batch[0][0])
+            deadline = loop.time()+self.max_wait
+            while batch_size<self.max_batch_size:
+                remaining = deadline-loop.time()
+                if remaining<=0:
+                    break
+                try:
+                    request = await asyncio.wait_for(self.queue.get(),remaining)
+                except asyncio.TimeoutError:
+                    break
+                #batches are capped by records, a request is never split and a larger one is scored alone
+                if batch_size+len(request[0])>self.max_batch_size:
+                    pending = request
+                    break
+                batch.append(request)
+                batch_size+=len(request[0])
+            await self.process(batch)
+
+    async def process(self,batch):
+        requests = [request_records for request_records,_ in batch]
+        n_records = sum(len(request_records) for request_records in requests)
+        self.batch_size_histogram[next(bucket for bucket in self.batch_size_histogram if n_records<=bucket)]+=1
+        try:
+            results = await asyncio.to_thread(self.predict_func,requests)
+        except Exception:
+            #a failure validation did not foresee, score requests one by one so it fails only its own
+            results = []
+            for request_records in requests:
+                try:
+                    results.extend(await asyncio.to_thread(self.predict_func,[request_records]))
+                except Exception as e:
+                    results.append(e)
+        for (_,future),result in zip(batch,results):
+            if future.done():
+                continue
+            if isinstance(result,Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+    def stats(self)->dict:
+        return {"queue_depth":self.queue_depth,
+                "batch_size_histogram":{str(bucket):count for bucket,count in self.batch_size_histogram.items()}}
+
+
+def create_app(prediction_service:Optional[PredictionService]=None):
+    from fastapi import Body, FastAPI, HTTPException, Response
+    from pydantic import Field
+
+    service = PredictionService() if prediction_service is None else prediction_service
+
+    async def reload_model_periodically():
+        while True:
+            await asyncio.sleep(MODEL_RELOAD_INTERVAL)
+            try:
+                await asyncio.to_thread(service.refresh)
+            except Exception as e:
+                #keep serving the current version if the new one cannot be loaded
+                logging.info(f"Model reload failed: {e}")
+
+    @asynccontextmanager
+    async def lifespan(app):
+        service.refresh()
+        reload_task = asyncio.create_task(reload_model_periodically())
+        app.state.batcher = MicroBatcher(predict_func=service.predict_requests)
+        batcher_task = asyncio.create_task(app.state.batcher.run())
+        try:
+            yield
+        finally:
+            reload_task.cancel()
+            batcher_task.cancel()
+
+    app = FastAPI(title="thyroid prediction",lifespan=lifespan)
+    #a request scores one record or a non empty list of records
+    Record = Annotated[Dict[str,Any],Field(min_length=1)]
+    Records = Annotated[List[Record],Field(min_length=1)]
+
+    @app.get("/health")
+    async def health():
+        return {"model_version":service.loaded_model.version_dir if service.loaded_model else None}
+
+    @app.post("/reload")
+    async def reload():
+        changed = await asyncio.to_thread(service.refresh)
+        return {"model_version":service.loaded_model.version_dir,"changed":changed}
+
+    @app.post("/predict")
+    async def predict(payload:Union[Records,Record]=Body(...)):
+        records = payload if isinstance(payload,list) else [payload]
+        try:
+            result = await app.state.batcher.submit(records)
+        except InvalidInputError as e:
+            #counted here, the other requests of its batch are scored
+            ROWS_REJECTED.inc(len(records),source="service")
+            raise HTTPException(status_code=422,detail=str(e))
+        except Exception as e:
+            #script paths and line numbers of the error stay in the server log
+            logging.error(f"Prediction failed: {e}",exc_info=True)
+            raise HTTPException(status_code=500,detail="Prediction failed")
+        return result if isinstance(payload,list) else result[0]
+
+    @app.get("/stats")
+    async def stats():
+        return app.state.batcher.stats()
+
+    @app.get("/metrics")
+    async def metrics():
+        #phase latency histograms, scored and rejected rows in the prometheus text format
+        return Response(content=registry.render(),media_type=PROMETHEUS_CONTENT_TYPE)
+
+    app.state.prediction_service = service
+    return app
@@ -1,6 +1,6 @@
 from thyroid.logger import logging
 from thyroid.exception import thyroidException
-from thyroid.utils import get_collection_as_dataframe
+from thyroid.utils import get_collection_as_dataframe, get_collection_fingerprint, write_yaml_file
 import os, sys
 from thyroid.entity import config_entity
 from thyroid.components.data_ingestion import DataIngestion
@@ -10,6 +10,10 @@ from thyroid.components.model_trainer import ModelTrainer
 from thyroid.components.model_evaluation import ModelEvaluation
 from thyroid.components.model_pusher import ModelPusher
 from thyroid.entity import artifact_entity
+from thyroid.predictor import ModelResolver
+from thyroid.stage_cache import StageCache, code_version, config_values, stage_key
+from thyroid.instrumentation import StageInstrumentation, count_rows
+from typing import List, Optional
 
 
 def jls_extract_def(model_eval):
@@ -17,52 +21,103 @@ def jls_extract_def(model_eval):
     return model_eval_artifact
 
 
-def start_training_pipeline():
+def start_training_pipeline(force:bool=False,profile_stages:Optional[List[str]]=None,profiler:Optional[str]=None)->dict:
+    """
+    Runs every stage of the training pipeline. Ingestion, validation, transformation and training
+    are skipped when the stage cache has an artifact for the same inputs (collection content,
+    config values, upstream stages and code version), evaluation and pushing are skipped when the
+    trained model was already pushed and the model registry has not changed since.
+    Wall time, cpu time, peak rss and rows of every stage are written to the run profile.
+    force: run every stage even if its inputs did not change
+    profile_stages: stages run under a flame profiler, None reads TRAINING_PROFILE_STAGES
+    profiler: "cprofile" or "py-spy", None reads TRAINING_PROFILER
+    returns report of every stage, "cached" or "ran"
+    """
+    instrumentation = None
     try:
-        training_pipeline_config = config_entity.TrainingPipelineConfig()
+        training_pipeline_config = config_entity.TrainingPipelineConfig(profile_stages=profile_stages,profiler=profiler)
+        artifact_dir = training_pipeline_config.artifact_dir
+        stage_cache = StageCache(force=force)
+        instrumentation = StageInstrumentation(profile_dir=training_pipeline_config.profile_dir,
+                        profile_stages=training_pipeline_config.profile_stages,profiler=training_pipeline_config.profiler)
+        code = code_version()
 
         #data ingestion
         Data_ingestion_config = config_entity.DataIngestionConfig(training_pipeline_config=training_pipeline_config)
         print(Data_ingestion_config.to_dict())
+        #document count and latest _id / timestamp, the collection is only read if ingestion runs
+        data_fingerprint = get_collection_fingerprint(database_name=Data_ingestion_config.database_name,
+                        collection_name=Data_ingestion_config.collection_name,
+                        watermark_field=Data_ingestion_config.watermark_field if Data_ingestion_config.incremental else None)
+        data_ingestion_key = stage_key("data_ingestion",code,data_fingerprint,config_values(Data_ingestion_config,artifact_dir))
         data_ingestion = DataIngestion(data_ingestion_config= Data_ingestion_config)
-        data_ingestion_artifact = data_ingestion.initiate_data_ingestion()
+        data_ingestion_artifact = instrumentation.measure("data_ingestion",
+                        lambda: stage_cache.run("data_ingestion",data_ingestion_key,data_ingestion.initiate_data_ingestion),
+                        rows=lambda artifact: count_rows(artifact.train_file_path,artifact.test_file_path))
         
         #data validation
         data_validation_config = config_entity.DataValidationConfig(training_pipeline_config=training_pipeline_config)
         data_validation = DataValidation(data_validation_config=data_validation_config,
                         data_ingestion_artifact=data_ingestion_artifact)
-
-        data_validation_artifact = data_validation.initiate_data_validation()
+        data_validation_key = stage_key("data_validation",code,data_ingestion_key,config_values(data_validation_config,artifact_dir))
+        data_validation_artifact = instrumentation.measure("data_validation",
+                        lambda: stage_cache.run("data_validation",data_validation_key,data_validation.initiate_data_validation),
+                        rows=lambda artifact: count_rows(data_ingestion_artifact.train_file_path,data_ingestion_artifact.test_file_path))
         
         #data transformation
         data_transformation_config = config_entity.DataTransformationConfig(training_pipeline_config=training_pipeline_config)
         data_transformation = DataTransformation(data_transformation_config=data_transformation_config, 
         data_ingestion_artifact=data_ingestion_artifact)
-        data_transformation_artifact = data_transformation.initiate_data_transformation()
+        data_transformation_key = stage_key("data_transformation",code,data_ingestion_key,config_values(data_transformation_config,artifact_dir))
+        data_transformation_artifact = instrumentation.measure("data_transformation",
+                        lambda: stage_cache.run("data_transformation",data_transformation_key,data_transformation.initiate_data_transformation),
+                        rows=lambda artifact: count_rows(artifact.transformed_train_path,artifact.transformed_test_path))
         
         #model trainer
         model_trainer_config = config_entity.ModelTrainerConfig(training_pipeline_config=training_pipeline_config)
         model_trainer = ModelTrainer(model_trainer_config=model_trainer_config, data_transformation_artifact=data_transformation_artifact)
-        model_trainer_artifact = model_trainer.initiate_model_trainer()
+        model_trainer_key = stage_key("model_trainer",code,data_transformation_key,config_values(model_trainer_config,artifact_dir))
+        model_trainer_artifact = instrumentation.measure("model_trainer",
+                        lambda: stage_cache.run("model_trainer",model_trainer_key,model_trainer.initiate_model_trainer),
+                        rows=lambda artifact: count_rows(data_transformation_artifact.transformed_train_path))
 
-        
-        #model evaluation
-        model_eval_config = config_entity.ModelEvaluationConfig(training_pipeline_config=training_pipeline_config)
-        model_eval  = ModelEvaluation(model_eval_config=model_eval_config,
-        data_ingestion_artifact=data_ingestion_artifact,
-        data_transformation_artifact=data_transformation_artifact,
-        model_trainer_artifact=model_trainer_artifact)
-        logging.info(model_eval)
-        model_eval_artifact = model_eval.initiate_model_evaluation()
-        
-        #model pusher
-        model_pusher_config = config_entity.ModelPusherConfig(training_pipeline_config)
-        
-        model_pusher = ModelPusher(model_pusher_config=model_pusher_config, 
-                data_transformation_artifact=data_transformation_artifact,
-                model_trainer_artifact=model_trainer_artifact)
+        #evaluation and pushing are keyed on the registry version too, a model pushed since must be beaten again
+        model_resolver = ModelResolver()
+        if stage_cache.get("model_pusher",stage_key("model_pusher",model_trainer_key,model_resolver.get_latest_dir_path())) is not None:
+            stage_cache.report["model_evaluation"] = "cached"
+        else:
+            #model evaluation
+            model_eval_config = config_entity.ModelEvaluationConfig(training_pipeline_config=training_pipeline_config)
+            model_eval  = ModelEvaluation(model_eval_config=model_eval_config,
+            data_ingestion_artifact=data_ingestion_artifact,
+            data_transformation_artifact=data_transformation_artifact,
+            model_trainer_artifact=model_trainer_artifact)
+            logging.info(model_eval)
+            model_eval_artifact = instrumentation.measure("model_evaluation",model_eval.initiate_model_evaluation,
+                        rows=lambda artifact: count_rows(data_ingestion_artifact.test_file_path))
+            stage_cache.report["model_evaluation"] = "ran"
+            
+            #model pusher
+            model_pusher_config = config_entity.ModelPusherConfig(training_pipeline_config)
+            
+            model_pusher = ModelPusher(model_pusher_config=model_pusher_config, 
+                    data_transformation_artifact=data_transformation_artifact,
+                    model_trainer_artifact=model_trainer_artifact)
 
-        model_pusher_artifact = model_pusher.initiate_model_pusher()
-        
+            model_pusher_artifact = instrumentation.measure("model_pusher",model_pusher.initiate_model_pusher)
+            #keyed on the version just pushed, so the next run with unchanged inputs skips both stages
+            stage_cache.put("model_pusher",stage_key("model_pusher",model_trainer_key,model_resolver.get_latest_dir_path()),
+                            model_pusher_artifact)
+
+        logging.info(f"Skipped stages: {stage_cache.skipped_stages()}")
+        write_yaml_file(file_path=os.path.join(artifact_dir,"stage_report.yaml"),data=dict(stage_cache.report))
+        return dict(stage_cache.report)
     except Exception as e:
-        raise thyroidException(e, sys)
\ No newline at end of file
+        raise thyroidException(e, sys)
+    finally:
+        #written for failed runs too, the failing stage is recorded with its error
+        if instrumentation is not None:
+            for stage,metrics in instrumentation.stages.items():
+                metrics.setdefault("status",stage_cache.report.get(stage,"ran"))
+            instrumentation.write(training_pipeline_config.run_profile_file_path)
+            logging.info(f"Run profile: {training_pipeline_config.run_profile_file_path}")
@@ -1,8 +1,85 @@
 import os
 from thyroid.entity.config_entity import TRANSFORMER_OBJECT_FILE_NAME,MODEL_FILE_NAME,TARGET_ENCODER_OBJECT_FILE_NAME, INPUT_ENCODER_OBJECT_FILE_NAME
-from glob import glob
+from thyroid.entity.config_entity import THYROID_MODEL_FILE_NAME
+from thyroid.logger import logging
+from thyroid.utils import load_object
+from thyroid.schema_validator import SchemaValidator
+from thyroid.metrics import PHASE_SECONDS
+from dataclasses import dataclass
 from typing import Optional
-import os
+import pandas as pd
+import numpy as np
+import threading
+
+#largest batch scored with the compiled forest, above it the sklearn forest is faster.
+#benchmarks/bench_compiled_forest.py, 100 trees on the base dataset: compiled 17.5x faster at 1 row,
+#4x at 100, 2x at 256, but 0.7x at 1000 and 0.2x at 100k rows
+COMPILED_FOREST_MAX_ROWS = 256
+
+class ThyroidModel:
+    """
+    Fused inference object saved as a single artifact. Owns column selection, ordinal encoding of
+    categorical features, scaling of numerical features, prediction and decoding of the label,
+    so a consumer needs one load and one call instead of repeating those steps by hand.
+    """
+
+    def __init__(self,transformer,input_encoder,model,target_encoder,compiled_model=None,schema_validator=None):
+        self.transformer = transformer
+        self.input_encoder = input_encoder
+        self.model = model
+        self.target_encoder = target_encoder
+        #thyroid.compiled_forest.CompiledForest of model, same classes with less per call overhead
+        self.compiled_model = compiled_model
+        self.numeric_columns = list(transformer.feature_names_in_)
+        self.categorical_columns = list(input_encoder.feature_names_in_)
+        #thyroid.schema_validator.SchemaValidator with the numerical ranges of the training data
+        self.schema_validator = schema_validator
+
+    def get_schema_validator(self)->SchemaValidator:
+        #models saved before the schema validator existed check columns and categories only
+        if getattr(self,"schema_validator",None) is None:
+            self.schema_validator = SchemaValidator.from_artifacts(transformer=self.transformer,input_encoder=self.input_encoder)
+        return self.schema_validator
+
+    def validate(self,df:pd.DataFrame)->pd.Series:
+        """
+        returns reason every row would fail transformation or prediction, None for valid rows
+        """
+        return self.get_schema_validator().validate(df)
+
+    def transform(self,df:pd.DataFrame)->np.ndarray:
+        """
+        Encoded categorical features followed by scaled numerical features, the order the model
+        was trained on, written into one preallocated array instead of joining copies with np.c_.
+        """
+        n_cat = len(self.categorical_columns)
+        input_arr = np.empty((len(df),n_cat+len(self.numeric_columns)),dtype=np.float64)
+        with PHASE_SECONDS.time(phase="encode"):
+            input_arr[:,:n_cat] = self.input_encoder.transform(df[self.categorical_columns])
+        with PHASE_SECONDS.time(phase="scale"):
+            input_arr[:,n_cat:] = self.transformer.transform(df[self.numeric_columns])
+        return input_arr
+
+    def predict_encoded(self,df:pd.DataFrame)->np.ndarray:
+        #models saved before the compiled forest existed have no such attribute
+        compiled_model = getattr(self,"compiled_model",None)
+        model = compiled_model if compiled_model is not None and len(df)<=COMPILED_FOREST_MAX_ROWS else self.model
+        input_arr = self.transform(df)
+        with PHASE_SECONDS.time(phase="predict"):
+            return model.predict(input_arr)
+
+    def predict(self,df:pd.DataFrame):
+        """
+        returns encoded prediction and prediction decoded by target encoder
+        """
+        prediction = self.predict_encoded(df)
+        with PHASE_SECONDS.time(phase="decode"):
+            cat_prediction = self.target_encoder.inverse_transform(prediction.astype('int'))
+        return prediction,cat_prediction
+
+    def encode_target(self,target)->np.ndarray:
+        return self.target_encoder.transform(target)
+
 
 class ModelResolver:
     
@@ -10,7 +87,8 @@ class ModelResolver:
                 transformer_dir_name="transformer",
                 input_encoder_dir_name = "input_encoder",
                 target_encoder_dir_name = "target_encoder",
-                model_dir_name = "model"):
+                model_dir_name = "model",
+                thyroid_model_dir_name = "thyroid_model"):
 
         self.model_registry=model_registry
         os.makedirs(self.model_registry,exist_ok=True)
@@ -18,6 +96,7 @@ class ModelResolver:
         self.input_encoder_dir_name=input_encoder_dir_name
         self.target_encoder_dir_name=target_encoder_dir_name
         self.model_dir_name=model_dir_name
+        self.thyroid_model_dir_name=thyroid_model_dir_name
 
 
     def get_latest_dir_path(self)->Optional[str]:
@@ -31,6 +110,29 @@ class ModelResolver:
         except Exception as e:
             raise e
 
+    def get_latest_paths(self)->dict:
+        """
+        Artifact paths of the latest version, resolved with a single listing of the model registry:
+        the fused thyroid model for versions saved with it, otherwise transformer, input encoder,
+        model and target encoder of older versions.
+        """
+        try:
+            latest_dir = self.get_latest_dir_path()
+            if latest_dir is None:
+                raise Exception(f"Model is not available")
+            thyroid_model_path = os.path.join(latest_dir,self.thyroid_model_dir_name,THYROID_MODEL_FILE_NAME)
+            if os.path.exists(thyroid_model_path):
+                return {"version_dir":latest_dir,"thyroid_model":thyroid_model_path}
+            return {
+                "version_dir":latest_dir,
+                "transformer":os.path.join(latest_dir,self.transformer_dir_name,TRANSFORMER_OBJECT_FILE_NAME),
+                "input_encoder":os.path.join(latest_dir,self.input_encoder_dir_name,INPUT_ENCODER_OBJECT_FILE_NAME),
+                "model":os.path.join(latest_dir,self.model_dir_name,MODEL_FILE_NAME),
+                "target_encoder":os.path.join(latest_dir,self.target_encoder_dir_name,TARGET_ENCODER_OBJECT_FILE_NAME),
+            }
+        except Exception as e:
+            raise e
+
     def get_latest_model_path(self):
         try:
             latest_dir = self.get_latest_dir_path()
@@ -78,6 +180,22 @@ class ModelResolver:
         except Exception as e:
             raise e
 
+    def get_latest_thyroid_model_path(self):
+        try:
+            latest_dir = self.get_latest_dir_path()
+            if latest_dir is None:
+                raise Exception(f"Model is not available")
+            return os.path.join(latest_dir,self.thyroid_model_dir_name,THYROID_MODEL_FILE_NAME)
+        except Exception as e:
+            raise e
+
+    def get_latest_save_thyroid_model_path(self):
+        try:
+            latest_dir = self.get_latest_save_dir_path()
+            return os.path.join(latest_dir,self.thyroid_model_dir_name,THYROID_MODEL_FILE_NAME)
+        except Exception as e:
+            raise e
+
     def get_latest_save_model_path(self):
         try:
             latest_dir = self.get_latest_save_dir_path()
@@ -104,4 +222,92 @@ class ModelResolver:
             latest_dir = self.get_latest_save_dir_path()
             return os.path.join(latest_dir,self.target_encoder_dir_name,TARGET_ENCODER_OBJECT_FILE_NAME)
         except Exception as e:
-            raise e
\ No newline at end of file
+            raise e
+
+
+@dataclass
+class LoadedModel:
+    version_dir:str
+    thyroid_model:ThyroidModel
+
+    def predict(self,df:pd.DataFrame):
+        """
+        returns encoded prediction and prediction decoded by target encoder
+        """
+        return self.thyroid_model.predict(df)
+
+
+class ModelCache:
+    """
+    In-process cache of unpickled model artifacts shared by batch prediction, model evaluation
+    and any long running server. Objects are keyed by file path (which includes the registry
+    version directory) and reloaded when the file mtime changes. When a new version directory
+    appears in a registry the objects of the previous version are dropped.
+    """
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.objects = dict()
+        self.latest_dirs = dict()
+
+    def load_object(self,file_path:str)->object:
+        with self.lock:
+            file_path = os.path.abspath(file_path)
+            mtime = os.path.getmtime(file_path)
+            cached = self.objects.get(file_path)
+            if cached is not None and cached[0]==mtime:
+                return cached[1]
+            logging.info(f"Model cache miss, loading: {file_path}")
+            obj = load_object(file_path=file_path)
+            self.objects[file_path] = (mtime,obj)
+            return obj
+
+    def load_latest(self,model_resolver:ModelResolver)->LoadedModel:
+        with self.lock:
+            with PHASE_SECONDS.time(phase="resolve"):
+                paths = model_resolver.get_latest_paths()
+            registry = os.path.abspath(model_resolver.model_registry)
+            previous_dir = self.latest_dirs.get(registry)
+            if previous_dir is not None and previous_dir!=paths["version_dir"]:
+                logging.info(f"New model version: {paths['version_dir']}, invalidating {previous_dir}")
+                self.invalidate(version_dir=previous_dir)
+            self.latest_dirs[registry] = paths["version_dir"]
+            with PHASE_SECONDS.time(phase="load"):
+                if "thyroid_model" in paths:
+                    thyroid_model = self.load_object(paths["thyroid_model"])
+                else:
+                    thyroid_model = self.load_legacy_model(paths=paths)
+            return LoadedModel(version_dir=paths["version_dir"],thyroid_model=thyroid_model)
+
+    def load_legacy_model(self,paths:dict)->ThyroidModel:
+        """
+        Fuse the four artifacts of a version saved before the thyroid model existed,
+        cached under the version directory like any other object.
+        """
+        with self.lock:
+            artifact_paths = [os.path.abspath(paths[name]) for name in ["transformer","input_encoder","model","target_encoder"]]
+            key = os.path.join(os.path.abspath(paths["version_dir"]),THYROID_MODEL_FILE_NAME)
+            mtime = tuple(os.path.getmtime(path) for path in artifact_paths)
+            cached = self.objects.get(key)
+            if cached is not None and cached[0]==mtime:
+                return cached[1]
+            thyroid_model = ThyroidModel(*[self.load_object(path) for path in artifact_paths])
+            self.objects[key] = (mtime,thyroid_model)
+            return thyroid_model
+
+    def invalidate(self,version_dir:Optional[str]=None)->None:
+        """
+        Drop cached objects of one version directory, or everything when version_dir is None.
+        """
+        with self.lock:
+            if version_dir is None:
+                self.objects.clear()
+                self.latest_dirs.clear()
+                return
+            prefix = os.path.join(os.path.abspath(version_dir),"")
+            for file_path in [path for path in self.objects if path.startswith(prefix)]:
+                del self.objects[file_path]
+
+
+#process wide cache shared by every consumer of saved models
+model_cache = ModelCache()
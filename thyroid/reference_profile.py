@@ -0,0 +1,110 @@
+from thyroid.exception import thyroidException
+from thyroid.logger import logging
+from thyroid.config import TARGET_COLUMN, numeric_features
+from thyroid.drift import CategoricalSummary, DriftEngine, NumericSummary
+from thyroid.utils import get_file_hash, missing_data_handler, write_yaml_file
+from typing import Dict, List
+import pandas as pd
+import numpy as np
+import os,sys
+
+#bumped when the profile layout changes, profiles of another version are rebuilt
+PROFILE_VERSION = 1
+PROFILE_QUANTILES = [0.01,0.05,0.25,0.5,0.75,0.95,0.99]
+
+
+class ReferenceProfile:
+    """
+    Everything validation needs from the base dataset, built once per base file content:
+    column set and dtypes, null fractions after missing data handling, quantiles and the exact
+    distribution (distinct values, cumulative fractions) of numerical columns and category
+    proportions of categorical columns. Saved as yaml so it can be inspected on its own.
+    """
+
+    def __init__(self,base_file_hash:str,columns:List[str],dtypes:Dict[str,str],null_fractions:Dict[str,float],
+                quantiles:Dict[str,Dict[float,float]],numeric_summaries:Dict[str,NumericSummary],
+                categorical_summaries:Dict[str,CategoricalSummary]):
+        self.base_file_hash = base_file_hash
+        self.columns = columns
+        self.dtypes = dtypes
+        self.null_fractions = null_fractions
+        self.quantiles = quantiles
+        self.numeric_summaries = numeric_summaries
+        self.categorical_summaries = categorical_summaries
+
+    @classmethod
+    def from_file(cls,base_file_path:str)->"ReferenceProfile":
+        try:
+            logging.info(f"Building reference profile of: {base_file_path}")
+            base_df = missing_data_handler(df=pd.read_csv(base_file_path))
+            numeric_columns = [column for column in numeric_features if column in base_df.columns]
+            categorical_columns = [column for column in base_df.columns if column not in numeric_features and column!=TARGET_COLUMN]
+            return cls(base_file_hash=get_file_hash(base_file_path),
+                       columns=list(base_df.columns),
+                       dtypes={column:str(dtype) for column,dtype in base_df.dtypes.items()},
+                       null_fractions={column:float(fraction) for column,fraction in (base_df.isna().sum()/len(base_df)).items()},
+                       quantiles={column:{quantile:float(value) for quantile,value in base_df[column].quantile(PROFILE_QUANTILES).items()}
+                                  for column in numeric_columns},
+                       numeric_summaries={column:NumericSummary.from_series(base_df[column]) for column in numeric_columns},
+                       categorical_summaries={column:CategoricalSummary.from_series(base_df[column]) for column in categorical_columns})
+        except Exception as e:
+            raise thyroidException(e, sys)
+
+    def drift_engine(self,columns:List[str],**kwargs)->DriftEngine:
+        """
+        Drift engine over the profiled columns in columns.
+        """
+        return DriftEngine(numeric_summaries={column:summary for column,summary in self.numeric_summaries.items() if column in columns},
+                           categorical_summaries={column:summary for column,summary in self.categorical_summaries.items() if column in columns},
+                           **kwargs)
+
+    def to_dict(self)->dict:
+        return {"version":PROFILE_VERSION,"base_file_hash":self.base_file_hash,"columns":self.columns,
+                "dtypes":self.dtypes,"null_fractions":self.null_fractions,"quantiles":self.quantiles,
+                "numeric_distributions":{column:{"n":summary.n,"values":summary.values.tolist(),"cdf":summary.cdf.tolist()}
+                                         for column,summary in self.numeric_summaries.items()},
+                "category_frequencies":{column:{"n":summary.n,"frequencies":{str(category):float(frequency)
+                                        for category,frequency in summary.frequencies.items()}}
+                                        for column,summary in self.categorical_summaries.items()}}
+
+    @classmethod
+    def from_dict(cls,profile:dict)->"ReferenceProfile":
+        return cls(base_file_hash=profile["base_file_hash"],columns=profile["columns"],dtypes=profile["dtypes"],
+                   null_fractions=profile["null_fractions"],quantiles=profile["quantiles"],
+                   numeric_summaries={column:NumericSummary(values=np.asarray(summary["values"],dtype=np.float64),
+                                                            cdf=np.asarray(summary["cdf"],dtype=np.float64),n=summary["n"])
+                                      for column,summary in profile["numeric_distributions"].items()},
+                   categorical_summaries={column:CategoricalSummary(frequencies=summary["frequencies"],n=summary["n"])
+                                          for column,summary in profile["category_frequencies"].items()})
+
+
+def get_reference_profile_path(base_file_path:str,profile_dir:str)->str:
+    return os.path.join(profile_dir,f"{get_file_hash(base_file_path)}.yaml")
+
+
+def load_reference_profile(base_file_path:str,profile_dir:str)->ReferenceProfile:
+    """
+    Description: Reference profile of a base file, built and saved on first use
+    =========================================================
+    Params:
+    base_file_path: base dataset csv
+    profile_dir: directory of saved profiles, one yaml file per base file content hash
+    =========================================================
+    return ReferenceProfile
+    """
+    try:
+        profile_path = get_reference_profile_path(base_file_path=base_file_path,profile_dir=profile_dir)
+        if os.path.exists(profile_path):
+            import yaml
+            with open(profile_path) as file_obj:
+                #libyaml loader when available, the distributions make the file a few thousand lines
+                profile = yaml.load(file_obj,Loader=getattr(yaml,"CSafeLoader",yaml.SafeLoader))
+            if profile.get("version")==PROFILE_VERSION:
+                logging.info(f"Loaded reference profile: {profile_path}")
+                return ReferenceProfile.from_dict(profile)
+        reference_profile = ReferenceProfile.from_file(base_file_path)
+        write_yaml_file(file_path=profile_path,data=reference_profile.to_dict())
+        logging.info(f"Saved reference profile: {profile_path}")
+        return reference_profile
+    except Exception as e:
+        raise thyroidException(e, sys)
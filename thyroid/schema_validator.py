@@ -0,0 +1,91 @@
+from thyroid.exception import thyroidException
+from typing import Dict, List, Optional, Tuple
+import pandas as pd
+import numpy as np
+import sys
+
+#numerical values are accepted up to this fraction of the training range beyond its min and max
+RANGE_MARGIN = 0.5
+
+
+class SchemaValidator:
+    """
+    Input checks compiled from the training artifacts: the numerical columns of the transformer,
+    the categorical columns and known categories of the input encoder and the numerical ranges
+    seen in training. validate() checks a whole chunk with vectorized operations per column,
+    so malformed rows are found before any transformation or model call instead of failing
+    inside transformer.transform or OrdinalEncoder.transform.
+    Missing numerical values are accepted, they are passed to the model as NaN.
+    """
+
+    def __init__(self,numeric_columns:List[str],categorical_columns:List[str],categories:Dict[str,np.ndarray],
+                numeric_ranges:Optional[Dict[str,Tuple[float,float]]]=None):
+        self.numeric_columns = numeric_columns
+        self.categorical_columns = categorical_columns
+        self.categories = {column:pd.Index(values) for column,values in categories.items()}
+        self.numeric_ranges = numeric_ranges or dict()
+
+    @classmethod
+    def from_artifacts(cls,transformer,input_encoder,numeric_df:Optional[pd.DataFrame]=None,
+                    range_margin:float=RANGE_MARGIN)->"SchemaValidator":
+        """
+        transformer: fitted numerical transformer (feature_names_in_)
+        input_encoder: fitted OrdinalEncoder (feature_names_in_, categories_)
+        numeric_df: training numerical features the ranges are taken from, None skips range checks
+        """
+        try:
+            categorical_columns = list(input_encoder.feature_names_in_)
+            numeric_ranges = None
+            if numeric_df is not None:
+                low,high = numeric_df.min(),numeric_df.max()
+                margin = (high-low)*range_margin
+                numeric_ranges = {column:(float(low[column]-margin[column]),float(high[column]+margin[column]))
+                                  for column in numeric_df.columns}
+            return cls(numeric_columns=list(transformer.feature_names_in_),categorical_columns=categorical_columns,
+                       categories=dict(zip(categorical_columns,input_encoder.categories_)),numeric_ranges=numeric_ranges)
+        except Exception as e:
+            raise thyroidException(e, sys)
+
+    def validate(self,df:pd.DataFrame)->pd.Series:
+        """
+        returns reason a row is rejected aligned with df, None for valid rows
+        (the first failing check of the row: missing column, non numeric, out of range,
+        missing or unknown category)
+        """
+        try:
+            reasons = pd.Series(None,index=df.index,dtype=object)
+            missing_columns = [column for column in self.numeric_columns+self.categorical_columns if column not in df.columns]
+            if len(missing_columns)>0:
+                reasons[:] = f"missing columns: {missing_columns}"
+                return reasons
+
+            #one boolean array per check, the first failing check of a row is its reason
+            messages,failures = [],[]
+            for column in self.numeric_columns:
+                raw = df[column]
+                try:
+                    #fast path, a plain cast succeeds when every value is numeric or missing
+                    values = raw.astype(np.float64).to_numpy()
+                except (TypeError,ValueError):
+                    values = pd.to_numeric(raw,errors="coerce").to_numpy(dtype=np.float64)
+                    messages.append(f"{column}: not numeric")
+                    failures.append(np.isnan(values)&raw.notna().to_numpy())
+                if column in self.numeric_ranges:
+                    low,high = self.numeric_ranges[column]
+                    messages.append(f"{column}: out of range [{low}, {high}]")
+                    failures.append((values<low)|(values>high))
+
+            for column in self.categorical_columns:
+                raw = df[column]
+                is_missing = raw.isna().to_numpy()
+                messages.extend([f"{column}: missing",f"{column}: unknown category"])
+                failures.extend([is_missing,~is_missing&~raw.isin(self.categories[column]).to_numpy()])
+
+            failures = np.column_stack(failures)
+            is_rejected = failures.any(axis=1)
+            if is_rejected.any():
+                first_failure = failures[is_rejected].argmax(axis=1)
+                reasons[is_rejected] = np.asarray(messages,dtype=object)[first_failure]
+            return reasons
+        except Exception as e:
+            raise thyroidException(e, sys)
@@ -0,0 +1,114 @@
+from thyroid.exception import thyroidException
+from thyroid.logger import logging
+from thyroid.entity import artifact_entity
+from thyroid import utils
+from dataclasses import asdict
+from glob import glob
+from typing import Optional
+import hashlib
+import json
+import os,sys
+
+STAGE_CACHE_DIR = os.path.join("artifact","stage_cache")
+#config settings that do not change what a stage produces, or hold state the data fingerprint covers
+IGNORED_CONFIG_VALUES = ["n_jobs","incremental_store_dir","incremental_store_file_path","watermark_file_path"]
+
+
+def code_version()->str:
+    """
+    Hash of every source file of the thyroid package, any code change invalidates every stage.
+    """
+    try:
+        package_dir = os.path.dirname(os.path.abspath(__file__))
+        digest = hashlib.sha256()
+        for file_path in sorted(glob(os.path.join(package_dir,"**","*.py"),recursive=True)):
+            digest.update(os.path.relpath(file_path,package_dir).encode())
+            digest.update(utils.get_file_hash(file_path).encode())
+        return digest.hexdigest()
+    except Exception as e:
+        raise thyroidException(e, sys)
+
+
+def config_values(config,artifact_dir:str)->dict:
+    """
+    Settings of a stage config that decide its output. Output paths inside the timestamped
+    artifact directory are left out, input files elsewhere are replaced by a hash of their content.
+    """
+    values = dict()
+    for name,value in sorted(vars(config).items()):
+        if name in IGNORED_CONFIG_VALUES:
+            continue
+        if isinstance(value,str) and os.path.abspath(value).startswith(os.path.abspath(artifact_dir)):
+            continue
+        if isinstance(value,str) and os.path.isfile(value):
+            value = utils.get_file_hash(value)
+        values[name] = value
+    return values
+
+
+def stage_key(*inputs)->str:
+    """
+    Content address of a stage: hash of the json of its inputs (upstream keys, config values,
+    data fingerprint, code version).
+    """
+    return hashlib.sha256(json.dumps(inputs,sort_keys=True,default=str).encode()).hexdigest()
+
+
+class StageCache:
+    """
+    Maps a stage key to the artifact the stage produced for it, one yaml file per stage and key.
+    A cached artifact is reused only while every file it points to still exists. With force=True
+    nothing is read from the cache, but artifacts of the run are still recorded.
+    """
+
+    def __init__(self,cache_dir:str=STAGE_CACHE_DIR,force:bool=False):
+        self.cache_dir = cache_dir
+        self.force = force
+        #stage name: "cached" or "ran"
+        self.report = dict()
+
+    def get_entry_path(self,stage:str,key:str)->str:
+        return os.path.join(self.cache_dir,stage,f"{key}.yaml")
+
+    def get(self,stage:str,key:str)->Optional[object]:
+        try:
+            import yaml
+            entry_path = self.get_entry_path(stage,key)
+            if self.force or not os.path.exists(entry_path):
+                return None
+            with open(entry_path) as file_obj:
+                entry = yaml.safe_load(file_obj)
+            artifact = getattr(artifact_entity,entry["artifact"])(**entry["fields"])
+            missing = [path for name,path in entry["fields"].items()
+                       if name.endswith(("_path","_dir")) and path is not None and not os.path.exists(path)]
+            if len(missing)>0:
+                logging.info(f"Cached {stage} artifact is incomplete, missing: {missing}")
+                return None
+            logging.info(f"Reusing cached {stage} artifact: {artifact}")
+            self.report[stage] = "cached"
+            return artifact
+        except Exception as e:
+            raise thyroidException(e, sys)
+
+    def put(self,stage:str,key:str,artifact:object)->None:
+        try:
+            self.report[stage] = "ran"
+            #numpy scalars such as f1 scores are stored as plain python values
+            fields = {name:value.item() if hasattr(value,"item") else value for name,value in asdict(artifact).items()}
+            utils.write_yaml_file(file_path=self.get_entry_path(stage,key),
+                                  data={"artifact":type(artifact).__name__,"fields":fields})
+        except Exception as e:
+            raise thyroidException(e, sys)
+
+    def run(self,stage:str,key:str,func)->object:
+        """
+        Cached artifact of the stage for key, otherwise the artifact returned by func() which is then cached.
+        """
+        artifact = self.get(stage,key)
+        if artifact is None:
+            artifact = func()
+            self.put(stage,key,artifact)
+        return artifact
+
+    def skipped_stages(self)->list:
+        return [stage for stage,status in self.report.items() if status=="cached"]
@@ -1,92 +1,251 @@
-import pandas as pd
+from __future__ import annotations
 from thyroid.logger import logging
 from thyroid.exception import thyroidException
-from thyroid.config import mongo_client
+from thyroid.config import get_mongo_client
 from collections import Counter
-from thyroid.config import numeric_features
+from itertools import islice
+from thyroid.config import numeric_features, TARGET_COLUMN, LOADER_TIMESTAMP_FIELD
 import os,sys
-import yaml
-import numpy as np
-import dill
+import hashlib
+import json
+from typing import Optional, TYPE_CHECKING
+
+#pandas, numpy, yaml, dill and joblib are imported on first use, not when the package is imported,
+#load_object alone needs none of pandas and numpy
+if TYPE_CHECKING:
+    import numpy as np
+    import pandas as pd
 
 numeric_feature= numeric_features
+#mongo document key, kept as a string column by get_collection_delta
+RECORD_KEY = "_id"
 
-def missing_data_handler(df)->pd.DataFrame:
+def prepare_raw_frame(df:pd.DataFrame)->pd.DataFrame:
     """
-    Description: This function return collection as dataframe
+    Description: This function converts raw records into typed columns
     =========================================================
     Params:
-    data: df (data frame)
+    df: raw data frame (from mongo, csv or a single chunk of either)
     =========================================================
-    return Pandas dataframe of a collection
+    return Pandas dataframe with '?' as NaN, numerical features as float and target as neg/pos
     """
     try:
-        logging.info("missing data handling initiated")
+        import numpy as np
         #replace na with Nan
-        df.replace(to_replace='?',value=np.NAN,inplace=True)
-        logging.info("Replaced ? with NaN")
+        df = df.replace(to_replace='?',value=np.nan)
 
-        # Data typecasting of numerical features.
-        for i in numeric_feature:
-            df[i]=df[i].astype('float')
-        logging.info("numeric feature converted to float")
+        # Data typecasting of numerical features in a single pass.
+        df[numeric_feature]=df[numeric_feature].astype('float')
 
-        categorical_features = list((Counter(df.columns) - Counter(numeric_feature)).elements())
-        logging.info(categorical_features)
+        # Trimming string in target column: 'neg...' stays 'neg', everything else is 'pos'.
+        if TARGET_COLUMN in df.columns:
+            df[TARGET_COLUMN]=np.where(df[TARGET_COLUMN].astype(str).str[:3]=='neg','neg','pos')
+        return df
+    except Exception as e:
+        raise thyroidException(e, sys)
 
-        # Adding mode value for missing categorical data:
-        for i in categorical_features:
-            df[i].fillna(df[i].mode(), inplace=True)
-        logging.info("categorical missing data filled")
 
-        # Exception 'sex' column creatings issue, handling seperately. (################################)
-        df['sex'].fillna(df['sex'].mode()[0], inplace=True)
+class MissingDataImputer:
+    """
+    Description: Accumulates the statistics used to clean thyroid records (categorical modes,
+    numerical means and single valued columns) over one or more chunks of prepared data, so a
+    collection can be cleaned chunk by chunk with the same result as cleaning it at once.
+    """
 
-        # Adding mean value for missing numerical data:
+    def __init__(self):
+        self.columns = None
+        self.categorical_counts = dict()
+        self.numeric_sum = None
+        self.numeric_count = None
+        self.distinct_values = dict()
+
+    def partial_fit(self,df:pd.DataFrame)->"MissingDataImputer":
+        try:
+            import pandas as pd
+            if self.columns is None:
+                self.columns = list(df.columns)
+                self.numeric_sum = pd.Series(0.0,index=numeric_feature)
+                self.numeric_count = pd.Series(0,index=numeric_feature)
+
+            categorical_features = list((Counter(self.columns) - Counter(numeric_feature)).elements())
+            for column in categorical_features:
+                counts = df[column].value_counts(dropna=True)
+                previous = self.categorical_counts.get(column)
+                self.categorical_counts[column] = counts if previous is None else previous.add(counts,fill_value=0)
+
+            self.numeric_sum = self.numeric_sum + df[numeric_feature].sum()
+            self.numeric_count = self.numeric_count + df[numeric_feature].count()
+
+            # Only need to know whether a column has fewer than two distinct values.
+            for column in self.columns:
+                seen = self.distinct_values.setdefault(column,set())
+                if len(seen)<2:
+                    seen.update(pd.unique(df[column].dropna())[:2])
+            return self
+        except Exception as e:
+            raise thyroidException(e, sys)
+
+    def get_fill_values(self)->dict:
+        import numpy as np
+        fill_values = dict()
+        for column,counts in self.categorical_counts.items():
+            if len(counts)>0:
+                # same tie breaking as DataFrame.mode: smallest value among the most frequent
+                fill_values[column] = sorted(counts[counts==counts.max()].index)[0]
+        means = self.numeric_sum/self.numeric_count.replace(0,np.nan)
+        fill_values.update(means.dropna().to_dict())
+        return fill_values
+
+    def get_drop_columns(self)->list:
+        # After imputation a column is single valued when it had less than two distinct values.
+        return [column for column in self.columns if len(self.distinct_values[column])<2]
+
+    def transform(self,df:pd.DataFrame)->pd.DataFrame:
+        try:
+            df = df.fillna(self.get_fill_values())
+            return df.drop(self.get_drop_columns(),axis=1)
+        except Exception as e:
+            raise thyroidException(e, sys)
+
+
+def missing_data_handler(df)->pd.DataFrame:
+    """
+    Description: This function cleans raw thyroid records column by column
+    =========================================================
+    Params:
+    data: df (data frame)
+    =========================================================
+    return Pandas dataframe with missing values imputed and target as neg/pos
+    """
+    try:
+        logging.info("missing data handling initiated")
+        df = prepare_raw_frame(df=df)
+        logging.info("Replaced ? with NaN and numeric feature converted to float")
+
+        imputer = MissingDataImputer().partial_fit(df)
+        logging.info(f"categorical and numerical missing data fill values : {imputer.get_fill_values()}")
 
-        for j in numeric_features:
-            df[j].fillna(df[j].mean(), inplace=True)
-        logging.info("numerical missing data filled")
-        
-        # Trimming string in target calumn.
-        for i in range(len(df['status'])):
-            df['status'][i]=str(df['status'][i])[slice(3)]
-            if df['status'][i]=='neg':
-                df['status'][i]='neg'
-            else:
-                df['status'][i]='pos'
         # Dropping unrelevant column which has one unique value.
-        dump_col =[]
-        for i in [j for j in df.columns]:
-            if len(df[i].unique())>=2:
-                pass
-            else:
-                dump_col.append(i)
+        dump_col = imputer.get_drop_columns()
         logging.info(f"column to drop which have one unique category : {dump_col}")
-        df=df.drop(dump_col, axis=1)
-        logging.info(f"columns after dropping : {df.columns}")
+        df=imputer.transform(df)
+        logging.info("columns after dropping : %s",df.columns)
         logging.info(f"sex unique value : {df['sex'].unique()}")
         return df
     except Exception as e:
         raise thyroidException(e, sys)
 
-def get_collection_as_dataframe(database_name:str,collection_name:str)->pd.DataFrame:
+
+def get_collection_chunks(database_name:str,collection_name:str,batch_size:int=10000,client=None):
+    """
+    Description: This function streams a collection as typed dataframe chunks
+    =========================================================
+    Params:
+    database_name: database name
+    collection_name: collection name
+    batch_size: number of documents per chunk
+    client: mongo client (or a mongomock stand-in), defaults to the configured client
+    =========================================================
+    yields Pandas dataframe of at most batch_size documents, without _id and loader timestamp
+    """
+    try:
+        import pandas as pd
+        client = get_mongo_client() if client is None else client
+        logging.info(f"Streaming data from database: {database_name} and collection: {collection_name} in batches of {batch_size}")
+        cursor = client[database_name][collection_name].find({},{"_id":0,LOADER_TIMESTAMP_FIELD:0},batch_size=batch_size)
+        while True:
+            documents = list(islice(cursor,batch_size))
+            if len(documents)==0:
+                break
+            yield prepare_raw_frame(df=pd.DataFrame.from_records(documents))
+    except Exception as e:
+        raise thyroidException(e, sys)
+
+
+def get_collection_delta(database_name:str,collection_name:str,watermark_field:str="_id",watermark=None,
+                        batch_size:int=10000,client=None):
+    """
+    Description: This function streams the documents added or changed after a watermark
+    =========================================================
+    Params:
+    database_name: database name
+    collection_name: collection name
+    watermark_field: field increasing on every insert or update, _id (ObjectId) tracks inserts only
+    watermark: last value of watermark_field already ingested, None streams the whole collection.
+    Documents equal to the watermark are streamed again, a bulk load stamps all its documents with
+    the same LOADER_TIMESTAMP_FIELD, so those written after the watermark was saved are not skipped;
+    callers deduplicate on RECORD_KEY
+    batch_size: number of documents per chunk
+    client: mongo client (or a mongomock stand-in), defaults to the configured client
+    =========================================================
+    yields (Pandas dataframe with _id as string RECORD_KEY column, watermark of the last document)
+    in watermark order
+    """
+    try:
+        import pandas as pd
+        client = get_mongo_client() if client is None else client
+        query = {} if watermark is None else {watermark_field:{"$gte":watermark}}
+        logging.info(f"Streaming documents of collection: {collection_name} with {query}")
+        cursor = client[database_name][collection_name].find(query,batch_size=batch_size).sort(watermark_field,1)
+        while True:
+            documents = list(islice(cursor,batch_size))
+            if len(documents)==0:
+                break
+            last_watermark = documents[-1][watermark_field]
+            df = pd.DataFrame.from_records(documents)
+            df[RECORD_KEY] = df[RECORD_KEY].astype(str)
+            yield prepare_raw_frame(df=df),last_watermark
+    except Exception as e:
+        raise thyroidException(e, sys)
+
+
+def get_collection_fingerprint(database_name:str,collection_name:str,client=None,
+                            watermark_field:Optional[str]=None)->str:
+    """
+    Description: This function fingerprints a collection without reading its documents
+    =========================================================
+    Params:
+    database_name: database name
+    collection_name: collection name
+    client: mongo client (or a mongomock stand-in), defaults to the configured client
+    watermark_field: field whose latest value is included too, next to _id and LOADER_TIMESTAMP_FIELD
+    =========================================================
+    return sha256 hex digest of the document count and the latest _id, LOADER_TIMESTAMP_FIELD and
+    watermark_field values, one count and one sorted single document query per field.
+    Inserts and deletes change the count or the latest _id, bulk loader upserts the latest
+    timestamp; a document edited in place without a new timestamp is not noticed
+    """
+    try:
+        collection = (get_mongo_client() if client is None else client)[database_name][collection_name]
+        fields = list(dict.fromkeys(["_id",LOADER_TIMESTAMP_FIELD]+([watermark_field] if watermark_field else [])))
+        values = [collection.count_documents({})]
+        for field in fields:
+            latest = list(collection.find({field:{"$exists":True}},{field:1}).sort(field,-1).limit(1))
+            values.append(latest[0][field] if latest else None)
+        return hashlib.sha256(json.dumps(values,default=str).encode()).hexdigest()
+    except Exception as e:
+        raise thyroidException(e, sys)
+
+
+def get_collection_as_dataframe(database_name:str,collection_name:str,batch_size:int=10000,client=None)->pd.DataFrame:
     """
     Description: This function return collection as dataframe
     =========================================================
     Params:
     database_name: database name
     collection_name: collection name
+    batch_size: number of documents converted at a time
+    client: mongo client (or a mongomock stand-in), defaults to the configured client
     =========================================================
     return Pandas dataframe of a collection
     """
     try:
+        import pandas as pd
         logging.info(f"Reading data from database: {database_name} and collection: {collection_name}")
-        df = pd.DataFrame(list(mongo_client[database_name][collection_name].find()))
-        logging.info(f"Found columns: {df.columns}")
-        if "_id" in df.columns:
-            logging.info(f"Dropping column: _id ")
-            df = df.drop("_id",axis=1)
+        chunks = list(get_collection_chunks(database_name=database_name,collection_name=collection_name,
+                                            batch_size=batch_size,client=client))
+        df = pd.concat(chunks,ignore_index=True) if len(chunks)>0 else pd.DataFrame()
+        logging.info("Found columns: %s",df.columns)
         logging.info(f"Row and columns in df: {df.shape}")
 
         df_trans = missing_data_handler(df=df)
@@ -96,8 +255,22 @@ def get_collection_as_dataframe(database_name:str,collection_name:str)->pd.DataF
         raise thyroidException(e, sys)
 
 
+def get_file_hash(file_path:str)->str:
+    """
+    sha256 hex digest of a file, read in 1MB blocks
+    """
+    try:
+        digest = hashlib.sha256()
+        with open(file_path,"rb") as file_obj:
+            for block in iter(lambda: file_obj.read(1<<20),b""):
+                digest.update(block)
+        return digest.hexdigest()
+    except Exception as e:
+        raise thyroidException(e, sys)
+
 def write_yaml_file(file_path,data:dict):
     try:
+        import yaml
         file_dir = os.path.dirname(file_path)
         os.makedirs(file_dir,exist_ok=True)
         with open(file_path,"w") as file_writer:
@@ -105,6 +278,33 @@ def write_yaml_file(file_path,data:dict):
     except Exception as e:
         raise thyroidException(e, sys)
     
+def resolve_n_jobs(n_jobs:Optional[int]=None)->int:
+    """
+    Description: Validate a parallelism setting against the cores available to this process
+    =========================================================
+    Params:
+    n_jobs: number of cores, None or -1 uses all cores, other negative values leave
+    -n_jobs-1 cores free (joblib convention)
+    =========================================================
+    return number of cores between 1 and the available cores
+    """
+    try:
+        available = len(os.sched_getaffinity(0)) if hasattr(os,"sched_getaffinity") else os.cpu_count()
+        if n_jobs is None:
+            return available
+        n_jobs = int(n_jobs)
+        if n_jobs==0:
+            raise Exception("n_jobs must not be 0")
+        if n_jobs<0:
+            n_jobs = available+1+n_jobs
+        if n_jobs<1:
+            raise Exception(f"n_jobs leaves no core out of {available} available")
+        if n_jobs>available:
+            logging.info(f"n_jobs {n_jobs} exceeds the {available} available cores, using {available}")
+        return min(n_jobs,available)
+    except Exception as e:
+        raise thyroidException(e, sys)
+
 def convert_columns_float(df:pd.DataFrame,exclude_columns:list)->pd.DataFrame:
     try:
         for column in df.columns:
@@ -114,10 +314,32 @@ def convert_columns_float(df:pd.DataFrame,exclude_columns:list)->pd.DataFrame:
     except Exception as e:
         raise e
 
-def save_object(file_path: str, obj: object) -> None:
+#key of the marker saved by save_object when the object itself lives in a separate payload file
+ARTIFACT_FORMAT_KEY = "__thyroid_artifact_format__"
+SERIALIZATION_FORMATS = ["dill","joblib"]
+
+
+def save_object(file_path: str, obj: object, serialization_format: str = "dill") -> None:
+    """
+    Save object to file
+    file_path: str location of file to save
+    obj: object to save
+    serialization_format: dill pickles the object into file_path. joblib dumps it uncompressed to
+    file_path + ".joblib" so its numpy arrays can be memory mapped, and file_path keeps a small
+    dill marker pointing to that payload so load_object reads both formats from the same path.
+    """
     try:
+        import dill
         logging.info("Entered the save_object method of utils")
+        if serialization_format not in SERIALIZATION_FORMATS:
+            raise Exception(f"Unknown serialization format: {serialization_format}, expected one of {SERIALIZATION_FORMATS}")
         os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        if serialization_format=="joblib":
+            import joblib
+            payload_file_path = f"{file_path}.joblib"
+            #payload first, a reader never sees a marker without its payload
+            joblib.dump(obj, payload_file_path)
+            obj = {ARTIFACT_FORMAT_KEY:"joblib", "payload_file_name":os.path.basename(payload_file_path)}
         with open(file_path, "wb") as file_obj:
             dill.dump(obj, file_obj)
         logging.info("Exited the save_object method of utils")
@@ -125,12 +347,24 @@ def save_object(file_path: str, obj: object) -> None:
         raise thyroidException(e, sys) from e
 
 
-def load_object(file_path: str, ) -> object:
+def load_object(file_path: str, mmap_mode: Optional[str] = "r") -> object:
+    """
+    Load object saved by save_object in any serialization format
+    file_path: str location of file to load
+    mmap_mode: memory map mode of numpy arrays in joblib payloads, read only by default so
+    processes loading the same file share its pages. None reads them into memory.
+    """
     try:
         if not os.path.exists(file_path):
             raise Exception(f"The file: {file_path} is not exists")
+        import dill
         with open(file_path, "rb") as file_obj:
-            return dill.load(file_obj)
+            obj = dill.load(file_obj)
+        if isinstance(obj, dict) and obj.get(ARTIFACT_FORMAT_KEY)=="joblib":
+            import joblib
+            payload_file_path = os.path.join(os.path.dirname(file_path), obj["payload_file_name"])
+            return joblib.load(payload_file_path, mmap_mode=mmap_mode)
+        return obj
     except Exception as e:
         raise thyroidException(e, sys) from e
 
@@ -141,6 +375,7 @@ def save_numpy_array_data(file_path: str, array: np.array):
     array: np.array data to save
     """
     try:
+        import numpy as np
         dir_path = os.path.dirname(file_path)
         os.makedirs(dir_path, exist_ok=True)
         with open(file_path, "wb") as file_obj:
@@ -148,13 +383,17 @@ def save_numpy_array_data(file_path: str, array: np.array):
     except Exception as e:
         raise thyroidException(e, sys) from e
 
-def load_numpy_array_data(file_path: str) -> np.array:
+def load_numpy_array_data(file_path: str, mmap_mode: Optional[str] = None) -> np.array:
     """
     load numpy array data from file
     file_path: str location of file to load
+    mmap_mode: memory map the file instead of reading it, e.g. "r" so worker processes share it
     return: np.array data loaded
     """
     try:
+        import numpy as np
+        if mmap_mode is not None:
+            return np.load(file_path, mmap_mode=mmap_mode)
         with open(file_path, "rb") as file_obj:
             return np.load(file_obj)
     except Exception as e:
@@ -1,11 +1,18 @@
 
 from thyroid.pipeline.training_pipeline import start_training_pipeline
+import argparse
 
 
 file_path="/config/workspace/artifact/01042023__234146/data_ingestion/dataset/test.csv"
 print(__name__)
 if __name__=="__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--force",action="store_true",help="run every stage even if its inputs did not change")
+    parser.add_argument("--profile-stage",action="append",dest="profile_stages",
+                        help="stage to capture a flame profile of, can be repeated")
+    parser.add_argument("--profiler",choices=["cprofile","py-spy"],help="flame profiler of --profile-stage")
+    args = parser.parse_args()
     try:
-        start_training_pipeline()
+        start_training_pipeline(force=args.force,profile_stages=args.profile_stages,profiler=args.profiler)
     except Exception as e:
         print(e)
\ No newline at end of file